@@ -5,9 +5,11 @@ from pathlib import Path
 from accounts.models import Profile
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from files.services.default_avatars import DefaultAvatars
+from login.auth_cache import AUTH_CACHE
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +36,18 @@ def save_profile(sender, instance, **kwargs):
     instance.profile.save()
 
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def delete_cached_user(sender, instance, using, **kwargs):
+    """
+    Signal for removing the changed user from the cache of authenticated users.
+    It is removed again on commit: a request during the transaction can cache the old user.
+    """
+
+    AUTH_CACHE.delete_user(instance.pk)
+    transaction.on_commit(lambda: AUTH_CACHE.delete_user(instance.pk), using=using)
+
+
 @receiver(pre_save, sender=Profile)
 def delete_old_avatar(sender, instance, **kwargs):
     """
@@ -24,6 +24,7 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
 from drf_spectacular.utils import extend_schema, extend_schema_view, inline_serializer
 from emails.services.email_verify import EmailVerify
+from files.services.images import get_image_processor
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import RetrieveUpdateAPIView, UpdateAPIView
@@ -34,7 +35,6 @@ from rest_framework.views import APIView
 
 from backend.accounts.services.email import send_password_reset_email
 from backend.config.utils import get_ui_host
-from backend.files.services.images import resize_in_memory_uploaded_file
 
 logger = logging.getLogger(__name__)
 
@@ -155,7 +155,7 @@ class ProfileAPIView(RetrieveUpdateAPIView):
             )
             raise ValidationError(msg)
 
-        serializer.validated_data["avatar"] = resize_in_memory_uploaded_file(avatar, 200)
+        serializer.validated_data["avatar"] = get_image_processor().resize(avatar, 200)
         serializer.save()
 
         logger.info(f"{request.user} profile data updated successfully")
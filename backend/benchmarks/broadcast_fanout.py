@@ -0,0 +1,108 @@
+"""
+Benchmark: CPU time per chat message delivered to all subscribers of a chat.
+
+"per subscriber" - every subscriber builds the event and encodes it to JSON (send_json), as before.
+"encoded once" - the sender encodes the event once, subscribers forward the text (ChatConsumer.send_broadcast).
+
+Run from the backend directory:
+    python benchmarks/broadcast_fanout.py --subscribers 2000 --messages 200
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from chat.consumers import ChatConsumer  # noqa: E402
+
+logger = logging.getLogger("chat.consumers")
+logging.disable(logging.DEBUG)
+
+MESSAGE = {
+    "event_type": "chat_message",
+    "message": {
+        "id": 40,
+        "user_name": "user3",
+        "user_avatar": "https://files4rooms.pro/avatars/user/avatar_image_03.svg",
+        "reactions": [{"id": 1, "user_name": "user1", "reaction": "😀", "timestamp": "2023-09-26T14:17:44.250236Z"}],
+        "attachments": ["https://files4rooms.pro/uploads/6f1c8b1f7f6e4a3c9d4e.png"],
+        "timestamp": "1695737864",
+        "text": "Message text " * 20,
+        "is_deleted": False,
+        "chat": 1,
+        "user": 3,
+    },
+}
+
+
+def create_subscribers(count):
+    async def base_send(message):
+        pass
+
+    subscribers = []
+    for _ in range(count):
+        consumer = ChatConsumer()
+        consumer.base_send = base_send
+        consumer._user, consumer._chat_id, consumer._room_name = "user", "1", "books"
+        subscribers.append(consumer)
+    return subscribers
+
+
+async def legacy_send_message(consumer, event):
+    # group event handler before the change
+    logger.debug(f"Chat_message. Sending message to chat: {consumer._chat_id} in room: {consumer._room_name}")
+    await consumer.send_json(event["message"])
+
+
+async def per_subscriber(subscribers, messages):
+    for _ in range(messages):
+        event = {"type": "send_message", "message": MESSAGE}
+        for consumer in subscribers:
+            await legacy_send_message(consumer, event)
+
+
+async def encoded_once(subscribers, messages):
+    for _ in range(messages):
+        event = {
+            "type": "send_broadcast",
+            "event_type": "chat_message",
+            "text": await ChatConsumer.encode_json(MESSAGE),
+        }
+        for consumer in subscribers:
+            await consumer.send_broadcast(event)
+
+
+def measure(func, subscribers, messages):
+    start = time.process_time()
+    asyncio.run(func(subscribers, messages))
+    return (time.process_time() - start) / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 200, 2000])
+    parser.add_argument("--messages", type=int, default=100)
+    args = parser.parse_args()
+
+    for count in args.subscribers:
+        subscribers = create_subscribers(count)
+        before = measure(per_subscriber, subscribers, args.messages)
+        after = measure(encoded_once, subscribers, args.messages)
+        print(
+            f"subscribers: {count:<6} per subscriber: {before * 1000:8.3f} ms/msg"
+            + f"  encoded once: {after * 1000:8.3f} ms/msg  x{before / after:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: group_send delivery latency through the shared channel layer with 1, 4 and 8 ASGI workers.
+
+Every worker is a separate process with its own channel layer connection and a number of channels
+(websocket connections) in the same chat group. The main process publishes chat events with group_send
+and every worker measures the time until the event is received by each of its channels.
+
+Run from the backend directory:
+    python benchmarks/channel_layer_latency.py --url redis://localhost:6379/0
+Without --url an in-process fake redis server is started (requires fakeredis, slower than real redis).
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import threading
+import time
+
+from channels_redis.core import RedisChannelLayer
+
+GROUP = "books-1"
+
+
+def worker(url, connections, events, ready, results):
+    async def run():
+        layer = RedisChannelLayer(hosts=[url])
+        channels = [await layer.new_channel() for _ in range(connections)]
+        for channel in channels:
+            await layer.group_add(GROUP, channel)
+        ready.put(True)
+
+        async def consume(channel):
+            latencies = []
+            for _ in range(events):
+                event = await layer.receive(channel)
+                latencies.append(time.time() - event["sent_at"])
+            return latencies
+
+        per_channel = await asyncio.gather(*[consume(channel) for channel in channels])
+        results.put([latency for latencies in per_channel for latency in latencies])
+
+    asyncio.run(run())
+
+
+async def publish(url, events, interval):
+    layer = RedisChannelLayer(hosts=[url])
+    for idx in range(events):
+        await layer.group_send(GROUP, {"type": "send_message", "message": {"id": idx}, "sent_at": time.time()})
+        await asyncio.sleep(interval)
+    await layer.flush()
+
+
+def run_case(url, workers, connections, events, interval):
+    ready, results = multiprocessing.Queue(), multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(url, connections, events, ready, results)) for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=60)
+
+    asyncio.run(publish(url, events, interval))
+
+    latencies = []
+    for _ in processes:
+        latencies.extend(results.get(timeout=120))
+    for process in processes:
+        process.join()
+
+    latencies.sort()
+    return {
+        "deliveries": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="redis url, a fake in-process server is used if empty")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--connections", type=int, default=10, help="websocket connections per worker")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.005, help="pause between events, seconds")
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        from fakeredis import TcpFakeServer
+
+        server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = "redis://%s:%s" % server.server_address
+
+    print(f"broker: {url}, connections per worker: {args.connections}, events: {args.events}")
+    for workers in args.workers:
+        res = run_case(url, workers, args.connections, args.events, args.interval)
+        print(
+            f"workers: {workers:<3} deliveries: {res['deliveries']:<7}"
+            + f" p50: {res['p50_ms']:7.2f} ms  p99: {res['p99_ms']:7.2f} ms  max: {res['max_ms']:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: latency of GET chat/get/<room>/<sorting>/ (a page of 100 chats) with and without the listing cache.
+
+"no cache" - the cache is cleared before every request: the page is queried and serialized.
+"cache" - the page is served from the local memory cache (the first request fills it).
+JWT authentication of the request is included in both.
+
+Run from the backend directory:
+    python benchmarks/chat_list_cache.py --chats 10000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# config.urls imports backend.config
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from chat.models.chat import Chat  # noqa: E402
+from chat.services.chat_list_cache import CHAT_LIST_CACHE  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.client import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+logging.disable(logging.DEBUG)
+
+
+def measure(func, repeat=200) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = func()
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    users = [
+        get_user_model().objects.create_user(
+            username=f"user{idx}", password="p", email=f"user{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(10)
+    ]
+    Chat.objects.bulk_create(
+        Chat(title=f"chat {idx}", room="books", description="test description", user=users[idx % 10])
+        for idx in range(args.chats)
+    )
+
+    client = Client()
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(users[0]).access_token}"}
+    cache = CHAT_LIST_CACHE.cache
+
+    for sorting in ("new", "popular"):
+        url = reverse("get_chats", args=["books", sorting])
+
+        def uncached():
+            cache.clear()
+            return client.get(url, headers=headers)
+
+        before = measure(uncached)
+        after = measure(lambda: client.get(url, headers=headers))
+        print(
+            f"chats: {args.chats:<8} sorting: {sorting:<8} no cache: {before * 1000:7.2f} ms"
+            + f"  cache: {after * 1000:7.2f} ms  x{before / after:.1f}"
+        )
+
+    print(f"stats: {CHAT_LIST_CACHE.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
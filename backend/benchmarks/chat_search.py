@@ -0,0 +1,91 @@
+"""
+Benchmark: latency of the chat search (a page of 100 chats and the total count, as the search views do).
+
+"contains" - title__contains=phrase as before: LIKE '%phrase%' scan of the room.
+"index" - CHAT_SEARCH: FTS5 index of titles and descriptions on SQLite.
+"dragon" is in 100 chats at any number of chats, "book42" - in ~4% of chats, so its count grows with the room.
+
+Run from the backend directory (creating 1M chats takes a few minutes):
+    python benchmarks/chat_search.py --chats 1000000
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from chat.models.chat import Chat  # noqa: E402
+from chat.services.search import CHAT_SEARCH  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+logging.disable(logging.DEBUG)
+
+WORDS = [f"{prefix}{suffix}" for prefix in ("book", "film", "game", "song", "trip", "code") for suffix in range(500)]
+
+
+def create_chats(start, count):
+    batch = 10000
+    for offset in range(start, count, batch):
+        Chat.objects.bulk_create(
+            Chat(
+                title=f"{random.choice(WORDS)} {random.choice(WORDS)} {idx}",
+                room="books",
+                description=" ".join(random.choices(WORDS, k=8)),
+            )
+            for idx in range(offset, min(offset + batch, count))
+        )
+
+
+def page(queryset):
+    return queryset.count(), list(queryset[:100])
+
+
+def measure(func, repeat=10) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    random.seed(1)
+    Chat.objects.bulk_create(
+        Chat(title=f"dragon {idx}", room="books", description="dragons and wizards") for idx in range(100)
+    )
+    created = 0
+    for count in sorted(args.chats):
+        start = time.perf_counter()
+        create_chats(created, count)
+        logging.getLogger(__name__).info(f"{count - created} chats created in {time.perf_counter() - start:.0f} s")
+        created = count
+        room = Chat.objects.filter(room="books")
+
+        for phrase in ("dragon", "dragon wizard", "book42"):
+            before = measure(lambda: page(room.filter(title__contains=phrase).order_by("-timestamp")))
+            after = measure(lambda: page(CHAT_SEARCH.search(room, phrase)))
+            print(
+                f"chats: {count:<8} phrase: {phrase!r:<14} contains: {before * 1000:8.2f} ms"
+                + f"  index: {after * 1000:8.2f} ms  x{before / after:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: polling with and without If-None-Match.
+
+"200" - the client downloads the page every time.
+"304" - the client sends the ETag of the page, which didn't change, and gets 304 Not Modified
+without querying and serializing the page.
+Chat list: a page of 100 chats (from the listing cache), message history: a page of 100 messages with reactions.
+JWT authentication of the request is included in both.
+
+Run from the backend directory:
+    python benchmarks/conditional_get.py
+"""
+
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# config.urls imports backend.config
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from chat.models.chat import Chat  # noqa: E402
+from chat.models.message import Message  # noqa: E402
+from chat.models.reaction import Reaction  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.client import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+def measure(func, status, repeat=200) -> tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = func()
+        assert response.status_code == status
+    return (time.perf_counter() - start) / repeat, len(response.content)
+
+
+def main():
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    users = [
+        get_user_model().objects.create_user(
+            username=f"user{idx}", password="p", email=f"user{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(10)
+    ]
+    chats = Chat.objects.bulk_create(
+        Chat(title=f"chat {idx}", room="books", description="test description", user=users[idx % 10])
+        for idx in range(1000)
+    )
+    messages = Message.objects.bulk_create(
+        Message(chat=chats[0], user=users[idx % 10], text=f"message {idx}") for idx in range(1000)
+    )
+    Reaction.objects.bulk_create(
+        Reaction(message=message, user=user, reaction="👍") for message in messages[-100:] for user in users[:3]
+    )
+
+    client = Client()
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(users[0]).access_token}"}
+    urls = {
+        "chat list": reverse("get_chats", args=["books", "new"]),
+        "message history": reverse("get_messages", args=[chats[0].id]),
+    }
+    for name, url in urls.items():
+        etag = client.get(url, headers=headers)["ETag"]
+        (full, size) = measure(lambda: client.get(url, headers=headers), 200)
+        (not_modified, _) = measure(lambda: client.get(url, headers={**headers, "If-None-Match": etag}), 304)
+        print(
+            f"{name:<16} 200: {full * 1000:6.2f} ms, {size} bytes"
+            + f"  304: {not_modified * 1000:6.2f} ms, 0 bytes  x{full / not_modified:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
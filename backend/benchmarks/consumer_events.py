@@ -0,0 +1,105 @@
+"""
+Benchmark: throughput of concurrent chat events which change the DB, with 1000 open websocket connections.
+
+Every connection (ChatConsumer) has a message of its own, the connections are spread over --chats chats.
+All of them handle their events at the same time, one after another: message_was_updated and message_reaction
+(posted, then deleted) of their message. Only the DB work of the events is measured (update_message,
+message_reaction), not the channel layer: the in-memory layer of tests scans all its channels on every receive.
+
+Run from the backend directory:
+    python benchmarks/consumer_events.py --sockets 1000 --chats 100 --events 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+django.setup()
+
+from chat.consumers import ChatConsumer  # noqa: E402
+from chat.models.chat import Chat  # noqa: E402
+from chat.models.message import Message  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+# creating the users is the slow part otherwise
+settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+async def handle_events(consumer, message_id, count):
+    """Handle the events one after another. Return their latencies"""
+
+    latencies = []
+    for idx in range(count):
+        started = time.perf_counter()
+        if idx % 2:
+            await consumer.message_reaction(message_id, "😀", consumer._user)
+        else:
+            await consumer.update_message(message_id, f"updated {idx}")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run(args, consumers, message_ids):
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(handle_events(consumer, message_id, args.events) for consumer, message_id in zip(consumers, message_ids))
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for result in results for latency in result)
+    print(
+        f"sockets: {args.sockets}  chats: {args.chats}  events/s: {len(latencies) / elapsed:7.0f}"
+        + f"  p50: {latencies[len(latencies) // 2] * 1000:7.1f} ms"
+        + f"  p99: {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--events", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    users = [
+        get_user_model().objects.create_user(
+            username=f"user{idx}", password="p", email=f"user{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(args.sockets)
+    ]
+    chats = Chat.objects.bulk_create(
+        Chat(title=f"chat {idx}", room="books", description="test description", user=users[idx])
+        for idx in range(args.chats)
+    )
+    messages = Message.objects.bulk_create(
+        Message(chat=chats[idx % len(chats)], user=user, text="message") for idx, user in enumerate(users)
+    )
+
+    consumers = []
+    for idx, user in enumerate(users):
+        consumer = ChatConsumer()
+        consumer._user, consumer._chat_id, consumer._room_name = user, str(chats[idx % len(chats)].id), "books"
+        consumers.append(consumer)
+
+    asyncio.run(run(args, consumers, [message.id for message in messages]))
+
+
+if __name__ == "__main__":
+    main()
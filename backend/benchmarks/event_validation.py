@@ -0,0 +1,92 @@
+"""
+Benchmark: websocket events validated per second on one core.
+
+"serializers" - the event is validated by WebsocketMessageSerializer and MessageSerializer, as before
+(message_was_updated was validated as a fake chat_message).
+"schemas" - the event is validated by the schema of its event type from the dispatch table (ChatConsumer).
+The DB constraints are still checked by MessageSerializer when a chat_message is saved, so it isn't counted.
+
+Run from the backend directory:
+    python benchmarks/event_validation.py --events 20000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from chat.consumers import handlers  # noqa: E402
+from chat.models.chat import Chat  # noqa: E402
+from chat.serializers.message import (  # noqa: E402
+    MessageSerializer,
+    WebsocketMessageSerializer,
+)
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+logging.disable(logging.DEBUG)
+
+
+def legacy_validate(content):
+    # ChatConsumer._validate before the change
+    websocket_message = WebsocketMessageSerializer(data=content)
+    assert websocket_message.is_valid()
+    message = MessageSerializer(data=websocket_message.data["message"])
+    assert message.is_valid()
+
+
+def legacy(events):
+    for content in events:
+        if content["event_type"] == "message_was_updated":
+            legacy_validate({"event_type": "chat_message", "message": {"chat": 1, "text": content["new_text"]}})
+        else:
+            legacy_validate(content)
+
+
+def schemas(events):
+    for content in events:
+        schema, _ = handlers.get(content["event_type"])
+        schema.validate(content)
+
+
+def measure(func, events):
+    start = time.process_time()
+    func(events)
+    return len(events) / (time.process_time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    args = parser.parse_args()
+
+    # serializers look up the chat, so they need a DB
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    chat = Chat.objects.create(title="test chat", room="books", description="test description")
+
+    samples = {
+        "chat_message": {"event_type": "chat_message", "message": {"chat": chat.id, "text": "Message text " * 20}},
+        "message_was_updated": {"event_type": "message_was_updated", "id": 1, "new_text": "New text " * 20},
+    }
+    for event_type, content in samples.items():
+        events = [content] * args.events
+        before = measure(legacy, events)
+        after = measure(schemas, events)
+        print(
+            f"{event_type:<20} serializers: {before:10.0f} events/s  schemas: {after:10.0f} events/s"
+            + f"  x{after / before:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
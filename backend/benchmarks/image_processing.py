@@ -0,0 +1,97 @@
+"""
+Benchmark: concurrent avatar uploads (resize to 200x200), Pillow work inline vs in the image processing pool.
+
+For every mode it reports the throughput of the uploads and the longest stall of an event loop running
+in the same process (websocket consumers live in that loop, so a stall delays every chat event).
+
+Run from the backend directory:
+    python benchmarks/image_processing.py --clients 8 --uploads 200 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from files.services.images import ImageProcessor, resize_image_data  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+def avatar_data(size=(1600, 1200)) -> bytes:
+    output = BytesIO()
+    Image.effect_noise(size, 64).convert("RGB").save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+class LoopMonitor:
+    """Event loop in a thread which measures how late its timer callbacks are"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.max_stall = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True)
+
+    async def _run(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.max_stall = max(self.max_stall, time.perf_counter() - start - self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_case(upload, clients, uploads):
+    with LoopMonitor() as monitor:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(lambda _: upload(), range(uploads)))
+        elapsed = time.perf_counter() - start
+    return uploads / elapsed, monitor.max_stall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent uploads")
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    data = avatar_data()
+    processor = ImageProcessor(workers=args.workers, queue_size=args.clients * 2, timeout=60)
+    processor.resize(SimpleUploadedFile("warmup.jpg", data), 200)
+
+    cases = {
+        "inline": lambda: resize_image_data(data, 200),
+        f"pool ({args.workers} workers)": lambda: processor.resize(SimpleUploadedFile("avatar.jpg", data), 200),
+    }
+
+    print(f"image: {len(data) // 1024} KiB, concurrent uploads: {args.clients}, uploads: {args.uploads}")
+    for name, upload in cases.items():
+        throughput, stall = run_case(upload, args.clients, args.uploads)
+        print(f"{name:<20} {throughput:8.1f} uploads/s  max event loop stall: {stall * 1000:8.1f} ms")
+
+    processor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: latency of the first page of the message history (GET chat/messages/get/<chat_id>/),
+which every client loads when it joins the chat.
+
+"db" - the buffer is cleared before every request: the page is queried and serialized.
+"buffer" - the page is served from MESSAGE_BUFFER (the first request fills it).
+A page of 100 messages with 3 reactions and an attachment each. JWT authentication of the request is included in both.
+
+Run from the backend directory:
+    python benchmarks/message_buffer.py
+"""
+
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# config.urls imports backend.config
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from chat.models.chat import Chat  # noqa: E402
+from chat.models.message import Message  # noqa: E402
+from chat.models.reaction import Reaction  # noqa: E402
+from chat.services.message_buffer import MESSAGE_BUFFER  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.client import Client  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext,
+    setup_test_environment,
+)
+from django.urls import reverse  # noqa: E402
+from files.models import File  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+def measure(func, repeat=200) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = func()
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    users = [
+        get_user_model().objects.create_user(
+            username=f"user{idx}", password="p", email=f"user{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(10)
+    ]
+    chat = Chat.objects.create(title="chat", room="books", description="test description", user=users[0])
+    messages = Message.objects.bulk_create(
+        Message(chat=chat, user=users[idx % 10], text=f"message {idx}") for idx in range(1000)
+    )
+    Reaction.objects.bulk_create(
+        Reaction(message=message, user=user, reaction="👍") for message in messages[-100:] for user in users[:3]
+    )
+    for idx, message in enumerate(messages[-100:]):
+        message.attachments.add(
+            File.objects.create(file=f"uploads/{idx}.png", file_name=f"{idx}.png", file_type="png", uploader=users[0])
+        )
+
+    client = Client()
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(users[0]).access_token}"}
+    url = reverse("get_messages", args=[chat.id])
+
+    def uncached():
+        MESSAGE_BUFFER.clear()
+        return client.get(url, headers=headers)
+
+    before = measure(uncached)
+    after = measure(lambda: client.get(url, headers=headers))
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url, headers=headers)
+
+    print(f"first page  db: {before * 1000:7.2f} ms  buffer: {after * 1000:7.2f} ms  x{before / after:.1f}")
+    print(f"queries of a buffered page (the user of the request): {len(queries)}")
+    print(f"stats: {MESSAGE_BUFFER.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
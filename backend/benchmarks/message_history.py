@@ -0,0 +1,104 @@
+"""
+Benchmark: time to load a page of the message history at different depths of a big chat.
+
+"limit/offset" - LimitOffsetPagination as before: COUNT(*) of the chat plus OFFSET <depth>.
+"cursor" - MessageCursorPagination: "before=<cursor>" range scan of the (chat, timestamp, id) index.
+Only the pagination queries are measured, serialization of the page is the same for both.
+
+Run from the backend directory (creating 1M messages takes a minute):
+    python benchmarks/message_history.py --messages 1000000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from chat.models.chat import Chat  # noqa: E402
+from chat.models.message import Message  # noqa: E402
+from chat.pagination import MessageCursorPagination  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.pagination import LimitOffsetPagination  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+logging.disable(logging.DEBUG)
+
+PAGE_SIZE = 100
+
+
+def create_messages(count) -> Chat:
+    chat = Chat.objects.create(title="big chat", room="books", description="test description")
+    other_chat = Chat.objects.create(title="other chat", room="books", description="test description")
+
+    # every 10th message is in the other chat
+    total, batch = count + count // 9, 10000
+    for offset in range(0, total, batch):
+        Message.objects.bulk_create(
+            Message(chat=other_chat if idx % 10 == 9 else chat, text=f"message {idx}")
+            for idx in range(offset, min(offset + batch, total))
+        )
+
+    # auto_now_add sets the same timestamp for a batch, spread messages over time: a message per second
+    start = (timezone.now() - timedelta(seconds=total)).strftime("%Y-%m-%d %H:%M:%S")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Message._meta.db_table}"
+            + " SET timestamp = strftime('%%Y-%%m-%%d %%H:%%M:%%S', %s, '+' || id || ' seconds') || '.000000'",
+            [start],
+        )
+    return chat
+
+
+def request(**params) -> Request:
+    return Request(APIRequestFactory().get("/api/chat/messages/get/1/", params))
+
+
+def measure(func, repeat=20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        page = func()
+        assert len(page) == PAGE_SIZE
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    chat = create_messages(args.messages)
+    queryset = Message.objects.filter(chat=chat)
+    total = queryset.count()
+    ids = list(queryset.order_by("-timestamp", "-id").values_list("id", flat=True))
+
+    for depth in (0, total // 10, total // 2, total - PAGE_SIZE - 1):
+        offset_request = request(limit=PAGE_SIZE, offset=depth)
+        before = measure(lambda: LimitOffsetPagination().paginate_queryset(queryset.order_by("id"), offset_request))
+
+        cursor_message = Message.objects.get(pk=ids[depth])
+        cursor_request = request(limit=PAGE_SIZE, before=MessageCursorPagination.encode_cursor(cursor_message))
+        after = measure(lambda: MessageCursorPagination().paginate_queryset(queryset, cursor_request))
+
+        print(
+            f"messages: {total:<8} depth: {depth:<8} limit/offset: {before * 1000:8.2f} ms"
+            + f"  cursor: {after * 1000:8.2f} ms  x{before / after:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
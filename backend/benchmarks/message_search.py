@@ -0,0 +1,102 @@
+"""
+Benchmark: latency of the first page of a message search in a big chat.
+
+"contains" - text__icontains=phrase: scan of all messages of the chat.
+"index" - MESSAGE_SEARCH: FTS5 index of message texts on SQLite.
+Pages are loaded by MessageCursorPagination and MessageSearchCursorPagination (as the search view does)
+with snippets of the found messages. Without the search API a client had to page through the whole history,
+which is slower than "contains".
+"dragon" is in 100 old messages at any number of messages, "word42" - in ~10% of them.
+
+Run from the backend directory (creating 1M messages takes a few minutes):
+    python benchmarks/message_search.py --messages 1000000
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from chat.models.chat import Chat  # noqa: E402
+from chat.models.message import Message  # noqa: E402
+from chat.pagination import (  # noqa: E402
+    MessageCursorPagination,
+    MessageSearchCursorPagination,
+)
+from chat.services.search import MESSAGE_SEARCH  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+logging.disable(logging.DEBUG)
+
+WORDS = [f"word{idx}" for idx in range(100)]
+
+
+def create_messages(chat, start, count):
+    batch = 10000
+    for offset in range(start, count, batch):
+        Message.objects.bulk_create(
+            Message(chat=chat, text=" ".join(random.choices(WORDS, k=10)))
+            for _ in range(offset, min(offset + batch, count))
+        )
+
+
+def page(queryset, pagination=MessageCursorPagination) -> list:
+    request = Request(APIRequestFactory().get("/api/chat/messages/search/get/1/phrase/"))
+    return pagination().paginate_queryset(queryset, request)
+
+
+def search(messages, phrase):
+    found = MESSAGE_SEARCH.search(messages, phrase, ranked=False)
+    return MESSAGE_SEARCH.annotate_snippet(found, "text")
+
+
+def measure(func, repeat=10) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    random.seed(1)
+    chat = Chat.objects.create(title="big chat", room="books", description="test description")
+    Message.objects.bulk_create(Message(chat=chat, text=f"dragon {idx}") for idx in range(100))
+    created = 0
+    for count in sorted(args.messages):
+        start = time.perf_counter()
+        create_messages(chat, created, count)
+        logging.getLogger(__name__).info(f"{count - created} messages created in {time.perf_counter() - start:.0f} s")
+        created = count
+        messages = Message.objects.filter(chat=chat, is_deleted=False)
+
+        for phrase in ("dragon", "word42"):
+            before = measure(lambda: page(messages.filter(text__icontains=phrase)))
+            after = measure(lambda: page(search(messages, phrase), MessageSearchCursorPagination))
+            print(
+                f"messages: {count:<8} phrase: {phrase!r:<9} contains: {before * 1000:8.2f} ms"
+                + f"  index: {after * 1000:8.2f} ms  x{before / after:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
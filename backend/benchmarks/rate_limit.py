@@ -0,0 +1,59 @@
+"""
+Benchmark: cost of the rate limit check of a websocket event (MemoryRateLimiter.acquire) on one core.
+
+The events come from --users users in --chats chats, so the buckets are spread like in a busy process.
+Limits are high enough that no event is rejected: every check refills and takes two buckets.
+"limited" - a chat_message, "not limited" - an event type without limits (a dict lookup).
+
+Run from the backend directory:
+    python benchmarks/rate_limit.py --events 200000 --users 10000 --chats 100
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+django.setup()
+
+from chat.services.rate_limit import MemoryRateLimiter  # noqa: E402
+
+logging.disable(logging.DEBUG)
+
+
+async def measure(limiter, event_type, args):
+    users = list(range(args.users))
+    chats = [str(idx) for idx in range(args.chats)]
+    acquire = limiter.acquire
+    start = time.process_time()
+    for idx in range(args.events):
+        assert not await acquire(event_type, users[idx % args.users], chats[idx % args.chats])
+    return (time.process_time() - start) / args.events * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--chats", type=int, default=100)
+    args = parser.parse_args()
+
+    settings.CHAT_RATE_LIMITS = {"chat_message": {"user": (1e9, 1e9), "chat": (1e9, 1e9)}}
+    limiter = MemoryRateLimiter()
+    # the first pass creates the buckets
+    asyncio.run(measure(limiter, "chat_message", args))
+    for name, event_type in (("limited", "chat_message"), ("not limited", "message_was_updated")):
+        print(f"{name:<12} {asyncio.run(measure(limiter, event_type, args)):6.2f} µs/event")
+
+
+if __name__ == "__main__":
+    main()
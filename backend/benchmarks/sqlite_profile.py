@@ -0,0 +1,167 @@
+"""
+Benchmark: mixed reads and writes of concurrent threads on the SQLite database file.
+
+"default" - the default DATABASES: rollback journal, deferred transactions, a new connection per request.
+"production" - get_databases(production=True): WAL with SQLITE_PRAGMAS, BEGIN IMMEDIATE, persistent connections.
+Writers post messages, edit them and toggle likes (as the websocket consumer does),
+readers load pages of chats and of the message history (as the REST views do).
+Connections are closed after every operation as at the end of a request (close_old_connections).
+
+Run from the backend directory:
+    python benchmarks/sqlite_profile.py --readers 8 --writers 4 --seconds 10
+"""
+
+import argparse
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+from config.settings import get_databases  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+PROFILES = ("default", "production")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--readers", type=int, default=8)
+parser.add_argument("--writers", type=int, default=4)
+parser.add_argument("--seconds", type=float, default=10)
+parser.add_argument("--profile", choices=PROFILES)
+args = parser.parse_args()
+
+# the connections are configured by django.setup()
+if args.profile:
+    path = Path(tempfile.mkdtemp()) / "benchmark.sqlite3"
+    settings.DATABASES = get_databases(path, production=args.profile == "production")
+    settings.DATABASES["default"]["TEST"] = {"NAME": path}
+
+django.setup()
+
+from chat.models.chat import Chat  # noqa: E402
+from chat.models.message import Message  # noqa: E402
+from chat.serializers.message import MessageSerializer  # noqa: E402
+from chat.services.likes import toggle_chat_like  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import OperationalError, close_old_connections, connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+
+def read_chats(users, chats):
+    list(Chat.objects.filter(room="books").select_related("user").order_by("-timestamp")[:100])
+
+
+def read_messages(users, chats):
+    chat = random.choice(chats)
+    list(MessageSerializer.prefetch(Message.objects.filter(chat=chat)).order_by("-timestamp", "-id")[:100])
+
+
+def post_message(users, chats):
+    Message.objects.create(chat=random.choice(chats), user=random.choice(users), text="new message")
+
+
+def edit_message(users, chats):
+    message = Message.objects.filter(chat=random.choice(chats)).order_by("-id").first()
+    message.text = "edited message"
+    message.save()
+
+
+def like_chat(users, chats):
+    toggle_chat_like(random.choice(users), random.choice(chats).id)
+
+
+READS = (read_chats, read_messages)
+WRITES = (post_message, edit_message, like_chat)
+
+
+def worker(operations, users, chats, deadline, latencies, errors):
+    """Run random operations until the deadline, collect latencies and "database is locked" errors"""
+
+    while time.perf_counter() < deadline:
+        operation = random.choice(operations)
+        start = time.perf_counter()
+        try:
+            operation(users, chats)
+        except OperationalError as error:
+            # a virtual table (FTS5) fails to read its schema when the database is locked
+            if "locked" not in str(error) and "vtable constructor failed" not in str(error):
+                raise
+            errors.append(operation.__name__)
+        else:
+            latencies.append(time.perf_counter() - start)
+        finally:
+            close_old_connections()
+    connection.close()
+
+
+def percentile(values, fraction) -> float:
+    return sorted(values)[int(len(values) * fraction)] if values else float("nan")
+
+
+def run(profile):
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    users = [
+        get_user_model().objects.create_user(
+            username=f"user{idx}", password="p", email=f"user{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(10)
+    ]
+    chats = Chat.objects.bulk_create(
+        Chat(title=f"chat {idx}", room="books", description="test description", user=users[idx % 10])
+        for idx in range(1000)
+    )
+    chats = chats[:10]
+    for chat in chats:
+        Message.objects.bulk_create(
+            Message(chat=chat, user=users[idx % 10], text=f"message {idx}") for idx in range(1000)
+        )
+    connection.close()
+
+    deadline = time.perf_counter() + args.seconds
+    latencies = {"read": [], "write": []}
+    errors = {"read": [], "write": []}
+    threads = [
+        threading.Thread(target=worker, args=(READS, users, chats, deadline, latencies["read"], errors["read"]))
+        for _ in range(args.readers)
+    ] + [
+        threading.Thread(target=worker, args=(WRITES, users, chats, deadline, latencies["write"], errors["write"]))
+        for _ in range(args.writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for kind, values in latencies.items():
+        failed = len(errors[kind])
+        print(
+            f"{profile:<11} {kind:<6} ops/s: {len(values) / args.seconds:7.0f}"
+            + f"  p50: {percentile(values, 0.5) * 1000:7.2f} ms  p99: {percentile(values, 0.99) * 1000:8.2f} ms"
+            + f"  locked: {failed / max(len(values) + failed, 1) * 100:5.1f}%"
+        )
+
+
+def main():
+    if args.profile:
+        run(args.profile)
+        return
+
+    # the database settings are read once per process
+    for profile in PROFILES:
+        subprocess.run([sys.executable, __file__, *sys.argv[1:], "--profile", profile], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: websocket connects per second to a chat (JWTAuthMiddleware and ChatConsumer.connect).
+
+A connect is measured up to the online_user_list event, then the client disconnects.
+The clients connect in batches of --concurrency, the tokens and the users are in the auth cache after
+the warm-up as they are for reconnecting clients.
+
+Run from the backend directory:
+    python benchmarks/websocket_connect.py --connects 2000 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# config.asgi imports backend.chat
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from channels.testing import WebsocketCommunicator  # noqa: E402
+from chat.models.chat import Chat  # noqa: E402
+from config.asgi import application  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+
+async def connect(chat, token):
+    client = WebsocketCommunicator(
+        application,
+        f"/ws/chat/{chat.room}/{chat.id}/",
+        headers=[(b"origin", b"http://localhost:8000"), (b"Authorization", f"Bearer {token}".encode("utf-8"))],
+    )
+    connected, _ = await client.connect(timeout=20)
+    assert connected
+    while (await client.receive_json_from(timeout=20))["event_type"] != "online_user_list":
+        pass
+    await client.disconnect()
+
+
+async def connect_all(chat, tokens, count, concurrency):
+    for idx in range(0, count, concurrency):
+        await asyncio.gather(*(connect(chat, tokens[(idx + n) % len(tokens)]) for n in range(concurrency)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connects", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    users = [
+        get_user_model().objects.create_user(
+            username=f"user{idx}", password="p", email=f"user{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(args.concurrency)
+    ]
+    tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+    chat = Chat.objects.create(title="chat", room="books", description="test description", user=users[0])
+
+    # warm-up: the auth cache, the presence and the event log of the chat
+    asyncio.run(connect_all(chat, tokens, args.concurrency, args.concurrency))
+
+    start = time.perf_counter()
+    asyncio.run(connect_all(chat, tokens, args.connects, args.concurrency))
+    elapsed = time.perf_counter() - start
+    print(f"connects: {args.connects}  concurrency: {args.concurrency}  connects/s: {args.connects / elapsed:7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: sustained rate of new messages saved by the websocket consumer (ChatConsumer._save_message)
+into the SQLite database file, with write-behind (CHAT_WRITE_BEHIND) off and on.
+
+"off" - every message is saved in its own transaction.
+"on" - messages are queued and written in batches by the write-behind thread. The time to write
+the messages left in the queue at the end is included.
+Messages are saved one after another as by the single thread of database_sync_to_async.
+Both DATABASES profiles of sqlite_profile.py are measured, each in its own process.
+
+Run from the backend directory:
+    python benchmarks/write_behind.py --seconds 5
+"""
+
+import argparse
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+from config.settings import get_databases  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+PROFILES = ("default", "production")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--seconds", type=float, default=5)
+parser.add_argument("--profile", choices=PROFILES)
+args = parser.parse_args()
+
+# the connections are configured by django.setup()
+if args.profile:
+    path = Path(tempfile.mkdtemp()) / "benchmark.sqlite3"
+    settings.DATABASES = get_databases(path, production=args.profile == "production")
+    settings.DATABASES["default"]["TEST"] = {"NAME": path}
+
+django.setup()
+
+from chat.consumers import ChatConsumer  # noqa: E402
+from chat.models.chat import Chat  # noqa: E402
+from chat.models.message import Message  # noqa: E402
+from chat.services.write_behind import MESSAGE_WRITER  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+save_message = ChatConsumer.__dict__["_save_message"].func
+
+
+def percentile(values, fraction) -> float:
+    return sorted(values)[int(len(values) * fraction)] if values else float("nan")
+
+
+def measure(mode, consumers, chats):
+    settings.CHAT_WRITE_BEHIND = mode == "on"
+    before = Message.objects.count()
+    latencies = []
+
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    while time.perf_counter() < deadline:
+        chat = random.choice(chats)
+        started = time.perf_counter()
+        save_message(random.choice(consumers), {"chat": chat.id, "text": "new message"}, [])
+        latencies.append(time.perf_counter() - started)
+    # write the queued messages
+    MESSAGE_WRITER.close()
+    elapsed = time.perf_counter() - start
+
+    assert Message.objects.count() - before == len(latencies)
+    print(
+        f"{args.profile:<11} write-behind {mode:<4} messages/s: {len(latencies) / elapsed:7.0f}"
+        + f"  p50: {percentile(latencies, 0.5) * 1000:6.3f} ms  p99: {percentile(latencies, 0.99) * 1000:7.3f} ms"
+    )
+
+
+def run():
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    consumers = []
+    for idx in range(10):
+        consumer = ChatConsumer()
+        consumer._user = get_user_model().objects.create_user(
+            username=f"user{idx}", password="p", email=f"user{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        consumer._uploads = {}
+        consumers.append(consumer)
+    chats = Chat.objects.bulk_create(
+        Chat(title=f"chat {idx}", room="books", description="test description", user=consumers[idx]._user)
+        for idx in range(10)
+    )
+
+    for mode in ("off", "on"):
+        measure(mode, consumers, chats)
+
+
+def main():
+    if args.profile:
+        run()
+        return
+
+    # the database settings are read once per process
+    for profile in PROFILES:
+        subprocess.run([sys.executable, __file__, *sys.argv[1:], "--profile", profile], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ChatConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chat"
+
+    def ready(self):
+        import chat.signals  # noqa
+        from chat.services.search import install_search_indexes
+
+        post_migrate.connect(install_search_indexes, sender=self)
@@ -1,42 +1,107 @@
 import base64
 import logging
+import queue
 from io import BytesIO
 from typing import Optional
+from urllib.parse import parse_qs
 
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from chat.events import (
+    EventHandlers,
+    EventSchema,
+    Field,
+    RateLimitException,
+    WesocketException,
+)
 from chat.models.chat import Chat
-from chat.models.chatLike import ChatLike
 from chat.models.message import Message
-from chat.models.onlineUser import OnlineUser
 from chat.models.reaction import Reaction
+from chat.pagination import MessageCursorPagination
 from chat.serializers.message import MessageSerializer, WebsocketMessageSerializer
+from chat.serializers.reaction import ReactionSerializer
+from chat.services.event_log import get_event_log
+from chat.services.likes import toggle_chat_like
+from chat.services.message_buffer import MESSAGE_BUFFER, load_latest
+from chat.services.outbound import OutboundQueue
+from chat.services.presence import get_presence_backend
+from chat.services.rate_limit import get_rate_limiter
+from chat.services.user_card import load_user_card
+from chat.services.versions import CHAT_VERSIONS
+from chat.services.write_behind import MESSAGE_WRITER
 from django.conf import settings
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from files.services.chunked_upload import ChunkedUpload
 from files.services.file_upload import FileUploadService
-from files.services.images import get_image_format
-from files.utils import get_full_file_url
+from files.services.images import ImageProcessingUnavailable, get_image_processor
 
 logger = logging.getLogger(__name__)
 
 
-class WesocketException(Exception):
-    def __init__(self, error_message, message_id=None):
-        self.error_message = error_message
-        self.message_id = message_id
+handlers = EventHandlers()
+
+# The versions of chats may be kept in a shared cache (network I/O). They are read and changed in threads
+# of the default executor: not on the event loop and not in the thread of database_sync_to_async
+get_chat_version = sync_to_async(MESSAGE_BUFFER.get_version, thread_sensitive=False)
+update_buffered_message = sync_to_async(MESSAGE_BUFFER.update, thread_sensitive=False)
+increment_chat_version = sync_to_async(CHAT_VERSIONS.increment, thread_sensitive=False)
+
+MESSAGE_TEXT_MAX_LENGTH = Message._meta.get_field("text").max_length
+
+MESSAGE_ID_SCHEMA = EventSchema(id=Field("pk"))
+MESSAGE_UPDATE_SCHEMA = EventSchema(
+    id=Field("pk"), new_text=Field("str", allow_blank=False, max_length=MESSAGE_TEXT_MAX_LENGTH)
+)
+MESSAGE_REACTION_SCHEMA = EventSchema(id=Field("pk"), reaction=Field("str", allow_blank=False))
+UPLOAD_BEGIN_SCHEMA = EventSchema(name=Field("str", required=False, allow_null=True), size=Field("int"))
+UPLOAD_COMMIT_SCHEMA = EventSchema(upload_id=Field("str"))
+CHAT_MESSAGE_SCHEMA = EventSchema(
+    message=Field(
+        "dict",
+        schema=EventSchema(
+            chat=Field("pk"),
+            text=Field("str", required=False, allow_null=True, max_length=MESSAGE_TEXT_MAX_LENGTH),
+            attachments=Field("list", required=False),
+        ),
+    )
+)
+
+
+def outbound_key(event: dict) -> Optional[str]:
+    """
+    Key of the state changed by a presence, reaction or like event. For a slow client such events may be dropped
+    or replaced by a newer one with the same key (chat.services.outbound), other events are always sent.
+    """
+
+    event_type = event["event_type"]
+    if event_type in ("connected_user", "disconnected_user"):
+        return f"user:{event['user']['id']}"
+    if event_type in ("message_reaction_was_posted", "message_reaction_was_deleted"):
+        return f"reaction:{event['id']}:{event['user']}:{event['reaction']}"
+    if event_type in ("chat_was_liked", "chat_was_unliked"):
+        return f"like:{event['user']}"
+    return None
 
 
 class ChatConsumer(AsyncJsonWebsocketConsumer):
+    # frames to the client once the connection is accepted
+    _outbound: Optional[OutboundQueue] = None
+    # seq of the last event of the chat sent to the client, the group events are sent in seq order after it
+    _seq = 0
+
     async def connect(self):
         self._user = self.scope["user"]
+        # attachments uploaded in binary frames: upload_id -> ChunkedUpload
+        self._uploads = {}
+        # set when the connection is accepted
+        self._user_card = None
 
         if self._user is None:
             logger.debug(f"User is None. Rejecting connection")
             await self.close()
             return
 
-        self._username = await self.get_user_username(self._user)
-
         logger.debug(f"{self._user} WS connect.")
 
         self._room_name = self.scope["url_route"]["kwargs"]["room_name"]
@@ -44,48 +109,63 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         self._group_name = f"{self._room_name}-{self._chat_id}"
         logger.info(f"{self._user}. Chat {self._chat_id}. Channel: {self.channel_name}")
 
+        # the user card and the check of the chat in one query
+        user_card = await self.get_user_card()
+        if user_card is None:
+            logger.info(f"{self._user} Chat {self._chat_id} not found in room {self._room_name}. Rejecting connection")
+            await self.close()
+            return
+
         await self.accept()
+        self._user_card = user_card
+        self._outbound = OutboundQueue(self.send_frame, self.close, name=f"{self._user} chat {self._chat_id}")
+        self._outbound.start()
+        # Register the connection as online. Other tabs of the same user are counted once
+        logger.debug(f"{self._user} Adding user as online user")
+        is_first_connection = await get_presence_backend().connect(self._chat_id, self.channel_name, self._user_card)
         # Send Event connected_user
-        logger.debug(f"Sending connected_user event to chat: {self._chat_id} in room: {self._room_name}")
-        await self.channel_layer.group_send(
-            self._group_name,
-            {
-                "type": "send_connected_user",
-                "user": {
-                    "id": self._user.id,
-                    "username": self._user.username,
-                    "avatar": await self.get_user_avatar(self._user),
-                },
-            },
-        )
+        if is_first_connection:
+            logger.debug(f"Sending connected_user event to chat: {self._chat_id} in room: {self._room_name}")
+            await self.broadcast({"event_type": "connected_user", "user": self._user_card})
         # Add a user to a group of users in that chat
         logger.debug(f"{self._user} Adding user to group: {self._group_name}")
         await self.channel_layer.group_add(self._group_name, self.channel_name)
-        # Add user as online user in DB
-        logger.debug(f"{self._user} Adding user as online user in DB")
-        await self.create_online_user()
-        # Send yourself Event online_user_list
-        logger.debug(f"{self._user} Sending online_user_list event to chat: {self._chat_id} in room: {self._room_name}")
-        await self.send_online_user_list()
+        # seq of the last event before the state sent below, the events after it are received from the group
+        seq = self._seq = await get_event_log().current(self._chat_id)
+        # Send yourself the events missed since the last seq of the previous connection
+        last_seq = self.get_last_seq()
+        if last_seq is not None:
+            await self.send_missed_events(last_seq)
+        # Send yourself Event chat_history (the latest messages and online users) or Event online_user_list
+        history = self.get_history_limit()
+        if history:
+            await self.send_chat_history(history, seq)
+        else:
+            logger.debug(
+                f"{self._user} Sending online_user_list event to chat: {self._chat_id} in room: {self._room_name}"
+            )
+            await self.send_online_user_list(seq)
 
     async def disconnect(self, code):
+        if self._user_card is None:
+            # the connection was rejected
+            return
+
+        await self._outbound.stop()
+
         logger.info(f"{self._user} DISCONNECT: Chat {self._chat_id}. Room {self._room_name}")
 
-        # Delete user as online user from DB
-        await self.delete_online_user()
-        # Send Event disconnected_user
-        await self.channel_layer.group_send(
-            self._group_name,
-            {
-                "type": "send_disconnected_user",
-                "user": {
-                    "id": self._user.id,
-                    "username": self._user.username,
-                    "avatar": await self.get_user_avatar(self._user),
-                },
-            },
-        )
+        # Delete attachments which were uploaded but not sent
+        for upload in self._uploads.values():
+            upload.close()
+        self._uploads.clear()
+
+        # Remove the connection from online users
+        is_last_connection = await get_presence_backend().disconnect(self._chat_id, self.channel_name, self._user.id)
         await self.channel_layer.group_discard(self._group_name, self.channel_name)
+        # Send Event disconnected_user
+        if is_last_connection:
+            await self.broadcast({"event_type": "disconnected_user", "user": self._user_card})
 
     async def receive_json(self, content):
         logger.debug(
@@ -101,167 +181,193 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
 
         try:
             await self.process_received_content(content)
+        except RateLimitException as e:
+            logger.debug(f"{self._user} Event '{e.event_type}' is over the rate limit")
+            await self.send_error(e)
         except Exception as e:
             logger.error(f"{self._user} Error while processing received content: {e}")
-            data = {
-                "event_type": "error",
-                "error_message": e.message if hasattr(e, "message") else str(e),
-                "details": {"user_id": self._user.id, "user_name": self._user.username, "chat_id": self._chat_id},
-            }
+            await self.send_error(e)
 
-            if isinstance(e, WesocketException):
-                data["error_message"] = e.error_message
-                if e.message_id is not None:
-                    data["details"]["message_id"] = e.message_id
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if text_data is None and bytes_data is not None:
+            await self.receive_bytes(bytes_data)
+            return
 
-            await self.send_json(data)
+        await super().receive(text_data=text_data, bytes_data=bytes_data, **kwargs)
 
-    async def process_received_content(self, content):
-        """Process received content"""
-
-        # delete msg event
-        if content.get("event_type", None) == "message_was_deleted" and content.get("id", None):
-            logger.debug(f"{self._user} Message_was_deleted event. Content: {content}")
-
-            await self.delete_message(content["id"])
-            await self.channel_layer.group_send(
-                self._group_name,
-                {
-                    "type": "send_deleted_message",
-                    "id": content["id"],
-                    "event_type": content["event_type"],
-                },
-            )
-            return
+    async def receive_bytes(self, bytes_data):
+        """Binary frame is a chunk of an attachment: 32 bytes of upload_id (hex) + chunk data"""
 
-        # update msg event
-        if (
-            content.get("event_type", None) == "message_was_updated"
-            and content.get("id", None)
-            and content.get("new_text", None)
-        ):
-            logger.debug(f"{self._user} Message_was_updated event. Content: {content}")
-
-            # validate msg
-            valid_message = await self._validate(
-                {"event_type": "chat_message", "message": {"chat": self._chat_id, "text": content["new_text"]}}
-            )
+        upload_id = bytes_data[:32].decode("ascii", errors="replace")
+        try:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                raise WesocketException("Attachment upload with the specified ID was not found")
 
-            await self.update_message(content["id"], content["new_text"])
-            await self.channel_layer.group_send(
-                self._group_name,
-                {
-                    "type": "send_updated_message",
-                    "id": content["id"],
-                    "new_text": content["new_text"],
-                    "event_type": content["event_type"],
-                },
-            )
-            return
+            try:
+                upload.write(bytes_data[32:])
+            except Exception:
+                self._uploads.pop(upload_id).close()
+                raise
+        except Exception as e:
+            logger.error(f"{self._user} Error while processing attachment chunk of upload '{upload_id}': {e}")
+            await self.send_error(e)
 
-        # delete chat event
-        if content.get("event_type", None) == "chat_was_deleted":
-            logger.debug(f"{self._user} Chat_was_deleted event. Content: {content}")
-            await self.delete_chat()
-            await self.channel_layer.group_send(
-                self._group_name,
-                {
-                    "type": "send_deleted_chat",
-                    "event_type": content["event_type"],
-                },
-            )
-            return
+    async def send_error(self, e: Exception):
+        """Send error event to yourself"""
 
-        # chat was liked event
-        if content.get("event_type", None) == "chat_was_liked/unliked":
-            logger.debug(f"{self._user} chat_was_liked/unliked event. Content: {content}")
-
-            event_type = await self.like_chat(self._user)
-            await self.channel_layer.group_send(
-                self._group_name,
-                {
-                    "type": "send_liked_chat",
-                    "username": self._user.username,
-                    "event_type": event_type,
-                },
-            )
-            return
+        data = {
+            "event_type": "error",
+            "error_message": e.message if hasattr(e, "message") else str(e),
+            "details": {"user_id": self._user.id, "user_name": self._user.username, "chat_id": self._chat_id},
+        }
 
-        # message reaction event
-        if (
-            content.get("event_type", None) == "message_reaction"
-            and content.get("id", None)
-            and content.get("reaction", None)
-        ):
-            logger.debug(f"{self._user} message_reaction event. Content: {content}")
-
-            event_type = await self.message_reaction(content["id"], content["reaction"], self._user)
-            await self.channel_layer.group_send(
-                self._group_name,
-                {
-                    "type": "send_message_reaction",
-                    "id": content["id"],
-                    "reaction": content["reaction"],
-                    "username": self._user.username,
-                    "event_type": event_type,
-                },
-            )
-            return
+        if isinstance(e, WesocketException):
+            data["error_message"] = e.error_message
+            if e.message_id is not None:
+                data["details"]["message_id"] = e.message_id
+        if isinstance(e, RateLimitException):
+            data["details"].update({"event_type": e.event_type, "retry_after": round(e.retry_after, 3)})
 
-        # Validate received msg
-        valid_message = await self._validate(content)
+        await self.send_json(data)
 
-        # Save valid msg to db
-        saved_message = await self._save_message(valid_message, content.get("message", {}).get("attachments", []))
+    async def process_received_content(self, content):
+        """Validate received content by the schema of its event type and call the event handler"""
 
-        # Send message to group
-        msg_json = await self._serialize_message(saved_message)
-        await self.channel_layer.group_send(
-            self._group_name,
+        event_type = content.get("event_type", "chat_message")
+        schema, handler = handlers.get(event_type)
+        retry_after = await get_rate_limiter().acquire(event_type, self._user.id, self._chat_id)
+        if retry_after:
+            raise RateLimitException(event_type, retry_after)
+        schema.validate(content)
+        await handler(self, content)
+
+    @handlers.register("attachment_upload_begin", UPLOAD_BEGIN_SCHEMA)
+    async def on_attachment_upload_begin(self, content):
+        """Start attachment upload"""
+
+        logger.debug(f"{self._user} Attachment_upload_begin event. Content: {content}")
+
+        if len(self._uploads) >= settings.MAX_UPLOADS_PER_CONNECTION:
+            raise WesocketException("Too many attachment uploads in progress")
+
+        upload = ChunkedUpload(content.get("name", None) or "attachment", content["size"])
+        self._uploads[upload.id] = upload
+        await self.send_json(
             {
-                "type": "send_message",
-                "message": msg_json,
-            },
+                "event_type": "attachment_upload_started",
+                "upload_id": upload.id,
+                "chunk_size": settings.UPLOAD_CHUNK_SIZE,
+            }
         )
 
-    @database_sync_to_async
-    def _serialize_message(self, message) -> dict:
-        return WebsocketMessageSerializer(instance={"message": message, "event_type": "chat_message"}).data
+    @handlers.register("attachment_upload_commit", UPLOAD_COMMIT_SCHEMA)
+    async def on_attachment_upload_commit(self, content):
+        """Finish attachment upload"""
 
-    @database_sync_to_async
-    def _validate(self, content) -> Optional[Message]:
-        """Validate websocket message and chat message"""
+        logger.debug(f"{self._user} Attachment_upload_commit event. Content: {content}")
 
-        def _content():
-            return str(content)[:200]
+        upload = self._uploads.get(content["upload_id"])
+        if upload is None:
+            raise WesocketException("Attachment upload with the specified ID was not found")
 
-        # Validate websocket message
-        websocket_message = WebsocketMessageSerializer(data=content)
-        if not websocket_message.is_valid():
-            logger.error(
-                f"{self._user} INVALID MESSAGE: Msg: {_content()}. Chat {self._chat_id}. Err: {websocket_message.errors}"
-            )
-            raise WesocketException(self.errors_to_str(websocket_message.errors))
+        try:
+            await upload.commit()
+        except Exception:
+            self._uploads.pop(upload.id).close()
+            raise
 
-        # Validate chat message
-        message = MessageSerializer(data=websocket_message.data["message"], context={"user": self._user})
-        if not message.is_valid():
-            logger.error(f"{self._user} INVALID MESSAGE: Msg: {_content()}. Chat: {self._chat_id}.")
-            raise WesocketException("Invalid message: " + str(message.errors))
+        await self.send_json({"event_type": "attachment_upload_committed", "upload_id": upload.id})
+
+    @handlers.register("message_was_deleted", MESSAGE_ID_SCHEMA)
+    async def on_message_was_deleted(self, content):
+        logger.debug(f"{self._user} Message_was_deleted event. Content: {content}")
+
+        await self.delete_message(content["id"])
+        await self.broadcast({"event_type": content["event_type"], "id": content["id"]})
+
+    @handlers.register("message_was_updated", MESSAGE_UPDATE_SCHEMA)
+    async def on_message_was_updated(self, content):
+        logger.debug(f"{self._user} Message_was_updated event. Content: {content}")
+
+        await self.update_message(content["id"], content["new_text"])
+        await self.broadcast(
+            {"event_type": content["event_type"], "id": content["id"], "new_text": content["new_text"]}
+        )
+
+    @handlers.register("chat_was_deleted")
+    async def on_chat_was_deleted(self, content):
+        logger.debug(f"{self._user} Chat_was_deleted event. Content: {content}")
+
+        await self.delete_chat()
+        await self.broadcast({"event_type": content["event_type"], "id": self._chat_id})
+
+    @handlers.register("chat_was_liked/unliked")
+    async def on_chat_was_liked(self, content):
+        logger.debug(f"{self._user} chat_was_liked/unliked event. Content: {content}")
+
+        event_type = await self.like_chat(self._user)
+        await self.broadcast({"event_type": event_type, "id": self._chat_id, "user": self._user.username})
+
+    @handlers.register("message_reaction", MESSAGE_REACTION_SCHEMA)
+    async def on_message_reaction(self, content):
+        logger.debug(f"{self._user} message_reaction event. Content: {content}")
 
-        if not content.get("message", {}).get("text", None) and not content.get("message", {}).get("attachments", None):
-            logger.error(f"{self._user} INVALID MESSAGE: Msg: {_content()}. Chat: {self._chat_id}.")
+        event_type = await self.message_reaction(content["id"], content["reaction"], self._user)
+        await self.broadcast(
+            {
+                "event_type": event_type,
+                "id": content["id"],
+                "reaction": content["reaction"],
+                "user": self._user.username,
+            }
+        )
+
+    @handlers.register("chat_message", CHAT_MESSAGE_SCHEMA)
+    async def on_chat_message(self, content):
+        message = content["message"]
+        if not message.get("text", None) and not message.get("attachments", None):
+            logger.error(f"{self._user} INVALID MESSAGE: Msg: {str(content)[:200]}. Chat: {self._chat_id}.")
             raise WesocketException("Invalid message: text or attachments is required")
 
-        return message
+        # Decode attachments and check their format in the image processing workers
+        attachments = await self._prepare_attachments(message.get("attachments", []))
+
+        # Save msg to db
+        saved_message, since = await self._save_message(message, attachments)
+
+        # Send message to group
+        msg_json = await self._serialize_message(saved_message, since)
+        await self.broadcast(msg_json)
 
     @database_sync_to_async
-    def _save_message(self, message, attachments):
-        """Save MSG to DB"""
+    def _serialize_message(self, message, since: int) -> dict:
+        """Serialize the saved message and add it to the buffered latest messages of the chat"""
 
-        # save attachments
-        files = []
+        message = MessageSerializer.prefetch_instance(message)
+        data = WebsocketMessageSerializer(instance={"message": message, "event_type": "chat_message"}).data
+        MESSAGE_BUFFER.append(message.chat_id, since, MessageCursorPagination.encode_cursor(message), data["message"])
+        return data
+
+    async def _prepare_attachments(self, attachments) -> list[tuple[FileUploadService, str, Optional[ChunkedUpload]]]:
+        """Return (file upload service, image format, upload) for each attachment"""
+
+        prepared = []
         for attachment in attachments:
+            # attachment uploaded in binary frames: {'upload_id': '8f1c...'}
+            if "upload_id" in attachment:
+                upload = self._uploads.get(attachment["upload_id"])
+                if upload is None or not upload.is_committed:
+                    raise WesocketException("Attachment upload with the specified ID was not found or not committed")
+
+                if any(upload is item[2] for item in prepared):
+                    continue
+
+                logger.info(f"Processing uploaded attachment: '{upload.id}'")
+                service = FileUploadService(user=self._user, file_obj=upload.file)
+                prepared.append((service, upload.file.content_type, upload))
+                continue
+
             logger.info(f"Processing attachment with name: '{attachment.get('name', None)}'")
             logger.debug(f" - Content sample: {attachment.get('content', None)[:64]}")
 
@@ -295,44 +401,113 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             service = FileUploadService(user=self._user, file_obj=in_memory_file)
 
             try:
-                format = get_image_format(in_memory_file)
+                format = await get_image_processor().aget_format(in_memory_file)
                 in_memory_file.content_type = format
                 logger.debug(f" - File format: {format}")
+            except ImageProcessingUnavailable:
+                raise
             except Exception:
                 logger.error(f" - File is not an image.")
                 raise WesocketException("File is not an image or image format is not supported.") from None
 
-            file = service.create(file_type=format)
-            files.append(file)
+            prepared.append((service, format, None))
+
+        return prepared
+
+    @database_sync_to_async
+    def _save_message(self, data: dict, attachments) -> tuple[Message, int]:
+        """
+        Save MSG to DB. The event is already checked by its schema, the serializer checks the DB constraints.
+        Return the message and the version of its chat before it.
+        """
+
+        message = MessageSerializer(data=data, context={"user": self._user})
+        if not message.is_valid():
+            logger.error(
+                f"{self._user} INVALID MESSAGE: Msg: {str(data)[:200]}. Chat {self._chat_id}. Err: {message.errors}"
+            )
+            raise WesocketException(self.errors_to_str({"message": message.errors}))
+
+        since = MESSAGE_BUFFER.get_version(message.validated_data["chat"].id)
+        if not attachments and MESSAGE_WRITER.enabled:
+            # written later in a batch, the message gets its id now
+            try:
+                return MESSAGE_WRITER.save(Message(user=self._user, **message.validated_data)), since
+            except queue.Full:
+                raise WesocketException("The server is busy. Try to send the message later")
 
-        message.validated_data["attachments"] = files
+        # save attachments
+        message.validated_data["attachments"] = [service.create(file_type=format) for service, format, _ in attachments]
         # save message
-        return message.save()
+        saved_message = message.save()
 
-    async def send_message(self, event):
-        logger.debug(f"Chat_message. Sending message to chat: {self._chat_id} in room: {self._room_name}")
-        await self.send_json(event["message"])
+        for _, _, upload in attachments:
+            if upload is not None:
+                self._uploads.pop(upload.id).close()
 
-    async def send_connected_user(self, event):
-        logger.debug(f"Event connected_user. Sending user joined to chat: {self._chat_id} in room: {self._room_name}")
+        return saved_message, since
 
-        connected_event = {
-            "event_type": "connected_user",
-            "user": event["user"],
-        }
-        await self.send_json(connected_event)
+    async def broadcast(self, event: dict):
+        """
+        Send event to all users in the chat. The event is encoded to JSON once for all of them,
+        stamped with the next seq of the chat and kept in the event log for reconnecting clients
+        """
 
-    async def send_disconnected_user(self, event):
-        logger.debug(
-            f"Event disconnected_user. Sending user joined to chat: {self._chat_id} in room: {self._room_name}"
+        seq, text = await get_event_log().append(self._chat_id, await self.encode_json(event))
+        logger.debug(f"Send '{event['event_type']}' ({seq}) to chat: {self._chat_id}, room: {self._room_name}")
+        await self.channel_layer.group_send(
+            self._group_name,
+            {
+                "type": "send_broadcast",
+                "event_type": event["event_type"],
+                "seq": seq,
+                "text": text,
+                "key": outbound_key(event),
+            },
         )
-        disconnected_event = {
-            "event_type": "disconnected_user",
-            "user": event["user"],
-        }
-        await self.send_json(disconnected_event)
 
-    async def send_online_user_list(self):
+    async def send_broadcast(self, event):
+        """
+        Send the group event to the client in seq order. The seq and the group_send are separate steps,
+        so events of several workers may reach the group out of order, and the channel layer may lose events
+        of a full channel. After a gap the missing events are sent from the event log, and events which
+        arrive later with a lower seq are skipped: they were sent already.
+        """
+
+        # no per-subscriber logging here: it is called for every user in the chat
+        seq = event.get("seq")
+        if seq is not None:
+            if seq <= self._seq:
+                return
+            if seq > self._seq + 1:
+                logger.debug(f"{self._user} Events of chat {self._chat_id} after {self._seq} are sent from the log")
+                sent = await self.send_missed_events(self._seq)
+                if sent is not None and self._seq + sent >= seq:
+                    self._seq += sent
+                    return
+            self._seq = seq
+
+        await self.send(text_data=event["text"], key=event.get("key"))
+
+    async def send(self, text_data=None, bytes_data=None, close=False, key=None):
+        """Queue a text frame to the client in the outbound queue, key: see outbound_key()"""
+
+        if self._outbound is None or text_data is None or close:
+            await super().send(text_data, bytes_data, close)
+            return
+
+        await self._outbound.put(text_data, key)
+
+    async def send_json(self, content, close=False):
+        # AsyncJsonWebsocketConsumer.send_json() calls send() of its base class
+        await self.send(text_data=await self.encode_json(content), close=close)
+
+    async def send_frame(self, text: str):
+        """Send the text frame to the client, called by the writer task of the outbound queue"""
+
+        await super().send(text_data=text)
+
+    async def send_online_user_list(self, seq: int):
         logger.debug(
             f"Event online_user_list. Sending online users in chat: {self._chat_id} in room: {self._room_name}"
         )
@@ -340,128 +515,132 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         online_users_event = {
             "event_type": "online_user_list",
             "user_list": await self.get_online_users(),
+            "seq": seq,
         }
         await self.send_json(online_users_event)
 
-    async def send_deleted_message(self, event):
-        event_type = event["event_type"]
-        logger.debug(f"Send '{event_type}' to {self._user.username}, chat: {self._chat_id} in room: {self._room_name}")
+    def get_query_param(self, name: str, default: str = None) -> Optional[str]:
+        """Return a parameter of the query string of the websocket URL"""
 
-        deleted_msg_event = {
-            "event_type": event["event_type"],
-            "id": event["id"],
-        }
+        return parse_qs(self.scope.get("query_string", b"").decode("utf-8")).get(name, [default])[0]
 
-        await self.send_json(deleted_msg_event)
+    def get_history_limit(self) -> int:
+        """Return the number of the latest messages requested by "?history=<N>" on connect, 0 if not requested"""
 
-    async def send_updated_message(self, event):
-        event_type = event["event_type"]
-        logger.debug(f"Send '{event_type}' to {self._username}, chat: {self._chat_id}, room: {self._room_name}")
-
-        updated_msg_event = {
-            "event_type": event["event_type"],
-            "id": event["id"],
-            "new_text": event["new_text"],
-        }
-
-        await self.send_json(updated_msg_event)
-
-    async def send_deleted_chat(self, event):
-        event_type = event["event_type"]
-        logger.debug(f"Send '{event_type}' to {self._username}, chat: {self._chat_id}, room: {self._room_name}")
-
-        deleted_chat_event = {
-            "event_type": event_type,
-            "id": self._chat_id,
-        }
-
-        await self.send_json(deleted_chat_event)
-
-    async def send_liked_chat(self, event):
-        logger.debug(f"Event chat_was_liked. Sending liked Chat: {self._chat_id} by user: {event['username']}")
-        liked_chat_event = {"event_type": event["event_type"], "id": self._chat_id, "user": event["username"]}
-        await self.send_json(liked_chat_event)
-
-    # send_message_reaction
-    async def send_message_reaction(self, event):
-        logger.debug(f"Sending msg reaction to chat: {self._chat_id} in room: {self._room_name}")
+        history = self.get_query_param("history", "0")
+        try:
+            return min(max(int(history), 0), MESSAGE_BUFFER.size)
+        except ValueError:
+            logger.warning(f"{self._user} Invalid history parameter: '{history[:20]}'. Chat {self._chat_id}")
+            return 0
 
-        msg_reaction_event = {
-            "event_type": event["event_type"],
-            "id": event["id"],
-            "reaction": event["reaction"],
-            "user": event["username"],
-        }
+    def get_last_seq(self) -> Optional[int]:
+        """Return the last seq received by the previous connection, "?last_seq=<seq>" on reconnect"""
 
-        await self.send_json(msg_reaction_event)
+        last_seq = self.get_query_param("last_seq")
+        if last_seq is None:
+            return None
 
-    @database_sync_to_async
-    def create_online_user(self):
-        new, _ = OnlineUser.objects.get_or_create(user=self._user, chat_id=self._chat_id)
+        try:
+            return int(last_seq)
+        except ValueError:
+            logger.warning(f"{self._user} Invalid last_seq parameter: '{last_seq[:20]}'. Chat {self._chat_id}")
+            return None
+
+    async def send_missed_events(self, last_seq: int) -> Optional[int]:
+        """
+        Send yourself the logged events after last_seq as they were broadcast or Event resync_required.
+        Return the number of sent events, None if some of them aren't logged anymore
+        """
+
+        events = await get_event_log().since(self._chat_id, last_seq)
+        if events is None:
+            logger.debug(f"Event resync_required. Events of chat {self._chat_id} since {last_seq} are not logged")
+            await self.send_json({"event_type": "resync_required"})
+            return None
+
+        logger.debug(f"Sending {len(events)} events of chat {self._chat_id} since {last_seq}")
+        for text in events:
+            await self.send(text_data=text)
+        return len(events)
+
+    async def send_chat_history(self, limit: int, seq: int):
+        """
+        Send yourself the latest messages and online users in one frame.
+        It is read after group_add: a message sent meanwhile arrives after it as an event (maybe also in the frame),
+        so no message is lost between the history and the events.
+        """
+
+        logger.debug(f"Event chat_history. Sending {limit} latest messages of chat: {self._chat_id}")
+
+        messages, has_older = await self.get_latest_messages()
+        has_older = has_older or len(messages) > limit
+        messages = messages[-limit:]
+        await self.send_json(
+            {
+                "event_type": "chat_history",
+                "messages": [message for _, message in messages],
+                # cursor for "before" of the message history API
+                "before": messages[0][0] if has_older and messages else None,
+                "user_list": await self.get_online_users(),
+                "seq": seq,
+            }
+        )
 
     @database_sync_to_async
-    def delete_online_user(self):
-        OnlineUser.objects.filter(user=self._user, chat_id=self._chat_id).delete()
+    def get_latest_messages(self) -> tuple[list[tuple[str, dict]], bool]:
+        """Return the latest messages of the chat from MESSAGE_BUFFER, loaded by one query if they aren't buffered"""
 
-    @database_sync_to_async
-    def get_user_avatar(self, user):
-        return get_full_file_url(user.profile.avatar.url)
+        messages = MessageSerializer.prefetch(Message.objects.filter(chat_id=self._chat_id))
+        return MESSAGE_BUFFER.get_latest(self._chat_id, lambda: load_latest(messages))
 
     @database_sync_to_async
-    def get_user_username(self, user):
-        return user.username
+    def get_user_card(self) -> Optional[dict]:
+        return load_user_card(self._user.id, self._chat_id, self._room_name)
 
-    @database_sync_to_async
-    def get_online_users(self):
+    async def get_online_users(self):
         """Return list of online users in that chat excluding yourself"""
 
-        querySet = OnlineUser.objects.filter(chat_id=self._chat_id).exclude(user=self._user)
-        online_users = []
+        return await get_presence_backend().online_users(self._chat_id, exclude_user_id=self._user.id)
 
-        for online_user in querySet:
-            online_users.append(
-                {
-                    "id": online_user.user.id,
-                    "username": online_user.user.username,
-                    "avatar": get_full_file_url(online_user.user.profile.avatar.url),
-                }
-            )
-        return online_users
+    async def get_message(self, id):
+        return await Message.objects.filter(pk=id).afirst()
 
-    @database_sync_to_async
-    def get_message(self, id):
-        msg = Message.objects.filter(pk=id).first()
-        if msg:
-            return msg
+    async def wait_written(self, id):
+        """Wait until the message is written if it is queued by write-behind"""
 
-    @database_sync_to_async
-    def delete_message(self, id):
+        await MESSAGE_WRITER.await_written(id)
+
+    async def delete_message(self, id):
         """Return True and delete msg if the user from request is a message author.
         Return False, if the user from the request isn't a message author or msg is absent"""
 
-        msg = Message.objects.filter(pk=id).first()
+        await self.wait_written(id)
+        msg = await Message.objects.filter(pk=id).afirst()
 
         if not msg:
             logger.debug(f"Delete_message. The message with the specified ID is absent")
             raise WesocketException("Message with the specified ID was not found", id)
 
         # Is the user from the request isn't a message author
-        if self._user.username != msg.user.username:
+        if msg.user_id != self._user.id:
             logger.debug(f"Delete_message. The user from the request isn't a message author")
             raise WesocketException("You are not the author of this message", id)
 
-        msg.delete()
+        since = await get_chat_version(msg.chat_id)
+        await msg.adelete()
+        await update_buffered_message(msg.chat_id, since, msg.id, text=msg.text, is_deleted=msg.is_deleted)
         logger.debug(
             f"Delete_message. The Msg: {msg.id} was deleted from chat: {self._chat_id} in room: {self._room_name}"
         )
         return True
 
-    @database_sync_to_async
-    def update_message(self, id, new_text):
+    async def update_message(self, id, new_text):
         """Return True and update msg if the user from request is a message author.
         Return False, if the user from the request isn't a message author, msg is absent"""
 
-        msg = Message.objects.filter(pk=id).first()
+        await self.wait_written(id)
+        msg = await Message.objects.filter(pk=id).afirst()
 
         if not msg:
             logger.debug(f"Update_message. The message with the specified ID is absent")
@@ -472,66 +651,74 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             raise WesocketException("A deleted message cannot be edited because it is deleted", id)
 
         # Is the user from the request isn't a message author
-        if self._user.username != msg.user.username:
+        if msg.user_id != self._user.id:
             logger.debug(f"Update_message. The user from the request isn't a message author")
             raise WesocketException("You are not the author of this message", id)
 
+        since = await get_chat_version(msg.chat_id)
         msg.text = new_text
-        msg.save()
+        await msg.asave()
+        await update_buffered_message(msg.chat_id, since, msg.id, text=msg.text)
         logger.debug(f"Update_message. The Msg: {msg.id} was updated in chat: {self._chat_id}, room: {self._room_name}")
         return True
 
-    @database_sync_to_async
-    def delete_chat(self):
+    async def delete_chat(self):
         """Return True and delete chat if the user from request is a chat author.
         Return False, if the user from the request isn't a chat author"""
 
-        chat = Chat.objects.get(pk=self._chat_id)
+        chat = await Chat.objects.aget(pk=self._chat_id)
 
         # Is the user from the request isn't a chat author
-        if self._user.username != chat.user.username and self._user.email not in settings.STAFF_USERS:
+        if chat.user_id != self._user.id and self._user.email not in settings.STAFF_USERS:
             logger.debug(f"Delete_chat. The user from the request isn't a chat author")
             raise WesocketException("You are not the author of this chat")
 
-        chat.delete()
+        await chat.adelete()
         logger.info(f"Delete_chat. The Chat: {self._chat_id} was deleted in room: {self._room_name}")
         return True
 
-    # like_chat
     @database_sync_to_async
     def like_chat(self, user):
         """Return 'chat_was_liked' and save like in DB.
         Return 'chat_was_unliked' and del like if this user already liked this chat."""
 
-        chat_like = ChatLike.objects.filter(user=user, chat_id=self._chat_id).first()
+        # a transaction, the async ORM has none
         logger.debug(f"{user} Like_chat. Chat: {self._chat_id}. Room: {self._room_name}")
+        return "chat_was_liked" if toggle_chat_like(user, self._chat_id) else "chat_was_unliked"
 
-        if not chat_like:
-            new, _ = ChatLike.objects.get_or_create(user=user, chat_id=self._chat_id)
-            logger.debug(f"Like_chat. The Chat: {self._chat_id} was liked in room: {self._room_name}")
-            return "chat_was_liked"
-        else:
-            # If this user already liked this chat -> del this like
-            chat_like.delete()
-            logger.debug(f"Like_chat. The Chat: {self._chat_id} was unliked in room: {self._room_name}")
-            return "chat_was_unliked"
-
-    @database_sync_to_async
-    def message_reaction(self, id, reaction, user):
+    async def message_reaction(self, id, reaction, user):
         """Return 'message_reaction_was_posted' and save reaction in DB.
         Return 'message_reaction_was_deleted' and del reaction if this user already reacted this msg."""
 
-        msg_reaction = Reaction.objects.filter(user=user, message_id=id).first()
+        await self.wait_written(id)
+        msg_reaction = await Reaction.objects.filter(user=user, message_id=id).select_related("message").afirst()
+        # the message may be of another chat, then the buffered chat of the consumer isn't changed
+        since = await get_chat_version(self._chat_id)
 
         if not msg_reaction:
-            new, _ = Reaction.objects.get_or_create(user=user, message_id=id, reaction=reaction)
+            new, _ = await Reaction.objects.aget_or_create(user=user, message_id=id, reaction=reaction)
+            await self._update_buffered_reactions(id, since)
             logger.debug(f"Message_reaction. The user: {user} msg: {id}, reaction: {reaction} was posted")
             return "message_reaction_was_posted"
         else:
-            msg_reaction.delete()
+            await msg_reaction.adelete()
+            # posted reactions change it in chat.signals. Not in a transaction, it is committed
+            await increment_chat_version(msg_reaction.message.chat_id)
+            await self._update_buffered_reactions(id, since)
             logger.debug(f"Message_reaction. The user: {user} msg: {id}, reaction: {reaction} was deleted")
             return "message_reaction_was_deleted"
 
+    async def _update_buffered_reactions(self, id, since: int):
+        """Change reactions of the message in the buffered latest messages of the chat"""
+
+        if not MESSAGE_BUFFER.contains(self._chat_id, id):
+            await update_buffered_message(self._chat_id, since, id)
+            return
+
+        reactions = Reaction.objects.filter(message_id=id).select_related("user").order_by("id")
+        reactions = [reaction async for reaction in reactions]
+        await update_buffered_message(self._chat_id, since, id, reactions=ReactionSerializer(reactions, many=True).data)
+
     def errors_to_str(self, errors):
         res = []
 
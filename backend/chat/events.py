@@ -0,0 +1,131 @@
+from typing import Optional
+
+
+class WesocketException(Exception):
+    def __init__(self, error_message, message_id=None):
+        self.error_message = error_message
+        self.message_id = message_id
+
+
+class RateLimitException(WesocketException):
+    """The event is over a rate limit, retry_after: seconds until it is allowed"""
+
+    def __init__(self, event_type: str, retry_after: float):
+        super().__init__("Too many events. Try again later")
+        self.event_type = event_type
+        self.retry_after = retry_after
+
+
+class Field:
+    """
+    Field of a websocket event schema.
+    kind: "str", "int", "pk" (int or numeric str), "list" or "dict" (nested schema)
+    """
+
+    __slots__ = ("name", "kind", "types", "required", "allow_null", "allow_blank", "max_length", "schema")
+
+    TYPES = {"str": (str,), "int": (int,), "pk": (int, str), "list": (list,), "dict": (dict,)}
+    INVALID = {
+        "str": "Not a valid string.",
+        "int": "A valid integer is required.",
+        "pk": "Incorrect type. Expected pk value.",
+        "list": "Expected a list of items.",
+        "dict": "Invalid data. Expected a dictionary.",
+    }
+
+    def __init__(
+        self,
+        kind: str,
+        required: bool = True,
+        allow_null: bool = False,
+        allow_blank: bool = True,
+        max_length: int = None,
+        schema: "EventSchema" = None,
+    ):
+        self.name = None
+        self.kind = kind
+        self.types = self.TYPES[kind]
+        self.required = required
+        self.allow_null = allow_null
+        self.allow_blank = allow_blank
+        self.max_length = max_length
+        self.schema = schema
+
+    def error(self, prefix: str, text: str) -> WesocketException:
+        return WesocketException(f"{prefix}{self.name}: {text}")
+
+    def validate(self, value, prefix: str):
+        if value is None or (self.kind == "pk" and value == ""):
+            if self.allow_null:
+                return
+            raise self.error(prefix, "This field may not be null.")
+
+        # bool is a subclass of int
+        if value.__class__ not in self.types or value is True or value is False:
+            raise self.error(prefix, self.INVALID[self.kind])
+
+        if self.kind == "pk" and value.__class__ is str and not value.isdigit():
+            raise self.error(prefix, self.INVALID[self.kind])
+
+        if not self.allow_blank and value.__class__ is str and not value.strip():
+            raise self.error(prefix, "This field may not be blank.")
+
+        if self.max_length is not None and len(value) > self.max_length:
+            raise self.error(prefix, f"Ensure this field has no more than {self.max_length} characters.")
+
+        if self.schema is not None:
+            self.schema.validate(value, f"{prefix}{self.name}: ")
+
+
+class EventSchema:
+    """
+    Required fields, types and length limits of a websocket event.
+    Fields are compiled to a tuple once, validation doesn't touch DB and doesn't allocate for valid events.
+    """
+
+    __slots__ = ("fields",)
+
+    def __init__(self, **fields: Field):
+        for name, field in fields.items():
+            field.name = name
+        self.fields = tuple(fields.values())
+
+    def validate(self, content: dict, prefix: str = ""):
+        """Raise WesocketException if content doesn't match the schema"""
+
+        for field in self.fields:
+            value = content.get(field.name, Field)
+            if value is Field:
+                if field.required:
+                    raise field.error(prefix, "This field is required.")
+                continue
+
+            field.validate(value, prefix)
+
+
+class EventHandlers:
+    """Registry of websocket event handlers: event_type -> (schema, handler coroutine)"""
+
+    def __init__(self):
+        self._handlers: dict[str, tuple[EventSchema, callable]] = {}
+
+    def register(self, event_type: str, schema: Optional[EventSchema] = None):
+        """Decorator to register consumer method as handler of the event type"""
+
+        def decorator(func):
+            self._handlers[event_type] = (schema or EventSchema(), func)
+            return func
+
+        return decorator
+
+    def get(self, event_type) -> tuple[EventSchema, callable]:
+        """Return schema and handler of the event type"""
+
+        handler = self._handlers.get(event_type, None)
+        if handler is None:
+            raise WesocketException(f"event_type: Unknown event type '{event_type}'")
+
+        return handler
+
+    def __contains__(self, event_type):
+        return event_type in self._handlers
@@ -12,11 +12,11 @@ class JWTAuthMiddleware:
         self.app = app
 
     async def __call__(self, scope, receive, send):
-        user, token = await self._authenticate(scope)
+        auth = CustomJWTAuthentication()
+        # a cached token and user don't need the thread of database_sync_to_async
+        authenticated = auth.authenticate_cached(scope)
+        if authenticated is None:
+            authenticated = await database_sync_to_async(auth.authenticate)(scope)
+        user, token = authenticated
         scope["user"] = user
         return await self.app(scope, receive, send)
-
-    @database_sync_to_async
-    def _authenticate(self, scope):
-        auth = CustomJWTAuthentication()
-        return auth.authenticate(scope)
@@ -0,0 +1,11 @@
+from chat.services.search import SEARCH_INDEXES
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Index all chats again (e.g. after the DB was restored or moved to another DB backend)"
+
+    def handle(self, *args, **options):
+        for index in SEARCH_INDEXES:
+            index.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Search index '{index.name}' was rebuilt"))
@@ -0,0 +1,18 @@
+from chat.services.likes import reconcile_likes_count
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Fix Chat.likes_count which differ from the number of chat likes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only print chats with wrong likes_count")
+
+    def handle(self, *args, **options):
+        drifted = reconcile_likes_count(dry_run=options["dry_run"])
+
+        for chat_id, likes_count, actual_likes in drifted:
+            self.stdout.write(f"Chat {chat_id}: likes_count {likes_count}, likes {actual_likes}")
+
+        action = "found" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted)} chat(s) {action}"))
@@ -0,0 +1,15 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:26
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0019_alter_message_text"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="OnlineUser",
+        ),
+    ]
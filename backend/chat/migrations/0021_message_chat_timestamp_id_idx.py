@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0020_delete_onlineuser"),
+        ("files", "0002_alter_file_original_file_name"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["chat", "timestamp", "id"], name="message_chat_timestamp_id_idx"),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def count_likes(apps, schema_editor):
+    """Delete duplicated likes (the same user and chat) and fill likes_count"""
+
+    Chat = apps.get_model("chat", "Chat")
+    ChatLike = apps.get_model("chat", "ChatLike")
+
+    duplicates = ChatLike.objects.values("user", "chat").annotate(first=Min("id"), n=Count("id")).filter(n__gt=1)
+    for like in duplicates:
+        ChatLike.objects.filter(user=like["user"], chat=like["chat"]).exclude(id=like["first"]).delete()
+
+    for chat in Chat.objects.annotate(n=Count("chatlike")).filter(n__gt=0):
+        Chat.objects.filter(pk=chat.pk).update(likes_count=chat.n)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0021_message_chat_timestamp_id_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chat",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(fields=["room", "likes_count"], name="chat_room_likes_count_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="chatlike",
+            constraint=models.UniqueConstraint(fields=("user", "chat"), name="unique_chat_like"),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+import chat.models.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0022_chat_likes_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatSearchDocument",
+            fields=[
+                (
+                    "chat",
+                    models.OneToOneField(
+                        db_column="id",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="chat.chat",
+                    ),
+                ),
+                ("title", models.TextField()),
+                ("description", models.TextField()),
+                ("document", chat.models.search.FullTextField(db_column="chat_chat_fts")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "chat_chat_fts",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="SearchToken",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("index", models.CharField(max_length=20)),
+                ("object_id", models.BigIntegerField()),
+                ("token", models.CharField(max_length=100)),
+                ("weight", models.FloatField(default=1)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["index", "token"], name="search_token_idx"),
+                    models.Index(fields=["index", "object_id"], name="search_token_object_idx"),
+                ],
+            },
+        ),
+    ]
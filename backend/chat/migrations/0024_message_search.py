@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:42
+
+import chat.models.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0023_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageSearchDocument",
+            fields=[
+                (
+                    "message",
+                    models.OneToOneField(
+                        db_column="id",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="chat.message",
+                    ),
+                ),
+                ("rowid", models.BigIntegerField()),
+                ("text", models.TextField()),
+                ("document", chat.models.search.FullTextField(db_column="chat_message_fts")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "chat_message_fts",
+                "managed": False,
+            },
+        ),
+    ]
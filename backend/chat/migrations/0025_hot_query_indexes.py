@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicated_saved_chats(apps, schema_editor):
+    """Keep the first saved chat of the same user and chat"""
+
+    SavedChat = apps.get_model("chat", "SavedChat")
+
+    duplicates = SavedChat.objects.values("user", "chat").annotate(first=Min("id"), n=Count("id")).filter(n__gt=1)
+    for saved_chat in duplicates:
+        SavedChat.objects.filter(user=saved_chat["user"], chat=saved_chat["chat"]).exclude(
+            id=saved_chat["first"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0024_message_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(fields=["room", "timestamp"], name="chat_room_timestamp_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(fields=["user", "room", "timestamp"], name="chat_user_room_timestamp_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reaction",
+            index=models.Index(fields=["message", "user"], name="reaction_message_user_idx"),
+        ),
+        migrations.RunPython(delete_duplicated_saved_chats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="savedchat",
+            constraint=models.UniqueConstraint(fields=("user", "chat"), name="unique_saved_chat"),
+        ),
+    ]
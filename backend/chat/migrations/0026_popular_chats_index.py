@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0025_hot_query_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="chat",
+            name="chat_room_likes_count_idx",
+        ),
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(fields=["room", "likes_count", "id"], name="chat_room_likes_count_id_idx"),
+        ),
+    ]
@@ -17,12 +17,22 @@ class Chat(models.Model):
     description = models.TextField(max_length=200)
     url = models.CharField(max_length=50, blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # number of ChatLike rows, kept in sync by chat.services.likes
+    likes_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = (
             "room",
             "title",
         )
+        indexes = [
+            # "popular" chats of a room, the id orders chats with the same likes_count
+            models.Index(fields=["room", "likes_count", "id"], name="chat_room_likes_count_id_idx"),
+            # "new" and "old" chats of a room
+            models.Index(fields=["room", "timestamp"], name="chat_room_timestamp_idx"),
+            # chats of a user in a room ("my chats")
+            models.Index(fields=["user", "room", "timestamp"], name="chat_user_room_timestamp_idx"),
+        ]
         app_label = "chat"
 
     def __str__(self):
@@ -39,4 +49,7 @@ class SavedChat(models.Model):
         return f"id: {self.pk}, user: {self.user}, saved chat: {self.chat}"
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "chat"], name="unique_saved_chat"),
+        ]
         app_label = "chat"
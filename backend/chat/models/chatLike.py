@@ -13,4 +13,7 @@ class ChatLike(models.Model):
         return f"id: {self.pk}, chat: {self.chat}, user: {self.user}"
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "chat"], name="unique_chat_like"),
+        ]
         app_label = "chat"
@@ -16,6 +16,10 @@ class Message(models.Model):
 
     class Meta:
         app_label = "chat"
+        indexes = [
+            # keyset pagination of the chat history
+            models.Index(fields=["chat", "timestamp", "id"], name="message_chat_timestamp_id_idx"),
+        ]
 
     def __str__(self):
         return f"id: {self.pk}, text: {self.text}, user: {self.user}"
@@ -26,3 +30,10 @@ class Message(models.Model):
         self.is_deleted = True
         self.text = "deleted"
         self.save()
+
+    async def adelete(self):
+        """Soft delete as delete()"""
+
+        self.is_deleted = True
+        self.text = "deleted"
+        await self.asave()
@@ -13,6 +13,10 @@ class Reaction(models.Model):
 
     class Meta:
         app_label = "chat"
+        indexes = [
+            # reaction of a user to the message
+            models.Index(fields=["message", "user"], name="reaction_message_user_idx"),
+        ]
 
     def __str__(self):
         return f"id: {self.pk}, msg: {self.message}, user: {self.user}, reaction: {self.reaction}"
@@ -0,0 +1,80 @@
+from chat.models.chat import Chat
+from chat.models.message import Message
+from django.db import models
+
+
+class FullTextField(models.TextField):
+    """Hidden column of an FTS5 table named as the table. "field__match" is a full-text query on all columns"""
+
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+class ChatSearchDocument(models.Model):
+    """
+    Row of the SQLite FTS5 index of chat titles and descriptions.
+    The virtual table and the triggers which keep it in sync with the chat table are created by chat.services.search
+    """
+
+    chat = models.OneToOneField(
+        Chat, primary_key=True, db_column="id", on_delete=models.DO_NOTHING, related_name="search_document"
+    )
+    # the same as id, but FTS5 can filter and order by it
+    rowid = models.BigIntegerField()
+    title = models.TextField()
+    description = models.TextField()
+    document = FullTextField(db_column="chat_chat_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "chat_chat_fts"
+        app_label = "chat"
+
+
+class MessageSearchDocument(models.Model):
+    """
+    Row of the SQLite FTS5 index of message texts. Deleted messages are not indexed.
+    The virtual table and the triggers which keep it in sync with the message table are created by chat.services.search
+    """
+
+    message = models.OneToOneField(
+        Message, primary_key=True, db_column="id", on_delete=models.DO_NOTHING, related_name="search_document"
+    )
+    rowid = models.BigIntegerField()
+    text = models.TextField()
+    document = FullTextField(db_column="chat_message_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "chat_message_fts"
+        app_label = "chat"
+
+
+class SearchToken(models.Model):
+    """Word of an indexed text. Full-text index for DB backends without FTS5"""
+
+    # name of the search index, e.g. "chat" or "message"
+    index = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    token = models.CharField(max_length=100)
+    # weight of the field which contains the word
+    weight = models.FloatField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["index", "token"], name="search_token_idx"),
+            models.Index(fields=["index", "object_id"], name="search_token_object_idx"),
+        ]
+        app_label = "chat"
+
+    def __str__(self):
+        return f"index: {self.index}, object: {self.object_id}, token: {self.token}"
@@ -0,0 +1,193 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class MessageCursorPagination(BasePagination):
+    """
+    Keyset pagination of messages on (timestamp, id).
+
+    Without a cursor the latest messages are returned. "before=<cursor>" returns older messages,
+    "after=<cursor>" returns newer ones. Messages of a page are always in chronological order.
+    "next" is the link to the older messages, "previous" - to the newer ones.
+    The query is a range scan of the (chat, timestamp, id) index, so it doesn't slow down on deep pages.
+    """
+
+    page_size = 100
+    max_page_size = 100
+    limit_query_param = "limit"
+    before_query_param = "before"
+    after_query_param = "after"
+    invalid_cursor_message = "Invalid cursor"
+    ordering = ("timestamp", "id")
+
+    @staticmethod
+    def encode_cursor(message) -> str:
+        """Cursor is '<timestamp in microseconds>-<id>'"""
+
+        return f"{(message.timestamp - EPOCH) // timedelta(microseconds=1)}-{message.id}"
+
+    def decode_cursor(self, cursor: str) -> tuple[datetime, int]:
+        try:
+            timestamp, id = cursor.split("-")
+            return EPOCH + timedelta(microseconds=int(timestamp)), int(id)
+        except (TypeError, ValueError, OverflowError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def filter_newer(self, queryset: QuerySet, cursor: str) -> QuerySet:
+        timestamp, id = self.decode_cursor(cursor)
+        # (timestamp, id) > cursor, written so that the timestamp bounds the index range
+        return queryset.filter(Q(timestamp__gte=timestamp) & (Q(timestamp__gt=timestamp) | Q(id__gt=id)))
+
+    def filter_older(self, queryset: QuerySet, cursor: str) -> QuerySet:
+        timestamp, id = self.decode_cursor(cursor)
+        return queryset.filter(Q(timestamp__lte=timestamp) & (Q(timestamp__lt=timestamp) | Q(id__lt=id)))
+
+    def get_limit(self, request) -> int:
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return min(max(limit, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        self.request = request
+        self.limit = self.get_limit(request)
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+
+        if after is not None:
+            queryset = self.filter_newer(queryset, after)
+            messages = list(queryset.order_by(*self.ordering)[: self.limit + 1])
+            self.has_newer = len(messages) > self.limit
+            self.has_older = True
+            messages = messages[: self.limit]
+        else:
+            if before is not None:
+                queryset = self.filter_older(queryset, before)
+            messages = list(queryset.order_by(*(f"-{field}" for field in self.ordering))[: self.limit + 1])
+            self.has_older = len(messages) > self.limit
+            self.has_newer = before is not None
+            messages = messages[: self.limit][::-1]
+
+        # cursors of the oldest and the newest message of the page
+        self.cursors = [self.encode_cursor(messages[0]), self.encode_cursor(messages[-1])] if messages else []
+        return messages
+
+    def is_latest_page(self, request) -> bool:
+        """Return True if the latest messages are requested (no cursor)"""
+
+        params = request.query_params
+        return self.before_query_param not in params and self.after_query_param not in params
+
+    def paginate_latest(self, request, messages: list[tuple[str, dict]], has_older: bool) -> list[dict]:
+        """
+        Return the latest page of serialized messages, e.g. of MessageBuffer.
+        messages are (cursor, serialized message), the oldest first, has_older - there are older messages.
+        """
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.has_older = has_older or len(messages) > self.limit
+        self.has_newer = False
+        messages = messages[-self.limit :]
+        self.cursors = [messages[0][0], messages[-1][0]] if messages else []
+        return [message for _, message in messages]
+
+    def get_next_link(self):
+        if not self.has_older or not self.cursors:
+            return None
+
+        url = remove_query_param(self.request.build_absolute_uri(), self.after_query_param)
+        return replace_query_param(url, self.before_query_param, self.cursors[0])
+
+    def get_previous_link(self):
+        if not self.has_newer or not self.cursors:
+            return None
+
+        url = remove_query_param(self.request.build_absolute_uri(), self.before_query_param)
+        return replace_query_param(url, self.after_query_param, self.cursors[-1])
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.before_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor of a message. Return messages older than it",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.after_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor of a message. Return messages newer than it",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.limit_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Number of messages to return (max {self.max_page_size})",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+class MessageSearchCursorPagination(MessageCursorPagination):
+    """
+    Keyset pagination of found messages on the message id, annotated as search_id by SearchIndex.search().
+    Ids of messages grow with time, so pages are the same as of MessageCursorPagination.
+    On SQLite search_id is the rowid of the FTS5 table: FTS5 returns matches in its order,
+    so a page is read without sorting all matches.
+    """
+
+    ordering = ("search_id",)
+
+    @staticmethod
+    def encode_cursor(message) -> str:
+        """Cursor is '<id>'"""
+
+        return str(message.id)
+
+    def decode_cursor(self, cursor: str) -> int:
+        try:
+            return int(cursor)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def filter_newer(self, queryset: QuerySet, cursor: str) -> QuerySet:
+        return queryset.filter(search_id__gt=self.decode_cursor(cursor))
+
+    def filter_older(self, queryset: QuerySet, cursor: str) -> QuerySet:
+        return queryset.filter(search_id__lt=self.decode_cursor(cursor))
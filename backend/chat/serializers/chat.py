@@ -1,7 +1,7 @@
 from typing import Optional
 
 from chat.models.chat import Chat, SavedChat
-from chat.models.chatLike import ChatLike
+from django.db.models import QuerySet
 from files.utils import get_full_file_url
 from rest_framework import serializers
 
@@ -19,6 +19,12 @@ class ChatSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "room", "img", "user", "user_id", "description", "url", "timestamp", "likes"]
         read_only_fields = ["id", "user", "timestamp", "url", "room"]
 
+    @staticmethod
+    def prefetch(queryset: QuerySet) -> QuerySet:
+        """Return queryset which loads chat creators in the same query"""
+
+        return queryset.select_related("user")
+
     @staticmethod
     def update_url(obj, *args, **kwargs):
         """Update chat to save url with id"""
@@ -51,7 +57,7 @@ class ChatSerializer(serializers.ModelSerializer):
     def get_likes(obj) -> str:
         """Return number of likes"""
 
-        return ChatLike.objects.filter(chat__pk=obj.pk).count()
+        return obj.likes_count
 
 
 class ChatSerializerForChatUpdate(ChatSerializer):
@@ -100,6 +106,12 @@ class SavedChatSerializer(serializers.ModelSerializer):
             "timestamp": {"read_only": True},
         }
 
+    @staticmethod
+    def prefetch(queryset: QuerySet) -> QuerySet:
+        """Return queryset which loads chats with their creators in the same query"""
+
+        return queryset.select_related("chat__user")
+
     @staticmethod
     def get_title(obj) -> Optional[str]:
         """Return chat title"""
@@ -167,4 +179,6 @@ class SavedChatSerializer(serializers.ModelSerializer):
     def get_likes(obj) -> str:
         """Return number of likes"""
 
-        return ChatLike.objects.filter(chat__pk=obj.chat_id).count()
+        if isinstance(obj, SavedChat):
+            return obj.chat.likes_count
+        return None
@@ -3,6 +3,8 @@ from typing import Optional
 from chat.models.message import Message
 from chat.models.reaction import Reaction
 from chat.serializers.reaction import ReactionSerializer
+from chat.services.search import snippet
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
 from files.utils import get_full_file_url
 from rest_framework import serializers
 
@@ -24,6 +26,28 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["id", "timestamp", "user", "reactions"]
 
+    @staticmethod
+    def related_lookups() -> list:
+        """Related objects used by the serializer: reactions with their users and attachments"""
+
+        return [
+            Prefetch("reaction_set", queryset=Reaction.objects.select_related("user").order_by("id")),
+            "attachments",
+        ]
+
+    @classmethod
+    def prefetch(cls, queryset: QuerySet) -> QuerySet:
+        """Return queryset which loads everything the serializer needs in a constant number of queries"""
+
+        return queryset.select_related("user__profile").prefetch_related(*cls.related_lookups())
+
+    @classmethod
+    def prefetch_instance(cls, message: Message) -> Message:
+        """Load related objects of a message which was fetched or created without prefetch()"""
+
+        prefetch_related_objects([message], "user__profile", *cls.related_lookups())
+        return message
+
     def create(self, validated_data):
         """Save message with user"""
 
@@ -48,7 +72,8 @@ class MessageSerializer(serializers.ModelSerializer):
 
     def get_reactions(self, obj) -> ReactionSerializer:
         if isinstance(obj, Message):
-            reactions = Reaction.objects.filter(message=obj)
+            # uses prefetched reactions if the message was loaded by prefetch()
+            reactions = obj.reaction_set.all()
             serializer = ReactionSerializer(reactions, many=True)
             return serializer.data
         return None
@@ -62,6 +87,19 @@ class MessageSerializer(serializers.ModelSerializer):
         return []
 
 
+class MessageSearchSerializer(MessageSerializer):
+    """Serializer for found messages: a message with a snippet of its text where the matched words are highlighted"""
+
+    highlight = serializers.SerializerMethodField(source="get_highlight")
+
+    def get_highlight(self, obj) -> str:
+        """FTS5 snippet annotated by the search or a snippet made here for DB backends without FTS5"""
+
+        if hasattr(obj, "search_snippet"):
+            return obj.search_snippet
+        return snippet(obj.text, self.context["phrase"])
+
+
 class WebsocketMessageSerializer(serializers.Serializer):
     """Serializer for websocket messages"""
 
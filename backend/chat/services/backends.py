@@ -0,0 +1,54 @@
+import logging
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def is_redis_layer(channel_layer=None) -> bool:
+    """Return True if the channel layer is a redis one (channels_redis): it hashes names to its hosts"""
+
+    return hasattr(channel_layer or get_channel_layer(), "consistent_hash")
+
+
+class LayerBackend:
+    """
+    The instance of a chat service class used by the process, created on first use.
+
+    The class is the dotted path in the setting if it is set, otherwise the redis class when the channel layer
+    is a redis one and the memory class when it isn't. The instance is created again after a change
+    of the setting, of CHANNEL_LAYERS or of one of reset_on (override_settings in tests).
+    """
+
+    def __init__(self, setting: str, memory_class: str, redis_class: str, reset_on: tuple[str, ...] = ()):
+        self.setting = setting
+        self._memory_class = memory_class
+        self._redis_class = redis_class
+        self.reset_on = {"CHANNEL_LAYERS", setting, *reset_on}
+        self._instance = None
+        _layer_backends.append(self)
+
+    def get(self):
+        if self._instance is None:
+            path = getattr(settings, self.setting) or (self._redis_class if is_redis_layer() else self._memory_class)
+            logger.info(f"{self.setting}: {path}")
+            self._instance = import_string(path)()
+
+        return self._instance
+
+    def reset(self):
+        self._instance = None
+
+
+_layer_backends: list[LayerBackend] = []
+
+
+@receiver(setting_changed)
+def reset_layer_backends(setting, **kwargs):
+    for backend in _layer_backends:
+        if setting in backend.reset_on:
+            backend.reset()
@@ -0,0 +1,87 @@
+import logging
+import time
+from collections import Counter
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class ChatListCache:
+    """
+    Cache of the pages of room chat listings. The listings don't depend on the user, so a page is shared by everybody.
+
+    A page is a dict: {"count": number of chats in the room, "results": serialized chats of the page}.
+    It is cached under (room, sorting, offset, limit) with the version of the room (ROOM_VERSIONS). Any change
+    of a chat of the room or of its likes increments the version, so all pages of the room are invalidated
+    by one operation and the old ones just expire. A missing page is computed by one request, the others wait for it under a lock.
+    """
+
+    prefix = "chat_list"
+    # seconds between checks of a page computed by another request
+    poll_interval = 0.02
+    # log the stats every N requests
+    log_every = 1000
+
+    def __init__(self):
+        # hits, misses, waits (for a page computed by another request), lock_timeouts. Counted in the process
+        self.stats = Counter()
+
+    @property
+    def cache(self):
+        return caches[settings.CHAT_LIST_CACHE_ALIAS]
+
+    def get_page(
+        self, room: str, sorting: str, offset: int, limit: int, version: int, compute: Callable[[], dict]
+    ) -> dict:
+        """Return the cached page for the version of the room or compute and cache it"""
+
+        cache = self.cache
+        key = f"{self.prefix}:{room}:{sorting}:{offset}:{limit}"
+
+        page = cache.get(key, version=version)
+        if page is not None:
+            self._count("hits")
+            return page
+
+        lock = f"{key}:lock"
+        if cache.add(lock, True, settings.CHAT_LIST_CACHE_LOCK_TIMEOUT, version=version):
+            self._count("misses")
+            logger.debug(f"Chat list cache. Miss: {key}, version: {version}")
+            try:
+                page = compute()
+                cache.set(key, page, settings.CHAT_LIST_CACHE_TIMEOUT, version=version)
+            finally:
+                cache.delete(lock, version=version)
+            return page
+
+        # the page is computed by another request
+        self._count("waits")
+        deadline = time.monotonic() + settings.CHAT_LIST_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            page = cache.get(key, version=version)
+            if page is not None:
+                return page
+
+        self.stats["lock_timeouts"] += 1
+        logger.warning(f"Chat list cache. The page {key} wasn't computed by another request in time")
+        return compute()
+
+    def _count(self, name: str):
+        self.stats[name] += 1
+        if (self.stats["hits"] + self.stats["misses"] + self.stats["waits"]) % self.log_every == 0:
+            logger.info(f"Chat list cache. Stats: {self.get_stats()}")
+
+    def get_stats(self) -> dict:
+        """Return counters of the process and the ratio of requests served from the cache"""
+
+        stats = {name: self.stats[name] for name in ("hits", "misses", "waits", "lock_timeouts")}
+        requests = stats["hits"] + stats["misses"] + stats["waits"]
+        stats["hit_ratio"] = (stats["hits"] + stats["waits"] - stats["lock_timeouts"]) / requests if requests else 0.0
+        return stats
+
+
+CHAT_LIST_CACHE = ChatListCache()
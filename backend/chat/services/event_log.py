@@ -0,0 +1,194 @@
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from channels.layers import get_channel_layer
+from chat.services.backends import LayerBackend
+from chat.services.redis_keys import delete_layer_keys, layer_key
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EventLog:
+    """
+    Sequence numbers and replay log of the events broadcast to the chats.
+
+    Every event of a chat gets the next sequence number of the chat: "seq" is added to its JSON.
+    The last CHAT_EVENT_LOG_SIZE encoded events of a chat are kept, so a client which reconnects
+    with the last seq it received gets only the events it missed.
+    A new counter starts from the current time in microseconds, so the numbers of a counter which was lost
+    (expired, restarted worker) are not repeated and clients with them are asked to resync.
+    """
+
+    async def append(self, chat_id, text: str) -> tuple[int, str]:
+        """Stamp the JSON of an event with the next seq of the chat and log it. Return seq and the stamped JSON"""
+
+        raise NotImplementedError
+
+    async def current(self, chat_id) -> int:
+        """Return seq of the last event of the chat"""
+
+        raise NotImplementedError
+
+    async def since(self, chat_id, last_seq: int) -> Optional[list[str]]:
+        """Return the logged events after last_seq, None if some of them aren't in the log anymore"""
+
+        raise NotImplementedError
+
+    async def clear(self):
+        """Forget all events"""
+
+        raise NotImplementedError
+
+    @staticmethod
+    def start() -> int:
+        return time.time_ns() // 1000
+
+    @staticmethod
+    def stamp(seq, text: str) -> str:
+        # '{"event_type": ...}' -> '{"seq": 1, "event_type": ...}'
+        return f'{{"seq": {seq}, {text[1:]}'
+
+
+class MemoryEventLog(EventLog):
+    """
+    Event log in process memory: only events broadcast by this worker are numbered, so it fits a single ASGI worker.
+    After a restart the counters start again from the current time and reconnected clients resync.
+    As in redis, a chat is forgotten CHAT_EVENT_LOG_TTL seconds after its last event.
+    """
+
+    def __init__(self):
+        # chat_id -> [seq, deque of (seq, stamped JSON), time of the last event], the least recently changed first
+        self._chats: OrderedDict[str, list] = OrderedDict()
+
+    def _expire(self, now: float):
+        """Forget the chats without events for CHAT_EVENT_LOG_TTL seconds"""
+
+        while self._chats:
+            chat_id, chat = next(iter(self._chats.items()))
+            if now - chat[2] < settings.CHAT_EVENT_LOG_TTL:
+                break
+            del self._chats[chat_id]
+
+    def _chat(self, chat_id) -> list:
+        now = time.monotonic()
+        self._expire(now)
+        chat = self._chats.get(str(chat_id))
+        if chat is None:
+            chat = self._chats[str(chat_id)] = [self.start(), deque(maxlen=settings.CHAT_EVENT_LOG_SIZE), now]
+        return chat
+
+    async def append(self, chat_id, text: str) -> tuple[int, str]:
+        chat = self._chat(chat_id)
+        chat[0] += 1
+        text = self.stamp(chat[0], text)
+        chat[1].append((chat[0], text))
+        chat[2] = time.monotonic()
+        self._chats.move_to_end(str(chat_id))
+        return chat[0], text
+
+    async def current(self, chat_id) -> int:
+        return self._chat(chat_id)[0]
+
+    async def since(self, chat_id, last_seq: int) -> Optional[list[str]]:
+        self._expire(time.monotonic())
+        chat = self._chats.get(str(chat_id))
+        if chat is None or last_seq > chat[0]:
+            return None
+
+        seq, events, _ = chat
+        if last_seq < seq and (not events or events[0][0] > last_seq + 1):
+            return None
+        return [text for event_seq, text in events if event_seq > last_seq]
+
+    async def clear(self):
+        self._chats.clear()
+
+
+class RedisEventLog(EventLog):
+    """
+    Event log in redis: the seq counter of a chat is one for all ASGI workers, so events broadcast
+    by different workers are numbered in one sequence and a client may reconnect to any worker.
+
+    Keys of a chat expire CHAT_EVENT_LOG_TTL seconds after its last event:
+    <prefix>:events:<chat_id> - the seq counter, <prefix>:events:<chat_id>:log - zset of stamped events (score: seq).
+    """
+
+    APPEND = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then redis.call('SET', KEYS[1], ARGV[1]) end
+        redis.call('INCR', KEYS[1])
+        local seq = redis.call('GET', KEYS[1])
+        local text = '{"seq": ' .. seq .. ', ' .. string.sub(ARGV[2], 2)
+        redis.call('ZADD', KEYS[2], seq, text)
+        redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -tonumber(ARGV[3]) - 1)
+        for i = 1, 2 do redis.call('EXPIRE', KEYS[i], ARGV[4]) end
+        return {seq, text}
+    """
+
+    CURRENT = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2]) end
+        return redis.call('GET', KEYS[1])
+    """
+
+    SINCE = """
+        local seq = redis.call('GET', KEYS[1])
+        if not seq or tonumber(ARGV[1]) > tonumber(seq) then return false end
+        if tonumber(ARGV[1]) == tonumber(seq) then return {} end
+        local first = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+        if #first == 0 or tonumber(first[2]) > tonumber(ARGV[1]) + 1 then return false end
+        return redis.call('ZRANGEBYSCORE', KEYS[2], '(' .. ARGV[1], '+inf')
+    """
+
+    def __init__(self, channel_layer=None):
+        self._layer = channel_layer or get_channel_layer()
+
+    def _keys(self, chat_id) -> list[str]:
+        seq_key = layer_key(self._layer, f"events:{chat_id}")
+        return [seq_key, f"{seq_key}:log"]
+
+    def _connection(self, chat_id):
+        # all keys of a chat are stored on the same redis host
+        return self._layer.connection(self._layer.consistent_hash(f"events:{chat_id}"))
+
+    async def append(self, chat_id, text: str) -> tuple[int, str]:
+        seq, text = await self._connection(chat_id).eval(
+            self.APPEND,
+            2,
+            *self._keys(chat_id),
+            self.start(),
+            text,
+            settings.CHAT_EVENT_LOG_SIZE,
+            settings.CHAT_EVENT_LOG_TTL,
+        )
+        return int(seq), text.decode("utf-8")
+
+    async def current(self, chat_id) -> int:
+        seq = await self._connection(chat_id).eval(
+            self.CURRENT, 1, self._keys(chat_id)[0], self.start(), settings.CHAT_EVENT_LOG_TTL
+        )
+        return int(seq)
+
+    async def since(self, chat_id, last_seq: int) -> Optional[list[str]]:
+        events = await self._connection(chat_id).eval(self.SINCE, 2, *self._keys(chat_id), last_seq)
+        if events is None:
+            return None
+        return [text.decode("utf-8") for text in events]
+
+    async def clear(self):
+        await delete_layer_keys(self._layer, "events:*")
+
+
+_log = LayerBackend(
+    "CHAT_EVENT_LOG_BACKEND", "chat.services.event_log.MemoryEventLog", "chat.services.event_log.RedisEventLog"
+)
+
+
+def get_event_log() -> EventLog:
+    """
+    Return the log which numbers the events of the chats of this process. The consumers stamp broadcast events
+    with it and replay it to reconnected clients. CHAT_EVENT_LOG_BACKEND overrides the choice by the channel layer.
+    """
+
+    return _log.get()
@@ -0,0 +1,65 @@
+import logging
+
+from chat.models.chat import Chat
+from chat.models.chatLike import ChatLike
+from chat.services.versions import ROOM_VERSIONS
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+
+def toggle_chat_like(user, chat_id) -> bool:
+    """
+    Like the chat or remove the like if the user already liked it. Return True if the chat is liked.
+
+    The like and Chat.likes_count are changed in one transaction. Concurrent toggles are safe:
+    the (user, chat) unique constraint rejects a second like and only one of concurrent deletes removes the row.
+    """
+
+    with transaction.atomic():
+        deleted, _ = ChatLike.objects.filter(user=user, chat_id=chat_id).delete()
+        if deleted:
+            Chat.objects.filter(pk=chat_id).update(likes_count=F("likes_count") - deleted)
+            logger.debug(f"{user} Like_chat. The Chat: {chat_id} was unliked")
+            return False
+
+        try:
+            with transaction.atomic():
+                ChatLike.objects.create(user=user, chat_id=chat_id)
+        except IntegrityError:
+            # liked by a concurrent request of the same user
+            logger.debug(f"{user} Like_chat. The Chat: {chat_id} is already liked")
+            return True
+
+        Chat.objects.filter(pk=chat_id).update(likes_count=F("likes_count") + 1)
+        logger.debug(f"{user} Like_chat. The Chat: {chat_id} was liked")
+        return True
+
+
+def reconcile_likes_count(dry_run: bool = False) -> list[tuple[int, int, int]]:
+    """
+    Fix Chat.likes_count which differ from the number of likes (e.g. after likes were deleted with their users).
+    Return list of (chat id, likes_count, number of likes) of fixed chats.
+    """
+
+    drifted = [
+        (chat.pk, chat.likes_count, chat.actual_likes)
+        for chat in Chat.objects.annotate(actual_likes=Count("chatlike")).exclude(likes_count=F("actual_likes"))
+    ]
+
+    if dry_run:
+        return drifted
+
+    # counted in the UPDATE statement, so likes toggled after the check are taken into account
+    likes = ChatLike.objects.filter(chat=OuterRef("pk")).values("chat").annotate(n=Count("id")).values("n")
+    for chat_id, likes_count, actual_likes in drifted:
+        Chat.objects.filter(pk=chat_id).update(likes_count=Coalesce(Subquery(likes), Value(0)))
+        logger.info(f"Reconcile likes. Chat: {chat_id}. likes_count: {likes_count} -> {actual_likes}")
+
+    rooms = Chat.objects.filter(pk__in=[chat_id for chat_id, _, _ in drifted]).values_list("room", flat=True)
+    for room in set(rooms):
+        ROOM_VERSIONS.increment_on_commit(room)
+
+    return drifted
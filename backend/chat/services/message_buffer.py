@@ -0,0 +1,212 @@
+import json
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Callable
+
+from chat.pagination import MessageCursorPagination
+from chat.serializers.message import MessageSerializer
+from chat.services.versions import CHAT_VERSIONS
+from django.conf import settings
+from django.db.models import QuerySet
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedChat:
+    """Latest messages of a chat for one version of the chat"""
+
+    def __init__(self, version: int, has_older: bool):
+        self.version = version
+        # (cursor, serialized message, size), the oldest first
+        self.messages = deque()
+        # there are older messages than the buffered ones
+        self.has_older = has_older
+        self.size = 0
+
+
+class MessageBuffer:
+    """
+    Ring buffer of the latest serialized messages of chats, kept in the memory of the process.
+    It serves the first page of the message history without queries.
+
+    A chat is loaded from the DB on the first request and is valid for the version of the chat (CHAT_VERSIONS):
+    any change of its messages from other places increments the version and the chat is loaded again.
+    ChatConsumer changes the buffered chat together with the messages it saves: a change is applied
+    if the chat had the version read before the change, otherwise the chat is dropped.
+    A change of another process made while the consumer saves its change can be missed until the next change.
+
+    Messages are serialized dicts, they are replaced but never changed, so a page can be rendered without the lock.
+    When the JSON size of all messages exceeds CHAT_MESSAGE_BUFFER_MEMORY the least recently used chats are evicted.
+    """
+
+    # log the stats every N requests
+    log_every = 1000
+
+    def __init__(self):
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+        # JSON size of all buffered messages
+        self.memory = 0
+        # hits, misses, evictions. Counted in the process
+        self.stats = Counter()
+
+    @property
+    def size(self) -> int:
+        """Number of messages buffered per chat"""
+
+        return settings.CHAT_MESSAGE_BUFFER_SIZE
+
+    @staticmethod
+    def get_version(chat_id) -> int:
+        """Version of the chat, read before a change of its messages"""
+
+        return CHAT_VERSIONS.get(chat_id)
+
+    def get_latest(self, chat_id, load: Callable[[], tuple[list, bool]]) -> tuple[list[tuple[str, dict]], bool]:
+        """
+        Return the buffered messages of the chat as (cursor, serialized message), the oldest first,
+        and whether there are older messages. load() returns them from the DB if the chat isn't buffered.
+        """
+
+        chat_id = str(chat_id)
+        version = self.get_version(chat_id)
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if chat is not None and chat.version == version:
+                self._chats.move_to_end(chat_id)
+                latest = [(cursor, message) for cursor, message, _ in chat.messages], chat.has_older
+            else:
+                latest = None
+        if latest is not None:
+            self._count("hits")
+            return latest
+
+        self._count("misses")
+        logger.debug(f"Message buffer. Miss: chat {chat_id}, version: {version}")
+        # the version is read before the query: a change committed during the query makes the result outdated
+        messages, has_older = load()
+        chat = BufferedChat(version, has_older)
+        for cursor, message in messages[-self.size :]:
+            self._push(chat, cursor, message)
+
+        with self._lock:
+            self._remove(chat_id)
+            self._chats[chat_id] = chat
+            self.memory += chat.size
+            self._evict()
+        return messages, has_older
+
+    def append(self, chat_id, since: int, cursor: str, message: dict):
+        """Add a new message of the chat changed since the version"""
+
+        self._change(chat_id, since, lambda chat: self._push(chat, cursor, message))
+
+    def update(self, chat_id, since: int, message_id: int, **fields):
+        """Change fields of a message of the chat changed since the version"""
+
+        def _update(chat: BufferedChat):
+            for idx, (cursor, message, size) in enumerate(chat.messages):
+                if message["id"] == int(message_id):
+                    message = {**message, **fields}
+                    chat.messages[idx] = (cursor, message, self._size(message))
+                    chat.size += chat.messages[idx][2] - size
+                    return
+
+        self._change(chat_id, since, _update)
+
+    def contains(self, chat_id, message_id: int) -> bool:
+        """Return True if the message is buffered"""
+
+        with self._lock:
+            chat = self._chats.get(str(chat_id))
+            return chat is not None and any(message["id"] == int(message_id) for _, message, _ in chat.messages)
+
+    def remove(self, chat_id):
+        """Forget the chat, e.g. a deleted one"""
+
+        with self._lock:
+            self._remove(str(chat_id))
+
+    def clear(self):
+        with self._lock:
+            self._chats.clear()
+            self.memory = 0
+
+    def get_stats(self) -> dict:
+        """Return counters of the process, the number of buffered chats and their memory"""
+
+        with self._lock:
+            return {
+                **{name: self.stats[name] for name in ("hits", "misses", "evictions")},
+                "chats": len(self._chats),
+                "memory": self.memory,
+            }
+
+    def _change(self, chat_id, since: int, apply: Callable[[BufferedChat], None]):
+        # the change is committed, the version includes it
+        chat_id = str(chat_id)
+        version = self.get_version(chat_id)
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                return
+
+            if chat.version != since:
+                # changed by somebody else
+                self._remove(chat_id)
+                logger.debug(f"Message buffer. Chat {chat_id} was changed, version: {version}")
+                return
+
+            size = chat.size
+            apply(chat)
+            chat.version = version
+            self.memory += chat.size - size
+            self._evict()
+
+    def _push(self, chat: BufferedChat, cursor: str, message: dict):
+        size = self._size(message)
+        chat.messages.append((cursor, message, size))
+        chat.size += size
+        if len(chat.messages) > self.size:
+            chat.size -= chat.messages.popleft()[2]
+            chat.has_older = True
+
+    @staticmethod
+    def _size(message: dict) -> int:
+        return len(json.dumps(message, default=str))
+
+    def _remove(self, chat_id):
+        chat = self._chats.pop(chat_id, None)
+        if chat is not None:
+            self.memory -= chat.size
+
+    def _evict(self):
+        while self.memory > settings.CHAT_MESSAGE_BUFFER_MEMORY and self._chats:
+            chat_id, chat = self._chats.popitem(last=False)
+            self.memory -= chat.size
+            self.stats["evictions"] += 1
+            logger.debug(f"Message buffer. Chat {chat_id} was evicted")
+
+    def _count(self, name: str):
+        self.stats[name] += 1
+        if (self.stats["hits"] + self.stats["misses"]) % self.log_every == 0:
+            logger.info(f"Message buffer. Stats: {self.get_stats()}")
+
+
+MESSAGE_BUFFER = MessageBuffer()
+
+
+def load_latest(messages: QuerySet) -> tuple[list[tuple[str, dict]], bool]:
+    """
+    Load the latest messages for MESSAGE_BUFFER in one query with prefetches:
+    (cursor, serialized message), the oldest first, and whether there are older messages.
+    messages is a queryset of messages of a chat prefetched by MessageSerializer.prefetch().
+    """
+
+    ordering = [f"-{field}" for field in MessageCursorPagination.ordering]
+    messages = list(messages.order_by(*ordering)[: MESSAGE_BUFFER.size + 1])
+    has_older = len(messages) > MESSAGE_BUFFER.size
+    messages = messages[: MESSAGE_BUFFER.size][::-1]
+    data = MessageSerializer(messages, many=True).data
+    return [(MessageCursorPagination.encode_cursor(message), item) for message, item in zip(messages, data)], has_older
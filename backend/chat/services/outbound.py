@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from collections import Counter, deque
+from typing import Awaitable, Callable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundQueue:
+    """
+    Frames to one websocket client, sent by a writer task of their own. The consumer only queues them,
+    so a client on a slow link doesn't hold up the events of its consumer and its chat.
+
+    Frames with a key (presence, reaction and like events) can be given up: a key names the state the event changes.
+    When CHAT_OUTBOUND_QUEUE_SIZE frames are queued, CHAT_OUTBOUND_POLICY decides what happens to a new frame:
+    "drop_oldest" - the oldest frame with a key is dropped,
+    "coalesce" - a queued frame with the key of the new one is dropped, otherwise the oldest frame with a key,
+    "disconnect" - the connection is closed with CHAT_OUTBOUND_CLOSE_CODE.
+    The connection is closed too if there is no frame which can be dropped. The client reconnects with last_seq
+    and gets the missed events from the event log.
+    """
+
+    # queued, sent, dropped, coalesced, disconnected, depth (frames queued now), max_depth. Counted in the process
+    stats = Counter()
+    # log the stats every N sent frames
+    log_every = 10000
+
+    def __init__(self, send: Callable[[str], Awaitable], close: Callable[[int], Awaitable], name: str = ""):
+        self._send = send
+        self._close = close
+        self.name = name
+        # (key, text)
+        self._frames = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+        # frames given up for this connection
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer task, queued frames are not sent"""
+
+        self.closed = True
+        self.stats["depth"] -= len(self._frames)
+        self._frames.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def put(self, text: str, key: Optional[str] = None):
+        """Queue the frame. key: the state the frame changes if it may be dropped"""
+
+        if self.closed:
+            return
+
+        if len(self._frames) >= settings.CHAT_OUTBOUND_QUEUE_SIZE and not self._make_room(key):
+            await self._disconnect()
+            return
+
+        self._frames.append((key, text))
+        self.stats["queued"] += 1
+        self.stats["depth"] += 1
+        if len(self._frames) > self.stats["max_depth"]:
+            self.stats["max_depth"] = len(self._frames)
+        self._ready.set()
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+    def _make_room(self, key: Optional[str]) -> bool:
+        """Drop a queued frame by the policy. Return False if the connection has to be closed"""
+
+        policy = settings.CHAT_OUTBOUND_POLICY
+        if policy == "disconnect":
+            return False
+
+        if policy == "coalesce" and key is not None and self._remove(lambda frame_key: frame_key == key):
+            self.stats["coalesced"] += 1
+            return True
+
+        if self._remove(lambda frame_key: frame_key is not None):
+            self.stats["dropped"] += 1
+            self.dropped += 1
+            if self.dropped == 1:
+                logger.warning(f"Outbound queue {self.name}. Slow client, events are dropped")
+            return True
+        return False
+
+    def _remove(self, match: Callable[[Optional[str]], bool]) -> bool:
+        """Remove the oldest queued frame with a matching key"""
+
+        for idx, (frame_key, _) in enumerate(self._frames):
+            if match(frame_key):
+                del self._frames[idx]
+                self.stats["depth"] -= 1
+                return True
+        return False
+
+    async def _disconnect(self):
+        logger.warning(f"Outbound queue {self.name}. Slow client, {len(self._frames)} frames queued. Disconnecting")
+        self.stats["disconnected"] += 1
+        await self.stop()
+        await self._close(settings.CHAT_OUTBOUND_CLOSE_CODE)
+
+    async def _run(self):
+        while True:
+            if not self._frames:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            _, text = self._frames.popleft()
+            self.stats["depth"] -= 1
+            await self._send(text)
+            self.stats["sent"] += 1
+            if self.stats["sent"] % self.log_every == 0:
+                logger.info(f"Outbound queues. Stats: {self.get_stats()}")
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+from channels.layers import get_channel_layer
+from chat.services.backends import LayerBackend
+from chat.services.redis_keys import delete_layer_keys, layer_key
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceBackend:
+    """
+    Registry of the users connected to the chats.
+
+    Every websocket connection is registered with its channel name, so the user is online while
+    at least one connection (browser tab) of the user is open in the chat.
+    A user card is a dict: {"id": 1, "username": "user1", "avatar": "https://..."}
+    """
+
+    async def connect(self, chat_id, channel_name: str, user_card: dict) -> bool:
+        """Register connection. Return True if it is the first connection of the user in the chat"""
+
+        raise NotImplementedError
+
+    async def disconnect(self, chat_id, channel_name: str, user_id: int) -> bool:
+        """Unregister connection. Return True if it was the last connection of the user in the chat"""
+
+        raise NotImplementedError
+
+    async def online_users(self, chat_id, exclude_user_id: Optional[int] = None) -> list[dict]:
+        """Return cards of online users in the chat"""
+
+        raise NotImplementedError
+
+    async def clear(self):
+        """Forget all connections"""
+
+        raise NotImplementedError
+
+
+class MemoryPresenceBackend(PresenceBackend):
+    """
+    Presence in process memory: a user connected to another ASGI worker isn't seen, so it fits a single worker.
+    Nothing is left after a restart, the clients reconnect and register again.
+    """
+
+    def __init__(self):
+        # chat_id -> user_id -> {"card": user card, "channels": set of channel names}
+        self._chats: dict[str, dict[int, dict]] = {}
+
+    async def connect(self, chat_id, channel_name: str, user_card: dict) -> bool:
+        users = self._chats.setdefault(str(chat_id), {})
+        presence = users.get(user_card["id"])
+
+        if presence is None:
+            users[user_card["id"]] = {"card": user_card, "channels": {channel_name}}
+            return True
+
+        presence["card"] = user_card
+        presence["channels"].add(channel_name)
+        return False
+
+    async def disconnect(self, chat_id, channel_name: str, user_id: int) -> bool:
+        users = self._chats.get(str(chat_id))
+        if not users or user_id not in users:
+            return False
+
+        channels = users[user_id]["channels"]
+        channels.discard(channel_name)
+        if channels:
+            return False
+
+        del users[user_id]
+        if not users:
+            del self._chats[str(chat_id)]
+        return True
+
+    async def online_users(self, chat_id, exclude_user_id: Optional[int] = None) -> list[dict]:
+        users = self._chats.get(str(chat_id), {})
+        return [presence["card"] for user_id, presence in users.items() if user_id != exclude_user_id]
+
+    async def clear(self):
+        self._chats.clear()
+
+
+class RedisPresenceBackend(PresenceBackend):
+    """
+    Presence in redis: the online list of a chat has the users connected to any ASGI worker.
+
+    Connections are stored with an expiry time which each worker refreshes for its own connections
+    every PRESENCE_TTL / 3 seconds. Connections of a stopped worker expire by themselves, so nothing
+    has to be cleaned up on startup.
+    Keys of a chat: <prefix>:presence:<chat_id> - zset of user ids (score: expiry time),
+    <prefix>:presence:<chat_id>:cards - hash of user cards,
+    <prefix>:presence:<chat_id>:<user_id> - zset of the user's channel names (score: expiry time).
+    """
+
+    CONNECT = """
+        local first = redis.call('ZCOUNT', KEYS[3], ARGV[4], '+inf') == 0
+        redis.call('ZADD', KEYS[3], ARGV[3], ARGV[2])
+        redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+        redis.call('HSET', KEYS[2], ARGV[1], ARGV[5])
+        for i = 1, 3 do redis.call('EXPIRE', KEYS[i], ARGV[6]) end
+        if first then return 1 end
+        return 0
+    """
+
+    DISCONNECT = """
+        redis.call('ZREM', KEYS[3], ARGV[2])
+        redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', ARGV[3])
+        if redis.call('ZCARD', KEYS[3]) > 0 then return 0 end
+        redis.call('HDEL', KEYS[2], ARGV[1])
+        return redis.call('ZREM', KEYS[1], ARGV[1])
+    """
+
+    ONLINE_USERS = """
+        local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+        for _, user_id in ipairs(expired) do redis.call('HDEL', KEYS[2], user_id) end
+        redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+        local users = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], '+inf')
+        if #users == 0 then return {} end
+        return redis.call('HMGET', KEYS[2], unpack(users))
+    """
+
+    def __init__(self, channel_layer=None, ttl: int = None):
+        self._layer = channel_layer or get_channel_layer()
+        self._ttl = ttl or settings.PRESENCE_TTL
+        # connections of this worker: channel_name -> (chat_id, user card)
+        self._local: dict[str, tuple[str, dict]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _keys(self, chat_id, user_id) -> list[str]:
+        chat_key = layer_key(self._layer, f"presence:{chat_id}")
+        return [chat_key, f"{chat_key}:cards", f"{chat_key}:{user_id}"]
+
+    def _connection(self, chat_id):
+        # all keys of a chat are stored on the same redis host
+        return self._layer.connection(self._layer.consistent_hash(f"presence:{chat_id}"))
+
+    async def connect(self, chat_id, channel_name: str, user_card: dict) -> bool:
+        self._local[channel_name] = (str(chat_id), user_card)
+        self._ensure_refresh_task()
+
+        now = time.time()
+        first = await self._connection(chat_id).eval(
+            self.CONNECT,
+            3,
+            *self._keys(chat_id, user_card["id"]),
+            user_card["id"],
+            channel_name,
+            now + self._ttl,
+            now,
+            json.dumps(user_card),
+            self._ttl,
+        )
+        return bool(first)
+
+    async def disconnect(self, chat_id, channel_name: str, user_id: int) -> bool:
+        self._local.pop(channel_name, None)
+
+        last = await self._connection(chat_id).eval(
+            self.DISCONNECT, 3, *self._keys(chat_id, user_id), user_id, channel_name, time.time()
+        )
+        return bool(last)
+
+    async def online_users(self, chat_id, exclude_user_id: Optional[int] = None) -> list[dict]:
+        chat_key, cards_key, _ = self._keys(chat_id, None)
+        cards = await self._connection(chat_id).eval(self.ONLINE_USERS, 2, chat_key, cards_key, time.time())
+
+        users = [json.loads(card) for card in cards if card]
+        return [user for user in users if user["id"] != exclude_user_id]
+
+    async def clear(self):
+        self._local.clear()
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        await delete_layer_keys(self._layer, "presence:*")
+
+    async def refresh(self):
+        """Prolong the expiry time of all connections of this worker"""
+
+        expiry = time.time() + self._ttl
+        for channel_name, (chat_id, user_card) in list(self._local.items()):
+            chat_key, cards_key, user_key = self._keys(chat_id, user_card["id"])
+            async with self._connection(chat_id).pipeline(transaction=False) as pipe:
+                pipe.zadd(user_key, {channel_name: expiry})
+                pipe.zadd(chat_key, {user_card["id"]: expiry})
+                pipe.hset(cards_key, user_card["id"], json.dumps(user_card))
+                for key in (chat_key, cards_key, user_key):
+                    pipe.expire(key, self._ttl)
+                await pipe.execute()
+
+    def _ensure_refresh_task(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            if self._refresh_task.get_loop() is asyncio.get_running_loop():
+                return
+
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while self._local:
+            await asyncio.sleep(self._ttl / 3)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Presence refresh failed: {e}")
+
+
+_backend = LayerBackend(
+    "PRESENCE_BACKEND",
+    "chat.services.presence.MemoryPresenceBackend",
+    "chat.services.presence.RedisPresenceBackend",
+    reset_on=("PRESENCE_TTL",),
+)
+
+
+def get_presence_backend() -> PresenceBackend:
+    """
+    Return the registry of the connections of this process, which announces users joining and leaving a chat.
+    PRESENCE_BACKEND overrides the choice by the channel layer. A new registry is created when PRESENCE_TTL changes.
+    """
+
+    return _backend.get()
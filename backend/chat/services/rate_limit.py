@@ -0,0 +1,176 @@
+import logging
+import time
+
+from channels.layers import get_channel_layer
+from chat.services.backends import LayerBackend
+from chat.services.redis_keys import delete_layer_keys, layer_key
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token buckets of websocket events: every event type in CHAT_RATE_LIMITS has a bucket per user
+    and a bucket per chat, {"user": (burst, events per second), "chat": (burst, events per second)}.
+
+    A bucket holds up to burst tokens and gets the given number of tokens per second. An event takes a token
+    of the user and of the chat, it is rejected if one of them has none. Other event types aren't limited.
+    """
+
+    async def acquire(self, event_type: str, user_id, chat_id) -> float:
+        """Take the tokens for the event. Return 0 or seconds until the event is allowed"""
+
+        raise NotImplementedError
+
+    async def clear(self):
+        """Forget all buckets"""
+
+        raise NotImplementedError
+
+
+class Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+    def refill(self, burst: float, rate: float, now: float) -> float:
+        """Add the tokens of the time since the last update. Return seconds until there is a token"""
+
+        tokens = self.tokens + (now - self.updated) * rate
+        self.tokens = tokens if tokens < burst else burst
+        self.updated = now
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / rate
+
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    Buckets in process memory, the limits apply to each ASGI worker. A check is two dict lookups and
+    in-place updates of the buckets, a bucket is created for the first event of a user or a chat.
+    Full buckets are removed when there are more than CHAT_RATE_LIMIT_KEYS of them.
+    """
+
+    def __init__(self):
+        # event type -> ({user_id: Bucket}, {chat_id: Bucket})
+        self._buckets: dict[str, tuple[dict, dict]] = {}
+        self._count = 0
+
+    async def acquire(self, event_type: str, user_id, chat_id) -> float:
+        limits = settings.CHAT_RATE_LIMITS.get(event_type)
+        if limits is None:
+            return 0
+
+        buckets = self._buckets.get(event_type)
+        if buckets is None:
+            buckets = self._buckets[event_type] = ({}, {})
+
+        now = time.monotonic()
+        (user_burst, user_rate), (chat_burst, chat_rate) = limits["user"], limits["chat"]
+        user = buckets[0].get(user_id) or self._add(buckets[0], user_id, user_burst, now)
+        chat = buckets[1].get(chat_id) or self._add(buckets[1], chat_id, chat_burst, now)
+        wait = max(user.refill(user_burst, user_rate, now), chat.refill(chat_burst, chat_rate, now))
+        if wait:
+            return wait
+
+        user.tokens -= 1
+        chat.tokens -= 1
+        return 0
+
+    async def clear(self):
+        self._buckets.clear()
+        self._count = 0
+
+    def _add(self, buckets: dict, key, burst: float, now: float) -> Bucket:
+        self._count += 1
+        if self._count > settings.CHAT_RATE_LIMIT_KEYS:
+            self._remove_full(now)
+        bucket = buckets[key] = Bucket(burst, now)
+        return bucket
+
+    def _remove_full(self, now: float):
+        """Remove the buckets which are full again: they are the same as new ones"""
+
+        for event_type, buckets in self._buckets.items():
+            limits = settings.CHAT_RATE_LIMITS.get(event_type)
+            for idx, (burst, rate) in enumerate((limits["user"], limits["chat"]) if limits else ()):
+                full = [
+                    key
+                    for key, bucket in buckets[idx].items()
+                    if bucket.tokens + (now - bucket.updated) * rate >= burst
+                ]
+                for key in full:
+                    del buckets[idx][key]
+                self._count -= len(full)
+        logger.debug(f"Rate limiter. {self._count} buckets are kept")
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Buckets of a user or a chat count the events sent to every ASGI worker: they are kept in redis,
+    refilled by the time of the redis server. A bucket is a hash <prefix>:rate:<event type>:<user|chat>:<id>
+    which expires when it would be full again. Buckets on the same redis host are checked and taken together;
+    if the channel layer has several hosts, the bucket of the user may be taken when the chat has no token.
+    """
+
+    # KEYS: buckets, ARGV: burst and rate of every bucket. Return seconds until all buckets have a token
+    ACQUIRE = """
+        local time = redis.call('TIME')
+        local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+        local tokens, wait = {}, 0
+        for i = 1, #KEYS do
+            local burst, rate = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+            local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'updated')
+            local bucket_tokens = tonumber(bucket[1]) or burst
+            tokens[i] = math.min(burst, bucket_tokens + (now - (tonumber(bucket[2]) or now)) * rate)
+            if tokens[i] < 1 then wait = math.max(wait, (1 - tokens[i]) / rate) end
+        end
+        for i = 1, #KEYS do
+            local burst, rate = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+            if wait == 0 then tokens[i] = tokens[i] - 1 end
+            redis.call('HSET', KEYS[i], 'tokens', tostring(tokens[i]), 'updated', tostring(now))
+            redis.call('PEXPIRE', KEYS[i], math.ceil((burst - tokens[i]) / rate * 1000) + 1000)
+        end
+        return tostring(wait)
+    """
+
+    def __init__(self, channel_layer=None):
+        self._layer = channel_layer or get_channel_layer()
+
+    async def acquire(self, event_type: str, user_id, chat_id) -> float:
+        limits = settings.CHAT_RATE_LIMITS.get(event_type)
+        if limits is None:
+            return 0
+
+        # redis host -> [keys, burst and rate of every key]
+        hosts: dict[int, list] = {}
+        for kind, object_id in (("user", user_id), ("chat", chat_id)):
+            key = f"rate:{event_type}:{kind}:{object_id}"
+            host = hosts.setdefault(self._layer.consistent_hash(key), [[], []])
+            host[0].append(layer_key(self._layer, key))
+            host[1].extend(limits[kind])
+
+        for index, (keys, args) in hosts.items():
+            wait = float(await self._layer.connection(index).eval(self.ACQUIRE, len(keys), *keys, *args))
+            if wait:
+                return wait
+        return 0
+
+    async def clear(self):
+        await delete_layer_keys(self._layer, "rate:*")
+
+
+_limiter = LayerBackend(
+    "CHAT_RATE_LIMIT_BACKEND", "chat.services.rate_limit.MemoryRateLimiter", "chat.services.rate_limit.RedisRateLimiter"
+)
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Return the limiter which the consumers of this process check before each websocket event.
+    The memory limiter counts only the events of this worker, the redis one (the default with a redis
+    channel layer) the events of all workers. CHAT_RATE_LIMIT_BACKEND overrides the choice.
+    """
+
+    return _limiter.get()
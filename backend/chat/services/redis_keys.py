@@ -0,0 +1,20 @@
+def layer_key(channel_layer, name: str) -> str:
+    """
+    Return the key <prefix>:<name> of the redis channel layer. The chat services keep their keys
+    under the prefix of the layer, next to its groups and channels.
+    """
+
+    return f"{channel_layer.prefix}:{name}"
+
+
+async def delete_layer_keys(channel_layer, pattern: str):
+    """
+    Delete the keys <prefix>:<pattern> (glob pattern) of the redis channel layer on all its hosts.
+    Other keys of the layer (groups, queued messages) are kept, unlike with channel_layer.flush().
+    """
+
+    for index in range(channel_layer.ring_size):
+        connection = channel_layer.connection(index)
+        keys = [key async for key in connection.scan_iter(match=layer_key(channel_layer, pattern), count=1000)]
+        if keys:
+            await connection.delete(*keys)
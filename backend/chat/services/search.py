@@ -0,0 +1,305 @@
+import logging
+import re
+from typing import Optional
+
+from chat.models.chat import Chat
+from chat.models.message import Message
+from chat.models.search import ChatSearchDocument, MessageSearchDocument, SearchToken
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.db.models import (
+    Exists,
+    F,
+    Func,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+)
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r"\w+")
+
+# matched words in snippets
+MARK_START, MARK_END = "<mark>", "</mark>"
+ELLIPSIS = "…"
+# max number of words in a snippet
+SNIPPET_WORDS = 16
+
+
+def words(text: Optional[str]) -> list[str]:
+    """Split text to lowercase words"""
+
+    return WORD.findall(text.lower()) if text else []
+
+
+def snippet(text: Optional[str], phrase: str, size: int = SNIPPET_WORDS) -> str:
+    """
+    Fragment of the text around the first matched word, matched words are in <mark> tags.
+    The same as FTS5 snippet() for DB backends without FTS5
+    """
+
+    if not text:
+        return ""
+
+    tokens = words(phrase)
+    found = list(WORD.finditer(text))
+    if not found:
+        return text
+
+    matched = [any(word.group().lower().startswith(token) for token in tokens) for word in found]
+    first = matched.index(True) if True in matched else 0
+    start = max(min(first - size // 4, len(found) - size), 0)
+    end = min(start + size, len(found))
+
+    parts = [] if start == 0 else [ELLIPSIS]
+    position = 0 if start == 0 else found[start].start()
+    for word, is_matched in zip(found[start:end], matched[start:end]):
+        if is_matched:
+            parts += [text[position : word.start()], MARK_START, word.group(), MARK_END]
+            position = word.end()
+    parts.append(text[position:] if end == len(found) else text[position : found[end - 1].end()] + ELLIPSIS)
+    return "".join(parts)
+
+
+class Snippet(Func):
+    """FTS5 snippet() of a column of the matched row"""
+
+    function = "snippet"
+    output_field = models.TextField()
+
+    def __init__(self, document: str, column: int, size: int = SNIPPET_WORDS):
+        super().__init__(F(document), Value(column), Value(MARK_START), Value(MARK_END), Value(ELLIPSIS), Value(size))
+
+
+class SearchIndex:
+    """
+    Full-text index of text fields of a model.
+
+    On SQLite with FTS5 it is an external content FTS5 table (document_model) kept in sync by triggers,
+    results are ranked by bm25. Other backends use SearchToken rows which are updated by post_save/post_delete
+    signals, results are ranked by the sum of weights of the matched words.
+    Words of the query are prefixes, all of them must be found.
+    Objects with deleted_field set (soft deleted) are not indexed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: type[models.Model],
+        document_model: type[models.Model],
+        weights: dict,
+        deleted_field: Optional[str] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.document_model = document_model
+        self.weights = weights
+        self.deleted_field = deleted_field
+        self.relation = document_model._meta.pk.remote_field.related_name
+
+    @staticmethod
+    def uses_fts(connection) -> bool:
+        """FTS5 is used on SQLite if it is compiled with it"""
+
+        if connection.vendor != "sqlite":
+            return False
+
+        if not hasattr(connection, "_fts5"):
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA compile_options")
+                connection._fts5 = any(option == "ENABLE_FTS5" for option, in cursor.fetchall())
+        return connection._fts5
+
+    def _connection(self, using: Optional[str] = None):
+        return connections[using or router.db_for_write(self.model)]
+
+    def _columns(self) -> list[str]:
+        """Columns of the FTS5 table: indexed columns of the content table and "id" """
+
+        return [self.model._meta.get_field(field).column for field in self.weights] + ["id"]
+
+    def search(self, queryset: QuerySet, phrase: str, path: str = "", ranked: bool = True) -> QuerySet:
+        """
+        Filter queryset by the phrase and order it by relevance.
+        path - lookup path from the queryset model to the indexed model, e.g. "chat__" for SavedChat.
+        ranked - order by relevance. If False, objects are annotated with search_id - id of the object in the index.
+        Ordering by it lets FTS5 return matches without sorting all of them.
+        """
+
+        tokens = words(phrase)
+        if not tokens:
+            return queryset.none()
+
+        if self.uses_fts(self._connection()):
+            query = " ".join(f'"{token}"*' for token in tokens)
+            queryset = queryset.filter(**{f"{path}{self.relation}__document__match": query})
+            if not ranked:
+                return queryset.annotate(search_id=F(f"{path}{self.relation}__rowid"))
+            # ordering only by rank lets FTS5 return the best matches first
+            return queryset.order_by(f"{path}{self.relation}__rank")
+
+        matched = SearchToken.objects.filter(index=self.name, object_id=OuterRef(f"{path}pk"))
+        for token in tokens:
+            queryset = queryset.filter(Exists(matched.filter(token__startswith=token)))
+
+        if not ranked:
+            return queryset.annotate(search_id=F(f"{path}pk"))
+
+        any_token = Q()
+        for token in tokens:
+            any_token |= Q(token__startswith=token)
+        rank = matched.filter(any_token).values("object_id").annotate(rank=Sum("weight")).values("rank")
+        return queryset.annotate(search_rank=Subquery(rank)).order_by("-search_rank", "-pk")
+
+    def annotate_snippet(self, queryset: QuerySet, field: str, path: str = "") -> QuerySet:
+        """
+        Annotate objects of a searched queryset with search_snippet - FTS5 snippet of the field.
+        Does nothing without FTS5, use snippet() for the objects.
+        """
+
+        if not self.uses_fts(self._connection()):
+            return queryset
+
+        document = f"{path}{self.relation}__document"
+        return queryset.annotate(search_snippet=Snippet(document, list(self.weights).index(field)))
+
+    def install(self, connection):
+        """Create the FTS5 table and its triggers if they don't exist. Rebuild the table if any of them was missing"""
+
+        if not self.uses_fts(connection):
+            return
+
+        quote = connection.ops.quote_name
+        table, content = self.document_model._meta.db_table, self.model._meta.db_table
+        # "id" is an unindexed copy of the rowid. Joins on it can't be pushed down to the FTS table,
+        # so SQLite always runs the full-text query first instead of a query per row of the joined table
+        fields = self._columns()
+        columns = ", ".join(quote(field) for field in fields)
+        new = ", ".join(f"new.{quote(field)}" for field in fields)
+        old = ", ".join(f"old.{quote(field)}" for field in fields)
+        indexed = ", ".join(quote(field) for field in fields[:-1])
+        updated = indexed
+        new_condition = old_condition = ""
+        if self.deleted_field:
+            deleted = quote(self.model._meta.get_field(self.deleted_field).column)
+            updated += f", {deleted}"
+            new_condition, old_condition = f" WHERE NOT new.{deleted}", f" WHERE NOT old.{deleted}"
+        # a deleted row must be removed with the values it was indexed with, so rows which aren't indexed are skipped
+        insert = f"INSERT INTO {quote(table)}(rowid, {columns}) SELECT new.id, {new}{new_condition};"
+        delete = (
+            f"INSERT INTO {quote(table)}({quote(table)}, rowid, {columns})"
+            + f" SELECT 'delete', old.id, {old}{old_condition};"
+        )
+
+        statements = {
+            table: f"CREATE VIRTUAL TABLE IF NOT EXISTS {quote(table)} USING fts5({indexed}, id UNINDEXED,"
+            + f" content={quote(content)}, content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            # the content table can be recreated by migrations, which drops its triggers
+            f"{table}_ai": f"CREATE TRIGGER IF NOT EXISTS {quote(table + '_ai')} AFTER INSERT ON {quote(content)}"
+            + f" BEGIN {insert} END",
+            f"{table}_ad": f"CREATE TRIGGER IF NOT EXISTS {quote(table + '_ad')} AFTER DELETE ON {quote(content)}"
+            + f" BEGIN {delete} END",
+            f"{table}_au": f"CREATE TRIGGER IF NOT EXISTS {quote(table + '_au')} AFTER UPDATE OF {updated}"
+            + f" ON {quote(content)} BEGIN {delete} {insert} END",
+        }
+
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (%s)" % ", ".join(["%s"] * len(statements)),
+                list(statements),
+            )
+            existing = {name for name, in cursor.fetchall()}
+            if len(existing) == len(statements):
+                return
+
+            for statement in statements.values():
+                cursor.execute(statement)
+
+            weights = ", ".join(str(float(weight)) for weight in self.weights.values())
+            cursor.execute(f"INSERT INTO {quote(table)}({quote(table)}, rank) VALUES ('rank', 'bm25({weights})')")
+            self._fill(cursor, connection)
+
+        logger.info(f"Search index '{self.name}' was created")
+
+    def _fill(self, cursor, connection):
+        """Index all rows of the content table which aren't deleted. FTS5 'rebuild' would index the deleted ones too"""
+
+        quote = connection.ops.quote_name
+        table, content = self.document_model._meta.db_table, self.model._meta.db_table
+        columns = ", ".join(quote(field) for field in self._columns())
+        condition = ""
+        if self.deleted_field:
+            condition = f" WHERE NOT {quote(self.model._meta.get_field(self.deleted_field).column)}"
+        cursor.execute(f"INSERT INTO {quote(table)}({quote(table)}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {quote(table)}(rowid, {columns}) SELECT id, {columns} FROM {quote(content)}{condition}"
+        )
+
+    def rebuild(self, using: Optional[str] = None):
+        """Index all objects again"""
+
+        connection = self._connection(using)
+        if self.uses_fts(connection):
+            self.install(connection)
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                self._fill(cursor, connection)
+            return
+
+        with transaction.atomic(using=connection.alias):
+            SearchToken.objects.using(connection.alias).filter(index=self.name).delete()
+            for obj in self.model.objects.using(connection.alias).iterator():
+                self.index_object(obj, connection.alias)
+
+    def index_object(self, obj: models.Model, using: Optional[str] = None):
+        """Update words of the object. Does nothing for FTS5 which is updated by triggers"""
+
+        connection = self._connection(using)
+        if self.uses_fts(connection):
+            return
+
+        if self.deleted_field and getattr(obj, self.deleted_field):
+            self.delete_object(obj, connection.alias)
+            return
+
+        tokens = {}
+        for field, weight in self.weights.items():
+            for token in words(getattr(obj, field)):
+                tokens[token[:100]] = tokens.get(token[:100], 0) + weight
+
+        SearchToken.objects.using(connection.alias).filter(index=self.name, object_id=obj.pk).delete()
+        SearchToken.objects.using(connection.alias).bulk_create(
+            SearchToken(index=self.name, object_id=obj.pk, token=token, weight=weight)
+            for token, weight in tokens.items()
+        )
+
+    def delete_object(self, obj: models.Model, using: Optional[str] = None):
+        """Delete words of the object. Does nothing for FTS5 which is updated by triggers"""
+
+        connection = self._connection(using)
+        if not self.uses_fts(connection):
+            SearchToken.objects.using(connection.alias).filter(index=self.name, object_id=obj.pk).delete()
+
+    def delete_objects(self, queryset: QuerySet, using: Optional[str] = None):
+        """Delete words of the objects in one query. Does nothing for FTS5 which is updated by triggers"""
+
+        connection = self._connection(using)
+        if not self.uses_fts(connection):
+            objects = queryset.using(connection.alias).values("pk")
+            SearchToken.objects.using(connection.alias).filter(index=self.name, object_id__in=objects).delete()
+
+
+CHAT_SEARCH = SearchIndex("chat", Chat, ChatSearchDocument, weights={"title": 10, "description": 1})
+
+MESSAGE_SEARCH = SearchIndex("message", Message, MessageSearchDocument, weights={"text": 1}, deleted_field="is_deleted")
+
+SEARCH_INDEXES = [CHAT_SEARCH, MESSAGE_SEARCH]
+
+
+def install_search_indexes(using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate handler: create FTS5 tables and triggers"""
+
+    for index in SEARCH_INDEXES:
+        index.install(connections[using])
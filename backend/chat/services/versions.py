@@ -0,0 +1,73 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class VersionCounters:
+    """
+    Version stamps of data, e.g. of the chats of a room, kept in the Django cache.
+
+    The version of an object is incremented whenever its data changes, so a pair (object, version)
+    identifies the data without reading it: it is a key of cached data and an ETag.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def cache(self):
+        return caches[settings.CHAT_VERSIONS_CACHE_ALIAS]
+
+    def _key(self, object_id) -> str:
+        return f"version:{self.name}:{object_id}"
+
+    def get(self, object_id) -> int:
+        """Return the current version"""
+
+        key = self._key(object_id)
+        version = self.cache.get(key)
+        if version is None:
+            # a new counter starts from the current time, so versions issued before it was evicted aren't repeated
+            self.cache.add(key, time.time_ns() // 1000, timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def increment(self, object_id):
+        """Change the version"""
+
+        try:
+            self.cache.incr(self._key(object_id))
+        except ValueError:
+            # no counter - no version was issued yet
+            pass
+        logger.debug(f"Version of {self.name} {object_id} was incremented")
+
+    def increment_on_commit(self, object_id, using: str = DEFAULT_DB_ALIAS):
+        """
+        Change the version when the transaction is committed.
+        Data read before the commit would get the new version otherwise.
+        """
+
+        if object_id is not None:
+            transaction.on_commit(lambda: self.increment(object_id), using=using)
+
+
+def request_etag(request, *versions) -> str:
+    """Weak ETag of a GET request (path with the query) for the versions of the data it returns"""
+
+    key = ":".join([request.get_full_path(), *(str(version) for version in versions)])
+    return f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+# chats of a room and their likes
+ROOM_VERSIONS = VersionCounters("room")
+# messages of a chat with their reactions and attachments
+CHAT_VERSIONS = VersionCounters("chat")
+# saved chats of a user
+SAVED_CHATS_VERSIONS = VersionCounters("saved_chats")
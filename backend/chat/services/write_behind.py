@@ -0,0 +1,228 @@
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from chat.models.message import Message
+from chat.services.versions import CHAT_VERSIONS
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def reserve_ids(model, count: int, using: Optional[str] = None) -> range:
+    """
+    Reserve count ids of the AUTOINCREMENT primary key of the model (SQLite): other inserts get greater ids.
+    SQLite keeps the greatest id of the table in sqlite_sequence and never issues smaller ones.
+    """
+
+    table = model._meta.db_table
+    using = using or router.db_for_write(model)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT %s, 0 WHERE NOT EXISTS "
+            + "(SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+            [table, table],
+        )
+        cursor.execute("UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s RETURNING seq", [count, table])
+        last = cursor.fetchone()[0]
+    return range(last - count + 1, last + 1)
+
+
+class MessageWriter:
+    """
+    Write-behind of new messages: a message gets its id and timestamp at once and is broadcast,
+    a background thread writes queued messages in batches, one transaction per batch.
+
+    Ids are reserved in blocks of CHAT_WRITE_BEHIND_ID_BLOCK in sqlite_sequence, so only SQLite is supported.
+    The thread waits up to CHAT_WRITE_BEHIND_INTERVAL seconds for more messages after the first one of a batch.
+    When CHAT_WRITE_BEHIND_QUEUE_SIZE messages are queued, save() raises queue.Full at once: it runs in the thread
+    of database_sync_to_async, waiting there would stall the DB work of all consumers of the process.
+    Queued messages are written on exit of the process. They are lost if the process is killed.
+
+    Messages are inserted with their ids and timestamps, post_save is sent for them as for saved messages.
+    The version of the chat is incremented when a message is queued and again when it is written:
+    the message history is loaded from the DB only after the message is written.
+    A message which can't be written (e.g. its chat was deleted) is logged and dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # held while ids are reserved (a write transaction), never together with _lock
+        self._ids_lock = threading.Lock()
+        # notified when messages are written
+        self._written = threading.Condition(self._lock)
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ids = iter(())
+        # ids of queued messages and of the batch being written
+        self._pending = set()
+        # message id: [(event loop, future)] of await_written()
+        self._waiters = defaultdict(list)
+        # written, batches, dropped. Counted in the process
+        self.stats = Counter()
+        atexit.register(self.close)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CHAT_WRITE_BEHIND and connections[router.db_for_write(Message)].vendor == "sqlite"
+
+    def save(self, message: Message) -> Message:
+        """Assign the id and the timestamp of the new message and queue it"""
+
+        self._start()
+        with self._ids_lock:
+            message.id = self._next_id()
+            message.timestamp = timezone.now()
+        with self._lock:
+            self._pending.add(message.id)
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self._done([message])
+            logger.error(f"Write-behind. Queue is full, message of chat {message.chat_id} was rejected")
+            raise
+        CHAT_VERSIONS.increment(message.chat_id)
+        return message
+
+    def is_pending(self, message_id) -> bool:
+        """
+        Return True if the message is queued or being written. It doesn't wait for the lock,
+        so it can be called on the event loop: a lookup in the set is atomic
+        """
+
+        return int(message_id) in self._pending
+
+    def wait(self, message_id, timeout: float = None) -> bool:
+        """Wait until the message is written, e.g. before it is changed. Return False on timeout"""
+
+        with self._lock:
+            return self._written.wait_for(lambda: int(message_id) not in self._pending, timeout)
+
+    async def await_written(self, message_id):
+        """
+        Async version of wait() for the event loop. No thread waits: the writer thread resolves the future
+        of the message with call_soon_threadsafe. _lock is held only to change the sets, not during writes
+        """
+
+        message_id = int(message_id)
+        if message_id not in self._pending:
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if message_id not in self._pending:
+                return
+            self._waiters[message_id].append((loop, future))
+        await future
+
+    def close(self):
+        """Write the queued messages and stop the thread"""
+
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+
+        self._queue.put(None)
+        thread.join()
+        logger.info(f"Write-behind. Stopped. Stats: {dict(self.stats)}")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._queue = queue.Queue(maxsize=settings.CHAT_WRITE_BEHIND_QUEUE_SIZE)
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _next_id(self) -> int:
+        try:
+            return next(self._ids)
+        except StopIteration:
+            self._ids = iter(reserve_ids(Message, settings.CHAT_WRITE_BEHIND_ID_BLOCK))
+            return next(self._ids)
+
+    def _run(self, messages: queue.Queue):
+        stopped = False
+        try:
+            while not stopped:
+                batch = [messages.get()]
+                if batch[0] is None:
+                    break
+
+                deadline = time.monotonic() + settings.CHAT_WRITE_BEHIND_INTERVAL
+                while len(batch) < settings.CHAT_WRITE_BEHIND_BATCH_SIZE:
+                    try:
+                        message = messages.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if message is None:
+                        stopped = True
+                        break
+                    batch.append(message)
+                self._write(batch)
+        finally:
+            connections.close_all()
+
+    def _write(self, batch: list[Message]):
+        try:
+            self._insert(batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            if len(batch) > 1:
+                # write the others
+                logger.warning(f"Write-behind. Batch of {len(batch)} messages failed: {e}")
+                for message in batch:
+                    self._write([message])
+                return
+
+            self.stats["dropped"] += 1
+            logger.error(f"Write-behind. Message {batch[0].id} of chat {batch[0].chat_id} was dropped: {e}")
+        finally:
+            self._done(batch)
+
+    @staticmethod
+    def _insert(batch: list[Message]):
+        using = router.db_for_write(Message)
+        fields = Message._meta.local_concrete_fields
+        size = connections[using].ops.bulk_batch_size(fields, batch)
+        with transaction.atomic(using=using):
+            for idx in range(0, len(batch), size):
+                # raw: the ids and the timestamps assigned when the messages were broadcast are kept
+                Message._base_manager._insert(batch[idx : idx + size], fields=fields, raw=True, using=using)
+            for message in batch:
+                message._state.adding, message._state.db = False, using
+                post_save.send(Message, instance=message, created=True, update_fields=None, raw=False, using=using)
+
+    def _done(self, batch: list[Message]):
+        with self._lock:
+            self._pending.difference_update(message.id for message in batch)
+            self._written.notify_all()
+            waiters = [waiter for message in batch for waiter in self._waiters.pop(message.id, ())]
+
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # the loop of the waiter is closed
+                pass
+
+
+def _resolve(future: asyncio.Future):
+    # a cancelled waiter (e.g. the consumer disconnected) is done already
+    if not future.done():
+        future.set_result(None)
+
+
+MESSAGE_WRITER = MessageWriter()
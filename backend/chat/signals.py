@@ -0,0 +1,179 @@
+from accounts.models import Profile
+from chat.models.chat import Chat, SavedChat
+from chat.models.chatLike import ChatLike
+from chat.models.message import Message
+from chat.models.reaction import Reaction
+from chat.services.message_buffer import MESSAGE_BUFFER
+from chat.services.search import CHAT_SEARCH, MESSAGE_SEARCH
+from chat.services.versions import CHAT_VERSIONS, ROOM_VERSIONS, SAVED_CHATS_VERSIONS
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Chat)
+def index_chat(sender, instance, using, **kwargs):
+    """
+    Update words of the chat in the search index (only for DB backends without FTS5).
+    """
+
+    CHAT_SEARCH.index_object(instance, using)
+
+
+@receiver(post_delete, sender=Chat)
+def delete_chat_from_index(sender, instance, using, **kwargs):
+    """
+    Delete words of the chat from the search index (only for DB backends without FTS5).
+    """
+
+    CHAT_SEARCH.delete_object(instance, using)
+
+
+@receiver(pre_delete, sender=Chat)
+def delete_chat_messages_from_index(sender, instance, using, **kwargs):
+    """
+    Delete words of the messages of the chat from the search index (only for DB backends without FTS5).
+    Messages are deleted only with their chat. A post_delete receiver for them would make Django load every message
+    of a deleted chat to send the signal.
+    """
+
+    MESSAGE_SEARCH.delete_objects(instance.message_set.all(), using)
+
+
+@receiver(post_save, sender=Message)
+def index_message(sender, instance, using, **kwargs):
+    """
+    Update words of the message in the search index, soft deleted messages are removed from it
+    (only for DB backends without FTS5).
+    """
+
+    MESSAGE_SEARCH.index_object(instance, using)
+
+
+@receiver(post_save, sender=Chat)
+@receiver(post_delete, sender=Chat)
+def increment_room_version(sender, instance, using, **kwargs):
+    """
+    Change the version of the room of the chat: its cached listings and ETags are invalidated.
+    """
+
+    ROOM_VERSIONS.increment_on_commit(instance.room, using)
+
+
+@receiver(post_save, sender=ChatLike)
+@receiver(post_delete, sender=ChatLike)
+def increment_room_version_on_like(sender, instance, using, origin=None, **kwargs):
+    """
+    Change the version of the room of the liked chat: the number of likes and the popular order changed.
+    """
+
+    if isinstance(origin, Chat) or not instance.chat_id:
+        # deleted with the chat, which changes the version itself
+        return
+
+    room = Chat.objects.using(using).filter(pk=instance.chat_id).values_list("room", flat=True).first()
+    ROOM_VERSIONS.increment_on_commit(room, using)
+
+
+@receiver(post_save, sender=SavedChat)
+@receiver(post_delete, sender=SavedChat)
+def increment_saved_chats_version(sender, instance, using, **kwargs):
+    """
+    Change the version of the saved chats of the user.
+    """
+
+    SAVED_CHATS_VERSIONS.increment_on_commit(instance.user_id, using)
+
+
+@receiver(post_save, sender=Message)
+def increment_chat_version(sender, instance, using, **kwargs):
+    """
+    Change the version of the message history of the chat: a message was sent, edited or deleted.
+    """
+
+    CHAT_VERSIONS.increment_on_commit(instance.chat_id, using)
+
+
+@receiver(post_delete, sender=Chat)
+def increment_chat_version_on_delete(sender, instance, using, **kwargs):
+    """
+    Change the version of the message history of the deleted chat: its ETag and buffered messages are invalidated.
+    The messages are deleted with the chat, this receiver is sent once for all of them.
+    """
+
+    CHAT_VERSIONS.increment_on_commit(instance.pk, using)
+
+
+@receiver(post_delete, sender=Chat)
+def remove_buffered_chat(sender, instance, using, **kwargs):
+    """
+    Remove the messages of the deleted chat from the message buffer of the process.
+    """
+
+    transaction.on_commit(lambda: MESSAGE_BUFFER.remove(instance.pk), using=using)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Profile)
+def check_message_author_change(sender, instance, using, update_fields=None, **kwargs):
+    """
+    Check if the username or the avatar shown with the messages and reactions of the user is changed.
+    """
+
+    field = sender._meta.get_field("username" if sender is User else "avatar")
+    instance._author_changed = False
+    if instance._state.adding or (update_fields is not None and field.name not in update_fields):
+        return
+
+    old = sender.objects.using(using).filter(pk=instance.pk).values_list(field.attname, flat=True).first()
+    instance._author_changed = old is not None and old != field.get_prep_value(getattr(instance, field.attname))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def increment_author_chats_version(sender, instance, using, **kwargs):
+    """
+    Change the versions of the chats with messages or reactions of the user whose username or avatar was changed.
+    """
+
+    if not getattr(instance, "_author_changed", False):
+        return
+
+    user_id = instance.pk if sender is User else instance.user_id
+    chat_ids = set(Message.objects.using(using).filter(user_id=user_id).values_list("chat_id", flat=True).distinct())
+    chat_ids.update(
+        Reaction.objects.using(using).filter(user_id=user_id).values_list("message__chat_id", flat=True).distinct()
+    )
+    for chat_id in chat_ids:
+        CHAT_VERSIONS.increment_on_commit(chat_id, using)
+
+
+@receiver(post_save, sender=Reaction)
+def increment_chat_version_on_reaction(sender, instance, using, **kwargs):
+    """
+    Change the version of the message history of the chat: a reaction was posted.
+    Removed reactions change it in ChatConsumer: a delete signal receiver would make Django load
+    every message of a deleted chat to delete their reactions.
+    """
+
+    chat_id = Message.objects.using(using).filter(pk=instance.message_id).values_list("chat_id", flat=True).first()
+    CHAT_VERSIONS.increment_on_commit(chat_id, using)
+
+
+@receiver(m2m_changed, sender=Message.attachments.through)
+def increment_chat_version_on_attachments(sender, instance, action, using, **kwargs):
+    """
+    Change the version of the message history of the chat: attachments of a message were changed.
+    """
+
+    if action.startswith("post_") and isinstance(instance, Message):
+        CHAT_VERSIONS.increment_on_commit(instance.chat_id, using)
@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from chat.models.chat import Chat, SavedChat
 from chat.permissions import IsCreatorOrReadOnly, IsEmailConfirm
@@ -7,12 +8,16 @@ from chat.serializers.chat import (
     ChatSerializerForChatUpdate,
     SavedChatSerializer,
 )
+from chat.services.chat_list_cache import CHAT_LIST_CACHE
+from chat.services.search import CHAT_SEARCH
+from chat.services.versions import ROOM_VERSIONS, SAVED_CHATS_VERSIONS, request_etag
 from config.settings import CHOICE_ROOM
 from django.conf import settings
-from django.db.models import Count
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from files.services.default_avatars import DefaultAvatars
-from files.services.images import resize_in_memory_uploaded_file
+from files.services.images import get_image_processor
 from rest_framework import generics, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
@@ -22,6 +27,21 @@ from rest_framework.response import Response
 logger = logging.getLogger(__name__)
 
 
+def chat_list_etag(request, room_name, sorting_name) -> Optional[str]:
+    """ETag of a chat list: the version of the room"""
+
+    if (room_name, room_name) in CHOICE_ROOM:
+        return request_etag(request, ROOM_VERSIONS.get(room_name))
+
+
+def saved_chats_etag(request, room_name) -> Optional[str]:
+    """ETag of saved chats: the version of the saved chats of the user and the version of the room"""
+
+    if (room_name, room_name) in CHOICE_ROOM:
+        return request_etag(request, SAVED_CHATS_VERSIONS.get(request.user.id), ROOM_VERSIONS.get(room_name))
+
+
+@method_decorator(etag(chat_list_etag), name="get")
 class ChatGetAPIView(generics.GenericAPIView):
     """API to get chats"""
 
@@ -52,27 +72,35 @@ class ChatGetAPIView(generics.GenericAPIView):
                 {"type": "client_error", "errors": {"detail": "wrong sorting_name"}}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # get chats, serialize, and return list of chats by pagination
-        # sorting_name = new
+        # the page is the same for all users, it is cached until chats of the room or their likes change
+        paginator = self.paginator
+        limit, offset = paginator.get_limit(request), paginator.get_offset(request)
+        page = CHAT_LIST_CACHE.get_page(
+            room_name,
+            sorting_name,
+            offset,
+            limit,
+            ROOM_VERSIONS.get(room_name),
+            lambda: self.get_page(request, room_name, sorting_name),
+        )
+
+        paginator.request, paginator.limit, paginator.offset, paginator.count = request, limit, offset, page["count"]
+        return paginator.get_paginated_response(page["results"])
+
+    def get_page(self, request, room_name, sorting_name) -> dict:
+        """Get chats, paginate and serialize only the page"""
+
+        queryset = ChatSerializer.prefetch(Chat.objects.filter(room=room_name))
         if sorting_name == "new":
-            self.queryset = Chat.objects.filter(room=room_name).order_by("-timestamp")
-            serializer = ChatSerializer(self.queryset, context={"request": request}, many=True)
-            page = self.paginate_queryset(serializer.data)
-            return self.get_paginated_response(page)
-        # sorting_name = old
+            queryset = queryset.order_by("-timestamp")
         if sorting_name == "old":
-            self.queryset = Chat.objects.filter(room=room_name).order_by("timestamp")
-            serializer = ChatSerializer(self.queryset, context={"request": request}, many=True)
-            page = self.paginate_queryset(serializer.data)
-            return self.get_paginated_response(page)
-        # sorting_name = popular
+            queryset = queryset.order_by("timestamp")
         if sorting_name == "popular":
-            self.queryset = (
-                Chat.objects.filter(room=room_name).annotate(likes_number=Count("chatlike")).order_by("-likes_number")
-            )
-            serializer = ChatSerializer(self.queryset, context={"request": request}, many=True)
-            page = self.paginate_queryset(serializer.data)
-            return self.get_paginated_response(page)
+            queryset = queryset.order_by("-likes_count", "-id")
+
+        page = self.paginate_queryset(queryset)
+        serializer = ChatSerializer(page, context={"request": request}, many=True)
+        return {"count": self.paginator.count, "results": list(serializer.data)}
 
 
 class ChatPostAPIView(generics.GenericAPIView):
@@ -116,7 +144,7 @@ class ChatPostAPIView(generics.GenericAPIView):
             if img:
                 if img.size > settings.MAX_FILE_SIZE:
                     raise ValidationError(f"File size must be less than {settings.MAX_FILE_SIZE} bytes")
-                img = resize_in_memory_uploaded_file(img, 200)
+                img = get_image_processor().resize(img, 200)
             else:
                 img = DefaultAvatars().get_chat_avatar(room_name).as_posix()
                 logger.info(f"Post chat. No image provided. Using default avatar: {img}")
@@ -178,13 +206,14 @@ class UpdateDeleteChatApiView(generics.RetrieveUpdateDestroyAPIView):
 
         if chat_img:
             logger.debug(f"Chat img: {chat_img}")
-            serializer.validated_data["img"] = resize_in_memory_uploaded_file(chat_img, 200)
+            serializer.validated_data["img"] = get_image_processor().resize(chat_img, 200)
 
         serializer.save()
         logger.info(f"{request.user} PATCH CHAT: {serializer.data}")
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@method_decorator(etag(saved_chats_etag), name="get")
 class GetSavedChatApiView(generics.GenericAPIView):
     """Get saved chat(s) for the user"""
 
@@ -206,11 +235,13 @@ class GetSavedChatApiView(generics.GenericAPIView):
                 {"type": "client_error", "errors": [{"detail": "wrong room"}]}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # get saved chats, serialize, and return list of chats by pagination
-        self.queryset = SavedChat.objects.filter(user=request.user, chat__room=room_name).order_by("-id")
-        serializer = SavedChatSerializer(self.queryset, context={"request": request}, many=True)
-        page = self.paginate_queryset(serializer.data)
-        return self.get_paginated_response(page)
+        # get saved chats, paginate and serialize only the page
+        queryset = SavedChatSerializer.prefetch(
+            SavedChat.objects.filter(user=request.user, chat__room=room_name).order_by("-id")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = SavedChatSerializer(page, context={"request": request}, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class PostSavedChatApiView(generics.GenericAPIView):
@@ -277,15 +308,17 @@ class MyChatsApiView(generics.GenericAPIView):
                 {"type": "client_error", "errors": [{"detail": "wrong room"}]}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # get chats, serialize, and return list of chats by pagination
-        self.queryset = Chat.objects.filter(user=request.user, room=room_name).order_by("-timestamp")
-        serializer = ChatSerializer(self.queryset, context={"request": request}, many=True)
-        page = self.paginate_queryset(serializer.data)
-        return self.get_paginated_response(page)
+        # get chats, paginate and serialize only the page
+        queryset = ChatSerializer.prefetch(
+            Chat.objects.filter(user=request.user, room=room_name).order_by("-timestamp")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = ChatSerializer(page, context={"request": request}, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class ChatSearchGetAPIView(generics.GenericAPIView):
-    """API to get chats with searched phrase in title"""
+    """API to get chats with searched phrase in title or description"""
 
     permission_classes = (IsAuthenticated, IsEmailConfirm)
     parser_classes = [JSONParser, MultiPartParser, FormParser]
@@ -296,7 +329,7 @@ class ChatSearchGetAPIView(generics.GenericAPIView):
         tags=["Chat"],
     )
     def get(self, request, room_name, phrase):
-        """Get a chat list from a certain room with searched phrase in title"""
+        """Get a chat list from a certain room with searched phrase in title or description, the most relevant first"""
 
         logger.info(f"Chat search, room_name: {room_name}, sorting_name: {phrase}")
 
@@ -306,15 +339,15 @@ class ChatSearchGetAPIView(generics.GenericAPIView):
                 {"type": "client_error", "errors": [{"detail": "wrong room"}]}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # get chats, serialize, and return list of chats by pagination
-        self.queryset = Chat.objects.filter(room=room_name, title__contains=phrase).order_by("-timestamp")
-        serializer = ChatSerializer(self.queryset, context={"request": request}, many=True)
-        page = self.paginate_queryset(serializer.data)
-        return self.get_paginated_response(page)
+        # get chats, paginate and serialize only the page
+        queryset = ChatSerializer.prefetch(CHAT_SEARCH.search(Chat.objects.filter(room=room_name), phrase))
+        page = self.paginate_queryset(queryset)
+        serializer = ChatSerializer(page, context={"request": request}, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class SavedChatSearchGetAPIView(generics.GenericAPIView):
-    """API to get saved chats with searched phrase in title"""
+    """API to get saved chats with searched phrase in title or description"""
 
     permission_classes = (IsAuthenticated, IsEmailConfirm)
     parser_classes = [JSONParser, MultiPartParser, FormParser]
@@ -325,7 +358,7 @@ class SavedChatSearchGetAPIView(generics.GenericAPIView):
         tags=["Chat"],
     )
     def get(self, request, room_name, phrase):
-        """Get a saved chat list from a certain room with searched phrase in title"""
+        """Get a saved chat list from a certain room with searched phrase in title or description, the most relevant first"""
 
         logger.info(f"Chat search, room_name: {room_name}, sorting_name: {phrase}")
 
@@ -335,15 +368,17 @@ class SavedChatSearchGetAPIView(generics.GenericAPIView):
                 {"type": "client_error", "errors": [{"detail": "wrong room"}]}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # get chats, serialize, and return list of chats by pagination
-        self.queryset = SavedChat.objects.filter(chat__room=room_name, chat__title__contains=phrase).order_by("-id")
-        serializer = SavedChatSerializer(self.queryset, context={"request": request}, many=True)
-        page = self.paginate_queryset(serializer.data)
-        return self.get_paginated_response(page)
+        # get chats, paginate and serialize only the page
+        queryset = SavedChatSerializer.prefetch(
+            CHAT_SEARCH.search(SavedChat.objects.filter(chat__room=room_name), phrase, path="chat__")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = SavedChatSerializer(page, context={"request": request}, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class MyChatSearchGetAPIView(generics.GenericAPIView):
-    """API to get my chats with searched phrase in title"""
+    """API to get my chats with searched phrase in title or description"""
 
     permission_classes = (IsAuthenticated, IsEmailConfirm)
     parser_classes = [JSONParser, MultiPartParser, FormParser]
@@ -354,7 +389,7 @@ class MyChatSearchGetAPIView(generics.GenericAPIView):
         tags=["Chat"],
     )
     def get(self, request, room_name, phrase):
-        """Get my chat list from a certain room with searched phrase in title"""
+        """Get my chat list from a certain room with searched phrase in title or description, the most relevant first"""
 
         logger.info(f"Chat search, room_name: {room_name}, sorting_name: {phrase}")
 
@@ -364,8 +399,10 @@ class MyChatSearchGetAPIView(generics.GenericAPIView):
                 {"type": "client_error", "errors": [{"detail": "wrong room"}]}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # get chats, serialize, and return list of chats by pagination
-        self.queryset = Chat.objects.filter(user=request.user, room=room_name, title__contains=phrase).order_by("-id")
-        serializer = ChatSerializer(self.queryset, context={"request": request}, many=True)
-        page = self.paginate_queryset(serializer.data)
-        return self.get_paginated_response(page)
+        # get chats, paginate and serialize only the page
+        queryset = ChatSerializer.prefetch(
+            CHAT_SEARCH.search(Chat.objects.filter(user=request.user, room=room_name), phrase)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = ChatSerializer(page, context={"request": request}, many=True)
+        return self.get_paginated_response(serializer.data)
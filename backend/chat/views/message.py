@@ -2,13 +2,21 @@ import logging
 
 from chat.models.chat import Chat
 from chat.models.message import Message
+from chat.pagination import MessageCursorPagination, MessageSearchCursorPagination
 from chat.permissions import (
     IsCreatorOrReadOnly,
     IsEmailConfirm,
     IsNotDeleted,
     IsOnlyTextInRequestData,
 )
-from chat.serializers.message import MessageSerializer
+from chat.serializers.message import MessageSearchSerializer, MessageSerializer
+from chat.services.message_buffer import MESSAGE_BUFFER, load_latest
+from chat.services.search import MESSAGE_SEARCH
+from chat.services.versions import CHAT_VERSIONS, request_etag
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
@@ -16,21 +24,70 @@ from rest_framework.permissions import IsAuthenticated
 logger = logging.getLogger(__name__)
 
 
+def messages_etag(request, chat_id) -> str:
+    """ETag of the message history: the version of the chat"""
+
+    return request_etag(request, CHAT_VERSIONS.get(chat_id))
+
+
 @extend_schema_view(
     get=extend_schema(tags=["Message"]),
 )
+@method_decorator(etag(messages_etag), name="get")
 class MessagesApiView(generics.ListAPIView):
     """Get messages from the certain chat"""
 
     permission_classes = (IsAuthenticated, IsEmailConfirm)
     serializer_class = MessageSerializer
+    pagination_class = MessageCursorPagination
     http_method_names = ["get"]
 
     def get_queryset(self):
         """Get messages from the certain chat"""
 
+        chat = get_object_or_404(Chat, pk=self.kwargs["chat_id"])
+        return MessageSerializer.prefetch(chat.message_set.all())
+
+    def list(self, request, *args, **kwargs):
+        """The latest messages are served from MESSAGE_BUFFER, older ones are queried"""
+
+        paginator = self.paginator
+        if not paginator.is_latest_page(request) or paginator.get_limit(request) > MESSAGE_BUFFER.size:
+            return super().list(request, *args, **kwargs)
+
+        # the buffer of another process may still have a deleted chat
+        if not Chat.objects.filter(pk=self.kwargs["chat_id"]).exists():
+            raise Http404
+        messages, has_older = MESSAGE_BUFFER.get_latest(
+            self.kwargs["chat_id"], lambda: load_latest(self.get_queryset())
+        )
+        return paginator.get_paginated_response(paginator.paginate_latest(request, messages, has_older))
+
+
+@extend_schema_view(
+    get=extend_schema(tags=["Message"]),
+)
+class MessageSearchApiView(generics.ListAPIView):
+    """Search messages of the certain chat by words of their text. Deleted messages are not found"""
+
+    permission_classes = (IsAuthenticated, IsEmailConfirm)
+    serializer_class = MessageSearchSerializer
+    pagination_class = MessageSearchCursorPagination
+    http_method_names = ["get"]
+
+    def get_queryset(self):
+        """Get found messages of the chat with snippets of their text"""
+
         chat_id = self.kwargs["chat_id"]
-        return Chat.objects.get(pk=chat_id).message_set.all()
+        messages = Message.objects.filter(chat_id=chat_id, is_deleted=False)
+        # the pagination orders messages by search_id
+        messages = MESSAGE_SEARCH.search(messages, self.kwargs["phrase"], ranked=False)
+        return MessageSerializer.prefetch(MESSAGE_SEARCH.annotate_snippet(messages, "text"))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["phrase"] = self.kwargs["phrase"]
+        return context
 
 
 @extend_schema_view(
@@ -41,6 +98,6 @@ class UpdateDeleteMessageApiView(generics.RetrieveUpdateDestroyAPIView):
     """Update text of message and Soft delete of message"""
 
     permission_classes = (IsAuthenticated, IsOnlyTextInRequestData, IsCreatorOrReadOnly, IsEmailConfirm, IsNotDeleted)
-    queryset = Message.objects.all()
+    queryset = MessageSerializer.prefetch(Message.objects.all())
     serializer_class = MessageSerializer
     http_method_names = ["patch", "delete"]
@@ -0,0 +1,67 @@
+import os
+
+# Presence registry of online chat users.
+# Empty: redis backend if the channel layer is redis, otherwise memory backend.
+PRESENCE_BACKEND = os.environ.get("PRESENCE_BACKEND", "")
+# Seconds until a connection of a stopped worker expires (redis backend)
+PRESENCE_TTL = 60
+
+# Alias of the cache in CACHES with version stamps of rooms, chats and saved chats (chat.services.versions)
+CHAT_VERSIONS_CACHE_ALIAS = "default"
+
+# Cache of room chat listings (GET chat/get/<room>/<sorting>/)
+# alias of the cache in CACHES
+CHAT_LIST_CACHE_ALIAS = "default"
+# Seconds to keep a page. Pages are invalidated by changes of chats and likes, it only limits the memory
+CHAT_LIST_CACHE_TIMEOUT = 300
+# Seconds other requests wait for the request which computes a missing page
+CHAT_LIST_CACHE_LOCK_TIMEOUT = 5
+
+# Latest messages of chats kept in the memory of a process (chat.services.message_buffer)
+# messages per chat: the first page of the message history is served from the buffer
+CHAT_MESSAGE_BUFFER_SIZE = 100
+# JSON size in bytes of messages of all chats, the least recently used chats are evicted
+CHAT_MESSAGE_BUFFER_MEMORY = 32 * 1024 * 1024
+
+# Sequence numbers and replay log of the events broadcast to chats (chat.services.event_log).
+# Empty: redis log if the channel layer is redis, otherwise memory log.
+CHAT_EVENT_LOG_BACKEND = os.environ.get("CHAT_EVENT_LOG_BACKEND", "")
+# events kept per chat: a client which missed more of them has to resync
+CHAT_EVENT_LOG_SIZE = 1000
+# Seconds to keep the events of a chat after its last event
+CHAT_EVENT_LOG_TTL = 24 * 60 * 60
+
+# Write-behind of new messages (chat.services.write_behind, SQLite only): messages without attachments
+# are broadcast at once and written in batches by a background thread
+CHAT_WRITE_BEHIND = os.environ.get("CHAT_WRITE_BEHIND", "false") == "true"
+# messages waiting to be written, when it is full new messages are rejected
+CHAT_WRITE_BEHIND_QUEUE_SIZE = 10000
+# messages written in one transaction
+CHAT_WRITE_BEHIND_BATCH_SIZE = 500
+# Seconds to wait for more messages of a batch after its first message
+CHAT_WRITE_BEHIND_INTERVAL = 0.05
+# ids reserved at once
+CHAT_WRITE_BEHIND_ID_BLOCK = 100
+
+# Outbound queue of every websocket connection (chat.services.outbound): frames to the client are sent
+# by a writer task, so a slow client doesn't hold up the events of its chat
+# frames waiting to be sent
+CHAT_OUTBOUND_QUEUE_SIZE = 256
+# When the queue is full: "drop_oldest" - the oldest presence, reaction or like event is dropped,
+# "coalesce" - a queued event about the same user, reaction or like is dropped, otherwise the oldest one,
+# "disconnect" - the connection is closed. It is closed too if there is no event which can be dropped
+CHAT_OUTBOUND_POLICY = os.environ.get("CHAT_OUTBOUND_POLICY", "coalesce")
+# close code of a connection closed because of a slow client
+CHAT_OUTBOUND_CLOSE_CODE = 4008
+
+# Rate limits of websocket events (chat.services.rate_limit): token buckets per user and per chat,
+# (burst, events per second). Other event types aren't limited
+CHAT_RATE_LIMITS = {
+    "chat_message": {"user": (10, 1), "chat": (100, 20)},
+    "message_reaction": {"user": (20, 2), "chat": (100, 20)},
+    "chat_was_liked/unliked": {"user": (5, 0.2), "chat": (50, 5)},
+}
+# Empty: redis limiter (shared by workers) if the channel layer is redis, otherwise memory limiter
+CHAT_RATE_LIMIT_BACKEND = os.environ.get("CHAT_RATE_LIMIT_BACKEND", "")
+# buckets of the memory limiter, then the full ones are removed
+CHAT_RATE_LIMIT_KEYS = 100000
@@ -1 +1,11 @@
+import os
+
 MAX_FILE_SIZE = 1 * 1024 * 1024  # 1 MiB
+# Websocket attachment upload (binary frames)
+UPLOAD_CHUNK_SIZE = 64 * 1024  # recommended chunk size, bytes
+MAX_UPLOADS_PER_CONNECTION = 10
+
+# Image verification and resizing in worker processes
+IMAGE_PROCESSING_WORKERS = int(os.environ.get("IMAGE_PROCESSING_WORKERS", 2))  # 0 - in the calling thread
+IMAGE_PROCESSING_QUEUE_SIZE = 32  # max images waiting or being processed
+IMAGE_PROCESSING_TIMEOUT = 10  # seconds
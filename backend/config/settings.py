@@ -35,7 +35,42 @@ DEBUG = True
 WSGI_APPLICATION = "config.wsgi.application"
 ASGI_APPLICATION = "config.asgi.application"
 
-CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+# Channel layer. The in-memory layer only delivers group events inside one ASGI process.
+# Set CHANNEL_LAYER_URL (e.g. redis://localhost:6379/0) to share chat groups between several workers.
+CHANNEL_LAYER_URL = os.environ.get("CHANNEL_LAYER_URL", None)
+CHANNEL_LAYER_BACKEND = os.environ.get("CHANNEL_LAYER_BACKEND", "channels_redis.core.RedisChannelLayer")
+
+
+def get_channel_layers(url: str = None, backend: str = CHANNEL_LAYER_BACKEND) -> dict:
+    """Return CHANNEL_LAYERS setting for the given broker url (in-memory layer if url is empty)"""
+
+    if not url:
+        return {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+    return {"default": {"BACKEND": backend, "CONFIG": {"hosts": [url]}}}
+
+
+CHANNEL_LAYERS = get_channel_layers(CHANNEL_LAYER_URL)
+
+# Cache. The local memory cache works only inside one process.
+# Set CACHE_URL to share it between several workers: a redis url (e.g. redis://localhost:6379/1)
+# or a directory of the file cache (e.g. /tmp/4rooms-cache).
+CACHE_URL = os.environ.get("CACHE_URL", None)
+
+
+def get_caches(url: str = None) -> dict:
+    """Return CACHES setting for the given url (local memory cache if url is empty)"""
+
+    if not url:
+        return {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url}}
+
+    return {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": url}}
+
+
+CACHES = get_caches(CACHE_URL)
 
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
@@ -154,12 +189,48 @@ TEMPLATES = [
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 DB_PATH = os.environ.get("DJANGO_DB_PATH", BASE_DIR / "db.sqlite3")
 # print(f"DB_PATH: {DB_PATH}")
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": DB_PATH,
-    }
+
+# SQLite tuning of the production profile, applied when a connection is opened
+SQLITE_PRAGMAS = {
+    # readers don't block the writer and the writer doesn't block readers
+    "journal_mode": "WAL",
+    # in WAL mode commits are durable on checkpoints, a power loss may roll back only the last commits
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    # negative - size in KiB (64 MiB)
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
 }
+# seconds a writer waits for the write lock before "database is locked"
+SQLITE_BUSY_TIMEOUT = 20
+# seconds a connection is reused by the requests of a worker thread
+DB_CONN_MAX_AGE = 600
+
+
+def get_databases(path, production: bool = False) -> dict:
+    """
+    Return DATABASES setting for the SQLite database at the path.
+
+    Production profile: WAL with SQLITE_PRAGMAS, persistent connections and a single writer -
+    the config.sqlite3 backend runs transactions of a process one after another and starts them with BEGIN IMMEDIATE,
+    so writers wait for the write lock in turn (up to SQLITE_BUSY_TIMEOUT) instead of failing
+    with "database is locked" when a transaction which has read tries to write.
+    """
+
+    database = {"ENGINE": "django.db.backends.sqlite3", "NAME": path}
+    if production:
+        database["ENGINE"] = "config.sqlite3"
+        database["OPTIONS"] = {
+            "init_command": ";".join(f"PRAGMA {pragma}={value}" for pragma, value in SQLITE_PRAGMAS.items()),
+            "transaction_mode": "IMMEDIATE",
+            "timeout": SQLITE_BUSY_TIMEOUT,
+        }
+        database["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+        database["CONN_HEALTH_CHECKS"] = True
+    return {"default": database}
+
+
+DATABASES = get_databases(DB_PATH)
 
 
 # Password validation
@@ -232,6 +303,12 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=30),
 }
 
+# Decoded access tokens and users of authenticated requests kept in the memory of a process (login.auth_cache)
+# entries of the tokens and of the users, the least recently used ones are evicted
+AUTH_CACHE_SIZE = 10000
+# Seconds to keep a user. Changes of the user are seen at once in the process which made them, in other ones after it
+AUTH_CACHE_TIMEOUT = 60
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -270,6 +347,7 @@ EMAIL_HOST_PASSWORD = os.getenv("HOST_APP_PASSWORD")
 # Rooms categories for models
 CHOICE_ROOM = (("books", "books"), ("cinema", "cinema"), ("music", "music"), ("games", "games"))
 
+from .chat import *  # noqa
 from .files import *  # noqa
 from .logger import *  # noqa
 from .swagger import *  # noqa
@@ -4,11 +4,10 @@ from .settings import *  # noqa
 
 DEBUG = False
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {
-            "hosts": [(os.environ.get("REDIS_HOST", "localhost"), 6379)],
-        },
-    },
-}
+CHANNEL_LAYER_URL = os.environ.get("CHANNEL_LAYER_URL") or f"redis://{os.environ.get('REDIS_HOST', 'localhost')}:6379"
+CHANNEL_LAYERS = get_channel_layers(CHANNEL_LAYER_URL)  # noqa
+
+CACHE_URL = os.environ.get("CACHE_URL") or f"redis://{os.environ.get('REDIS_HOST', 'localhost')}:6379/1"
+CACHES = get_caches(CACHE_URL)  # noqa
+
+DATABASES = get_databases(DB_PATH, production=True)  # noqa
@@ -0,0 +1,55 @@
+import threading
+from collections import defaultdict
+
+from django.db.backends.sqlite3 import base
+
+# one writer lock per database file in the process
+_writer_locks = defaultdict(threading.Lock)
+_writer_locks_lock = threading.Lock()
+
+
+def get_writer_lock(name) -> threading.Lock:
+    with _writer_locks_lock:
+        return _writer_locks[str(name)]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend with a single writer per process.
+
+    Transactions ('atomic' blocks) of the threads of the process run one after another: the next one starts
+    as soon as the previous one ends, instead of polling the database lock with growing sleeps
+    of the busy timeout. Writers of other processes still wait with the busy timeout.
+    """
+
+    _holds_writer_lock = False
+
+    def _start_transaction_under_autocommit(self):
+        get_writer_lock(self.settings_dict["NAME"]).acquire()
+        self._holds_writer_lock = True
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self._release_writer_lock()
+            raise
+
+    def _release_writer_lock(self):
+        if self._holds_writer_lock:
+            self._holds_writer_lock = False
+            get_writer_lock(self.settings_dict["NAME"]).release()
+
+    def _commit(self):
+        super()._commit()
+        self._release_writer_lock()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self._release_writer_lock()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._release_writer_lock()
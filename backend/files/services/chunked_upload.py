@@ -0,0 +1,74 @@
+import logging
+import math
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+from .images import ImageProcessingUnavailable, get_image_processor
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkedUpload:
+    """
+    File uploaded in binary chunks (websocket frames).
+
+    Chunks are written to a temporary file as they arrive, so memory usage doesn't depend on the file size.
+    The upload is rejected as soon as it gets bigger than the declared size or MAX_FILE_SIZE.
+    """
+
+    def __init__(self, name: str, size: int):
+        if not isinstance(size, int) or size <= 0:
+            raise ValidationError("Attachment size is invalid")
+
+        if size > settings.MAX_FILE_SIZE:
+            msg = (
+                f"File is too big: {math.ceil(size / 1024 / 1024)} MB."
+                + f" Must be less than {int(settings.MAX_FILE_SIZE / 1024 / 1024)} MB"
+            )
+            logger.error(msg)
+            raise ValidationError(msg)
+
+        self.id = uuid4().hex
+        self.declared_size = size
+        self.received_size = 0
+        self.is_committed = False
+        self.file = TemporaryUploadedFile(name=name, content_type=None, size=size, charset=None)
+
+    def write(self, chunk: bytes):
+        """Append chunk to the file"""
+
+        if self.is_committed:
+            raise ValidationError("Attachment upload is already committed")
+
+        if self.received_size + len(chunk) > self.declared_size:
+            raise ValidationError("Attachment is bigger than the declared size")
+
+        self.file.write(chunk)
+        self.received_size += len(chunk)
+
+    async def commit(self) -> str:
+        """Check that the file is complete and is an image. Return image format"""
+
+        if self.received_size != self.declared_size:
+            raise ValidationError(f"Attachment is incomplete: {self.received_size} of {self.declared_size} bytes")
+
+        try:
+            file_format = await get_image_processor().aget_format(self.file)
+        except ImageProcessingUnavailable:
+            raise
+        except Exception:
+            logger.error(f"Upload {self.id} is not an image.")
+            raise ValidationError("File is not an image or image format is not supported.") from None
+
+        self.file.seek(0)
+        self.file.content_type = file_format
+        self.is_committed = True
+        return file_format
+
+    def close(self):
+        """Delete the temporary file"""
+
+        self.file.close()
@@ -1,8 +1,20 @@
+import asyncio
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from io import BytesIO
+from typing import Optional, Union
 
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException
 
 logger = logging.getLogger(__name__)
 
@@ -59,37 +71,188 @@ def resize_image(image: Image, length: int) -> Image:
         return resized_image
 
 
-def resize_in_memory_uploaded_file(image: InMemoryUploadedFile, length: int) -> InMemoryUploadedFile:
+def _open(source: Union[bytes, str]):
+    """Return file object for image data or path to the image file"""
+
+    return open(source, "rb") if isinstance(source, str) else BytesIO(source)
+
+
+def resize_image_data(source: Union[bytes, str], length: int) -> Optional[tuple[bytes, str]]:
     """
-    Resize in memory uploaded file to a square length x length. Return the resized image.
+    Resize image (data or path to the file) to a square length x length. Return resized data and image format,
+    or None if the image already has the required size.
     """
 
-    # Create a PIL Image object from the InMemoryUploadedFile
-    img = Image.open(image)
+    img = Image.open(_open(source))
 
     if img.size == (length, length):
-        return image
+        return None
 
-    # Resize the image
-    resized_image = resize_image(img, length)
-
-    # Create a BytesIO object to store the resized image
+    # Save the resized image in the same format
     output = BytesIO()
+    resize_image(img, length).save(output, format=img.format)
+    return output.getvalue(), img.format
+
+
+def get_image_data_format(source: Union[bytes, str]) -> str:
+    """
+    Return the format of the image (data or path to the file) or throw an error if the format is not supported.
+    """
+
+    with _open(source) as file:
+        return get_image_format(file)
+
+
+class ImageProcessingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Image processing is busy. Try again later."
+    default_code = "image_processing_unavailable"
+
+
+class ImageProcessor:
+    """
+    Runs CPU-bound Pillow work in a pool of worker processes, so it blocks neither the event loop
+    nor the threads which serve requests and DB queries.
+
+    The number of images waiting or being processed is limited by queue_size, a new task is rejected
+    with ImageProcessingUnavailable when the queue is full or when the result isn't ready in timeout seconds.
+    With workers = 0 images are processed in the calling thread.
+
+    Workers are started by a forkserver (spawn where it isn't available), not forked from the server process:
+    a fork of a process with threads, DB connections and channel layer sockets may deadlock.
+    The pool is created with the first task, so manage.py commands and processes which never handle
+    an image don't start a forkserver.
+
+    resize() and get_format() wait for the result in the calling thread. They are called by synchronous
+    DRF views (avatars in accounts.views, chat images in chat.views.chat), which need the resized file
+    before the serializer is saved. The request thread only waits, without the GIL, while a worker decodes
+    the image, and no longer than timeout. Code on the event loop uses aget_format().
+    """
+
+    # start method of the worker processes
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+    def __init__(self, workers: int = None, queue_size: int = None, timeout: float = None):
+        self._workers = settings.IMAGE_PROCESSING_WORKERS if workers is None else workers
+        self._queue_size = queue_size or settings.IMAGE_PROCESSING_QUEUE_SIZE
+        self._timeout = timeout or settings.IMAGE_PROCESSING_TIMEOUT
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _submit(self, func, *args) -> Future:
+        with self._lock:
+            if self._pending >= self._queue_size:
+                logger.error(f"Image processing queue is full: {self._pending} tasks")
+                raise ImageProcessingUnavailable()
+
+            if self._pool is None:
+                self._start()
+            self._pending += 1
+
+        future = self._pool.submit(func, *args)
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _start(self):
+        self._pool = ProcessPoolExecutor(
+            max_workers=self._workers, mp_context=multiprocessing.get_context(self.start_method)
+        )
+
+    def _task_done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _run(self, func, *args):
+        if not self._workers:
+            return func(*args)
+
+        try:
+            return self._submit(func, *args).result(timeout=self._timeout)
+        except FuturesTimeoutError:
+            logger.error(f"Image processing timed out: {func.__name__}")
+            raise ImageProcessingUnavailable("Image processing timed out. Try again later.") from None
+
+    async def _arun(self, func, *args):
+        if not self._workers:
+            return await sync_to_async(func, thread_sensitive=False)(*args)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self._submit(func, *args)), timeout=self._timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Image processing timed out: {func.__name__}")
+            raise ImageProcessingUnavailable("Image processing timed out. Try again later.") from None
+
+    @staticmethod
+    def _read(file) -> Union[bytes, str]:
+        """Return path of a temporary file (workers read it themselves) or file content"""
+
+        if hasattr(file, "temporary_file_path"):
+            file.flush()
+            return file.temporary_file_path()
+
+        file.seek(0)
+        data = file.read()
+        file.seek(0)
+        return data
+
+    def resize(self, image: UploadedFile, length: int) -> UploadedFile:
+        """
+        Resize uploaded image to a square length x length. Return the resized image.
+        """
+
+        resized = self._run(resize_image_data, self._read(image), length)
+        if resized is None:
+            return image
+
+        data, img_format = resized
+        return InMemoryUploadedFile(
+            BytesIO(data),
+            "ImageField",
+            f"{image.name.split('.')[0]}.{img_format.lower()}",
+            f"image/{img_format.lower()}",
+            len(data),
+            None,
+        )
+
+    def get_format(self, file) -> str:
+        """
+        Return the format of the image file or throw an error if the format is not supported.
+        """
+
+        return self._run(get_image_data_format, self._read(file))
+
+    async def aget_format(self, file) -> str:
+        """
+        Async version of get_format
+        """
+
+        return await self._arun(get_image_data_format, self._read(file))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_image_processor: Optional[ImageProcessor] = None
+
+
+def get_image_processor() -> ImageProcessor:
+    """Return image processor configured by IMAGE_PROCESSING_* settings"""
+
+    global _image_processor
+
+    if _image_processor is None:
+        _image_processor = ImageProcessor()
 
-    # Save the resized image to the BytesIO object in JPEG format
-    resized_image.save(output, format=img.format)
+    return _image_processor
 
-    # Move the cursor to the beginning of the BytesIO object
-    output.seek(0)
 
-    # Create a new InMemoryUploadedFile with the resized image
-    resized_image = InMemoryUploadedFile(
-        output,
-        "ImageField",
-        f"{image.name.split('.')[0]}.{img.format.lower()}",
-        f"image/{img.format.lower()}",
-        output.tell(),
-        None,
-    )
+@receiver(setting_changed)
+def reset_image_processor(setting, **kwargs):
+    global _image_processor
 
-    return resized_image
+    if setting.startswith("IMAGE_PROCESSING_") and _image_processor is not None:
+        _image_processor.shutdown()
+        _image_processor = None
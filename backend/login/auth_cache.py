@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """LRU cache of values with expiry times in the memory of the process, at most AUTH_CACHE_SIZE entries"""
+
+    def __init__(self):
+        # key -> (expiry time, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, expires: float):
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AuthCache:
+    """
+    Decoded access tokens and users of authenticated requests and websocket connections.
+
+    A token is verified once and kept until it expires. A user is kept as the values of its fields for
+    AUTH_CACHE_TIMEOUT seconds, every request gets its own User instance built from them.
+    Changes of users (post_save, post_delete) remove them from the cache of the process,
+    other processes see the changes after AUTH_CACHE_TIMEOUT.
+    """
+
+    # log the stats every N requests
+    log_every = 1000
+
+    def __init__(self):
+        self.tokens = TTLCache()
+        self.users = TTLCache()
+        # token_hits, token_misses, user_hits, user_misses. Counted in the process
+        self.stats = Counter()
+
+    def get_token(self, raw_token):
+        """Return the validated token or None if it isn't cached"""
+
+        token = self.tokens.get(self._token_key(raw_token))
+        self._count("token", token is not None)
+        return token
+
+    def set_token(self, raw_token, token):
+        self.tokens.set(self._token_key(raw_token), token, token["exp"])
+
+    def get_user(self, user_id):
+        """Return a new User instance with the cached fields or None if the user isn't cached"""
+
+        fields = self.users.get(str(user_id))
+        self._count("user", fields is not None)
+        if fields is None:
+            return None
+
+        return self._build_user(fields)
+
+    def get(self, raw_token) -> Optional[tuple]:
+        """
+        Return (user, validated token) if both are cached, otherwise None. Only hits are counted,
+        the misses are counted by get_token() and get_user() of the authentication which follows.
+        """
+
+        token = self.tokens.get(self._token_key(raw_token))
+        fields = token and self.users.get(str(token.get(api_settings.USER_ID_CLAIM)))
+        if not fields:
+            return None
+
+        self._count("token", True)
+        self._count("user", True)
+        return self._build_user(fields), token
+
+    def set_user(self, user):
+        values = {field.attname: getattr(user, field.attname) for field in user._meta.concrete_fields}
+        expires = time.time() + settings.AUTH_CACHE_TIMEOUT
+        self.users.set(str(user.pk), {"db": user._state.db, "values": values}, expires)
+
+    def delete_user(self, user_id):
+        self.users.delete(str(user_id))
+
+    def clear(self):
+        self.tokens.clear()
+        self.users.clear()
+
+    def get_stats(self) -> dict:
+        """Return hits, misses and hit rates of the process and the number of cached tokens and users"""
+
+        stats = {"tokens": len(self.tokens), "users": len(self.users)}
+        for name in ("token", "user"):
+            hits, misses = self.stats[f"{name}_hits"], self.stats[f"{name}_misses"]
+            stats.update(
+                {
+                    f"{name}_hits": hits,
+                    f"{name}_misses": misses,
+                    f"{name}_hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+                }
+            )
+        return stats
+
+    @staticmethod
+    def _build_user(fields: dict):
+        User = get_user_model()
+        return User.from_db(fields["db"], list(fields["values"]), list(fields["values"].values()))
+
+    @staticmethod
+    def _token_key(raw_token) -> str:
+        return raw_token.decode("utf-8") if isinstance(raw_token, bytes) else str(raw_token)
+
+    def _count(self, name: str, hit: bool):
+        self.stats[f"{name}_hits" if hit else f"{name}_misses"] += 1
+        if name == "token" and (self.stats["token_hits"] + self.stats["token_misses"]) % self.log_every == 0:
+            logger.info(f"Auth cache. Stats: {self.get_stats()}")
+
+
+AUTH_CACHE = AuthCache()
@@ -1,7 +1,10 @@
 import logging
+from urllib.parse import parse_qs
 
+from login.auth_cache import AUTH_CACHE
 from rest_framework.request import Request
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +38,49 @@ class CustomJWTAuthentication(JWTAuthentication):
 
         return user, validated_token
 
+    def authenticate_cached(self, request):
+        """Return (user, validated token) from AUTH_CACHE without the DB or None if they aren't cached"""
+
+        raw_token = self._get_raw_token(request)
+        if raw_token is None:
+            return None
+
+        authenticated = AUTH_CACHE.get(raw_token)
+        if authenticated is None or not self.is_cached_user_valid(authenticated[0]):
+            return None
+        return authenticated
+
+    def get_validated_token(self, raw_token):
+        """Return the validated token. The signature of a token is verified once, until it expires (AUTH_CACHE)"""
+
+        validated_token = AUTH_CACHE.get_token(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            AUTH_CACHE.set_token(raw_token, validated_token)
+        return validated_token
+
+    def get_user(self, validated_token):
+        """Return the user of the token, queried once per AUTH_CACHE_TIMEOUT (AUTH_CACHE)"""
+
+        user = AUTH_CACHE.get_user(validated_token.get(api_settings.USER_ID_CLAIM))
+        if user is None or not self.is_cached_user_valid(user):
+            user = super().get_user(validated_token)
+            AUTH_CACHE.set_user(user)
+        return user
+
+    @staticmethod
+    def is_cached_user_valid(user) -> bool:
+        """
+        The check of JWTAuthentication.get_user() for a cached user. An inactive user is removed from the cache,
+        the user is queried again and rejected if it is still inactive
+        """
+
+        if user.is_active:
+            return True
+
+        AUTH_CACHE.delete_user(user.pk)
+        return False
+
     def _get_raw_token(self, request_data):
         """
         Returns the raw token string that was used to authenticate the request.
@@ -55,10 +101,10 @@ class CustomJWTAuthentication(JWTAuthentication):
                     logger.debug(f"Raw token found in Authorization header: {token_portion(raw_token)}")
                 else:
                     if "query_string" in request_data:
-                        token = request_data["query_string"].decode("utf-8").split("=")
-                        if len(token) == 2:
-                            if token[0] == "token":
-                                raw_token = token[1]
-                                logger.debug(f"Raw token found in query string: {token_portion(raw_token)}")
+                        # the query string may have other parameters: ?token=...&history=50
+                        token = parse_qs(request_data["query_string"].decode("utf-8")).get("token", [])
+                        if len(token) == 1:
+                            raw_token = token[0]
+                            logger.debug(f"Raw token found in query string: {token_portion(raw_token)}")
 
         return raw_token
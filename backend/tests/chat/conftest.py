@@ -1,11 +1,17 @@
 import json
+import threading
 from typing import Tuple
 
 import pytest
 from accounts.models import User
+from asgiref.sync import async_to_sync
 from channels.db import database_sync_to_async
 from channels.testing import WebsocketCommunicator
 from chat.models.chat import Chat
+from chat.services.event_log import get_event_log
+from chat.services.presence import get_presence_backend
+from chat.services.rate_limit import get_rate_limiter
+from config.settings import get_channel_layers
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -81,3 +87,37 @@ def client_factory():
             return client
 
     return _factory
+
+
+@pytest.fixture
+def redis_url():
+    """Url of an in-process fake redis server (stand-in for the shared channel layer broker)"""
+
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    host, port = server.server_address
+    yield f"redis://{host}:{port}"
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def redis_channel_layers(settings, redis_url):
+    """Switch the default channel layer to the redis layer"""
+
+    settings.CHANNEL_LAYERS = get_channel_layers(redis_url)
+    return settings.CHANNEL_LAYERS
+
+
+@pytest.fixture(autouse=True)
+def clear_presence():
+    """Forget online users, events and rate limits after each test (chat ids are reused because of reset_sequences)"""
+
+    yield
+    async_to_sync(get_presence_backend().clear)()
+    async_to_sync(get_event_log().clear)()
+    async_to_sync(get_rate_limiter().clear)()
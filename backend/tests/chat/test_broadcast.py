@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+import pytest
+from channels.testing import WebsocketCommunicator
+from chat.models.chat import Chat
+from config.asgi import application
+from django.test.client import Client
+
+from .conftest import get_msgs, wait_for_message
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_broadcast_is_encoded_once(
+    client: Client, settings, chat: Chat, user_factory, client_factory, monkeypatch
+):
+    clients = []
+    for idx in range(4):
+        user, token = await user_factory.create(
+            username=f"u{idx}", password="p", email=f"e{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        clients.append(await client_factory.create(settings, application, chat, user, token))
+
+    await asyncio.sleep(1)
+    for c in clients:
+        await get_msgs(c)
+
+    encoded = []
+    dumps = json.dumps
+
+    def counting_dumps(obj, *args, **kwargs):
+        if isinstance(obj, dict) and "event_type" in obj and not kwargs:
+            encoded.append(obj["event_type"])
+        return dumps(obj, *args, **kwargs)
+
+    monkeypatch.setattr(json, "dumps", counting_dumps)
+
+    sender: WebsocketCommunicator = clients[0]
+    await sender.send_json_to({"event_type": "chat_message", "message": {"chat": chat.id, "text": "hello"}})
+
+    for c in clients:
+        assert await wait_for_message(c)
+        msgs = await get_msgs(c)
+        assert len(msgs) == 1
+        assert msgs[0]["event_type"] == "chat_message"
+        assert msgs[0]["message"]["text"] == "hello"
+        assert msgs[0]["message"]["user_name"] == "u0"
+
+    # the first one is encoded by the sending client, the second one by the server for all 4 subscribers
+    assert encoded == ["chat_message", "chat_message"]
+
+    for c in clients:
+        await c.disconnect()
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+from channels.layers import channel_layers, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from channels_redis.core import RedisChannelLayer
+from chat.models.chat import Chat
+from config.asgi import application
+from config.settings import get_channel_layers
+from django.test.client import Client
+
+from .conftest import get_msgs, wait_for_message
+
+
+def test_channel_layers_setting():
+    assert get_channel_layers(None) == {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    assert get_channel_layers("redis://localhost:6379/1") == {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": ["redis://localhost:6379/1"]},
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_group_send_between_workers(redis_url):
+    # two layer instances with separate connections act as two ASGI workers
+    worker1 = RedisChannelLayer(hosts=[redis_url])
+    worker2 = RedisChannelLayer(hosts=[redis_url])
+
+    channel1 = await worker1.new_channel()
+    channel2 = await worker2.new_channel()
+    await worker1.group_add("books-1", channel1)
+    await worker2.group_add("books-1", channel2)
+
+    await worker2.group_send("books-1", {"type": "send_message", "message": {"text": "hi"}})
+
+    for worker, channel in [(worker1, channel1), (worker2, channel2)]:
+        event = await asyncio.wait_for(worker.receive(channel), timeout=5)
+        assert event == {"type": "send_message", "message": {"text": "hi"}}
+
+    await worker1.flush()
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_consumer_receives_event_from_other_worker(
+    client: Client, settings, redis_channel_layers, redis_url, chat: Chat, user_factory, client_factory
+):
+    assert isinstance(get_channel_layer(), RedisChannelLayer)
+
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    client1: WebsocketCommunicator = await client_factory.create(settings, application, chat, user1, t1)
+    await wait_for_message(client1, timeout=1)
+    await get_msgs(client1)
+
+    # the event is published by a worker which doesn't own the websocket connection
+    other_worker = RedisChannelLayer(hosts=[redis_url])
+    await other_worker.group_send(
+        f"{chat.room}-{chat.id}",
+        {
+            "type": "send_broadcast",
+            "event_type": "message_reaction_was_posted",
+            "text": json.dumps({"event_type": "message_reaction_was_posted", "id": 1, "reaction": "😀", "user": "u2"}),
+        },
+    )
+
+    assert await wait_for_message(client1)
+    msgs = await get_msgs(client1)
+    assert len(msgs) == 1
+    assert msgs[0]["event_type"] == "message_reaction_was_posted"
+    assert msgs[0]["user"] == "u2"
+
+    await client1.disconnect()
+    await channel_layers["default"].flush()
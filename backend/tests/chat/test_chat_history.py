@@ -0,0 +1,86 @@
+import pytest
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from chat.models.chat import Chat
+from chat.models.message import Message
+from config.asgi import application
+from django.test.client import Client
+from django.urls import reverse
+
+from .conftest import get_msgs, wait_for_message
+
+
+@database_sync_to_async
+def create_messages(chat: Chat, user, count: int):
+    for idx in range(count):
+        Message.objects.create(chat=chat, user=user, text=f"message {idx}")
+
+
+async def connect(chat: Chat, query_string: str) -> WebsocketCommunicator:
+    """Connect with the token in the query string, as browsers do"""
+
+    client = WebsocketCommunicator(
+        application, f"/ws/chat/{chat.room}/{chat.id}/?{query_string}", headers=[(b"origin", b"http://localhost:8000")]
+    )
+    connected, _ = await client.connect(timeout=20)
+    assert connected
+    return client
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_history_on_connect(client: Client, settings, chat: Chat, user_factory, client_factory):
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    user2, t2 = await user_factory.create(username="u2", password="p", email="e2@4rooms.pro", is_email_confirmed=True)
+    await create_messages(chat, user1, 3)
+    client1: WebsocketCommunicator = await client_factory.create(settings, application, chat, user1, t1)
+    await wait_for_message(client1)
+    await get_msgs(client1)
+
+    client2 = await connect(chat, f"token={t2}&history=2")
+    assert await wait_for_message(client2)
+    msgs = await get_msgs(client2)
+    # the latest messages and online users in one frame instead of online_user_list
+    assert len(msgs) == 1
+    assert msgs[0]["event_type"] == "chat_history"
+    assert [message["text"] for message in msgs[0]["messages"]] == ["message 1", "message 2"]
+    assert [user["username"] for user in msgs[0]["user_list"]] == ["u1"]
+
+    # the cursor continues the history in the message history API
+    response = await sync_to_async(client.get)(
+        reverse("get_messages", args=[chat.id]),
+        {"before": msgs[0]["before"]},
+        headers={"Authorization": f"Bearer {t2}"},
+    )
+    assert [message["text"] for message in response.json()["results"]] == ["message 0"]
+
+    # messages sent after the history are events
+    await client1.send_json_to({"event_type": "chat_message", "message": {"chat": chat.id, "text": "new"}})
+    assert await wait_for_message(client2)
+    msgs = await get_msgs(client2)
+    assert [(msg["event_type"], msg["message"]["text"]) for msg in msgs] == [("chat_message", "new")]
+
+    # the new message was added to the buffered history
+    client3 = await connect(chat, f"token={t2}&history=100")
+    assert await wait_for_message(client3)
+    msgs = await get_msgs(client3)
+    assert [message["text"] for message in msgs[0]["messages"]] == ["message 0", "message 1", "message 2", "new"]
+    assert msgs[0]["before"] is None
+
+    for c in (client1, client2, client3):
+        await c.disconnect()
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+@pytest.mark.parametrize("history", ["0", "all", ""])
+async def test_no_history_on_connect(chat: Chat, user_factory, history):
+    user, token = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    await create_messages(chat, user, 1)
+
+    client = await connect(chat, f"token={token}&history={history}")
+    assert await wait_for_message(client)
+    msgs = await get_msgs(client)
+    assert [{**msg, "seq": None} for msg in msgs] == [{"event_type": "online_user_list", "user_list": [], "seq": None}]
+    await client.disconnect()
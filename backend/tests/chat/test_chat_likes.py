@@ -0,0 +1,63 @@
+from io import StringIO
+
+import pytest
+from chat.models.chat import Chat
+from chat.models.chatLike import ChatLike
+from chat.services.likes import toggle_chat_like
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+
+
+@pytest.fixture
+def users():
+    return [
+        get_user_model().objects.create_user(
+            username=f"u{idx}", password="p", email=f"e{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(3)
+    ]
+
+
+@pytest.mark.django_db
+def test_toggle_chat_like(chat: Chat, users):
+    assert toggle_chat_like(users[0], chat.id) is True
+    assert toggle_chat_like(users[1], chat.id) is True
+    chat.refresh_from_db()
+    assert chat.likes_count == 2
+
+    assert toggle_chat_like(users[0], chat.id) is False
+    chat.refresh_from_db()
+    assert chat.likes_count == 1
+    assert list(ChatLike.objects.values_list("user", flat=True)) == [users[1].id]
+
+
+@pytest.mark.django_db
+def test_chat_like_is_unique(chat: Chat, users):
+    ChatLike.objects.create(user=users[0], chat=chat)
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        ChatLike.objects.create(user=users[0], chat=chat)
+
+
+@pytest.mark.django_db
+def test_reconcile_chat_likes(chat: Chat, users):
+    for user in users:
+        toggle_chat_like(user, chat.id)
+
+    # likes are deleted with the user, the counter isn't updated
+    users[0].delete()
+    chat.refresh_from_db()
+    assert chat.likes_count == 3
+
+    out = StringIO()
+    call_command("reconcile_chat_likes", "--dry-run", stdout=out)
+    assert f"Chat {chat.id}: likes_count 3, likes 2" in out.getvalue()
+    chat.refresh_from_db()
+    assert chat.likes_count == 3
+
+    out = StringIO()
+    call_command("reconcile_chat_likes", stdout=out)
+    assert "1 chat(s) fixed" in out.getvalue()
+    chat.refresh_from_db()
+    assert chat.likes_count == 2
@@ -0,0 +1,155 @@
+import threading
+import time
+
+import pytest
+from chat.models.chat import Chat
+from chat.services.chat_list_cache import CHAT_LIST_CACHE, ChatListCache
+from chat.services.likes import toggle_chat_like
+from chat.services.versions import ROOM_VERSIONS
+from config.settings import get_caches
+from django.contrib.auth import get_user_model
+from django.test.client import Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+
+
+@pytest.fixture
+def get_titles(client: Client, user):
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def _get_titles(room="books", sorting="popular", **params) -> list[str]:
+        response = client.get(reverse("get_chats", args=[room, sorting]), params, headers=headers)
+        assert response.status_code == 200
+        return [chat["title"] for chat in response.json()["results"]]
+
+    return _get_titles
+
+
+def test_get_caches():
+    assert get_caches(None) == {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    assert get_caches("redis://localhost:6379/1") == {
+        "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://localhost:6379/1"}
+    }
+    assert get_caches("/tmp/cache") == {
+        "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp/cache"}
+    }
+
+
+@pytest.mark.django_db
+def test_chat_list_is_cached(chat_factory, get_titles):
+    chat_factory(title="first", room="books")
+    stats = CHAT_LIST_CACHE.get_stats()
+
+    assert get_titles() == ["first"]
+    # changed without signals, the cached page is returned
+    Chat.objects.filter(title="first").update(title="renamed")
+    assert get_titles() == ["first"]
+    # another page window
+    assert get_titles(limit=1, offset=0) == ["renamed"]
+
+    assert CHAT_LIST_CACHE.get_stats()["hits"] == stats["hits"] + 1
+    assert CHAT_LIST_CACHE.get_stats()["misses"] == stats["misses"] + 2
+
+
+@pytest.mark.django_db
+def test_cached_page_links(chat_factory, client: Client, user):
+    for idx in range(3):
+        chat_factory(title=f"chat {idx}", room="books")
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    url = reverse("get_chats", args=["books", "old"])
+    responses = [client.get(url, {"limit": 1, "offset": 1}, headers=headers).json() for _ in range(2)]
+    assert responses[0] == responses[1]
+    assert responses[1]["count"] == 3
+    assert "offset=2" in responses[1]["next"]
+    assert [chat["title"] for chat in responses[1]["results"]] == ["chat 1"]
+
+
+@pytest.mark.django_db
+def test_chat_list_is_invalidated(chat_factory, get_titles, user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        first = chat_factory(title="first", room="books")
+        music = chat_factory(title="music", room="music")
+    assert get_titles() == ["first"]
+    assert get_titles(room="music") == ["music"]
+    music_version = ROOM_VERSIONS.get("music")
+
+    # a new chat
+    with django_capture_on_commit_callbacks(execute=True):
+        second = chat_factory(title="second", room="books")
+    assert get_titles(sorting="old") == ["first", "second"]
+
+    # a like changes the popular order
+    with django_capture_on_commit_callbacks(execute=True):
+        toggle_chat_like(user, second.id)
+    assert get_titles() == ["second", "first"]
+
+    # the chat is updated
+    with django_capture_on_commit_callbacks(execute=True):
+        first.title = "updated"
+        first.save()
+    assert get_titles(sorting="old") == ["updated", "second"]
+
+    # the chat is deleted together with its likes
+    with django_capture_on_commit_callbacks(execute=True):
+        second.delete()
+    assert get_titles() == ["updated"]
+
+    # other rooms are not invalidated
+    assert ROOM_VERSIONS.get("music") == music_version
+    assert get_titles(room="music") == ["music"]
+
+
+@pytest.mark.django_db
+def test_invalidation_waits_for_commit(chat_factory, get_titles, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        chat_factory(title="first", room="books")
+    version = ROOM_VERSIONS.get("books")
+    assert len(callbacks) == 1
+    assert ROOM_VERSIONS.get("books") == version
+
+    callbacks[0]()
+    assert ROOM_VERSIONS.get("books") == version + 1
+
+
+def test_cold_page_is_computed_once():
+    cache = ChatListCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"count": 1, "results": ["page"]}
+
+    pages = []
+    threads = [
+        threading.Thread(target=lambda: pages.append(cache.get_page("books", "new", 0, 100, 1, compute)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert pages == [{"count": 1, "results": ["page"]}] * 8
+    assert cache.get_stats()["misses"] == 1
+    assert cache.get_stats()["waits"] == 7
+    assert cache.get_stats()["hit_ratio"] == 7 / 8
+
+
+def test_lock_timeout(settings):
+    settings.CHAT_LIST_CACHE_LOCK_TIMEOUT = 0.1
+    cache = ChatListCache()
+    # another request computes the page and never finishes
+    cache.cache.add("chat_list:books:new:0:100:lock", True, version=1)
+
+    assert cache.get_page("books", "new", 0, 100, 1, lambda: {"count": 0, "results": []}) == {"count": 0, "results": []}
+    assert cache.get_stats()["lock_timeouts"] == 1
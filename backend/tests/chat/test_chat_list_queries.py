@@ -0,0 +1,78 @@
+import pytest
+from chat.models.chat import Chat, SavedChat
+from chat.services.likes import toggle_chat_like
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from login.auth_cache import AUTH_CACHE
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def create_chats(room: str, users: list, count: int):
+    for idx in range(count):
+        chat = Chat.objects.create(title=f"chat {idx}", room=room, description="test description", user=users[0])
+        # chat idx is liked by idx % 4 users
+        for user in users[: idx % 4]:
+            toggle_chat_like(user, chat.id)
+        SavedChat.objects.create(chat=chat, user=users[0])
+
+
+def get_list(client: Client, url: str, token: str) -> tuple[int, list]:
+    # the same queries for every page: the user of the token is queried
+    AUTH_CACHE.clear()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    return len(queries), response.json()["results"]
+
+
+@pytest.fixture
+def users():
+    return [
+        get_user_model().objects.create_user(
+            username=f"u{idx}", password="p", email=f"e{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(4)
+    ]
+
+
+@pytest.mark.parametrize(
+    "url_name, kwargs",
+    [
+        ("get_chats", {"sorting_name": "new"}),
+        ("get_chats", {"sorting_name": "old"}),
+        ("get_chats", {"sorting_name": "popular"}),
+        ("my_chats", {}),
+        ("get_saved_chats", {}),
+        ("get_searched_chats", {"phrase": "chat"}),
+        ("get_searched_saved_chats", {"phrase": "chat"}),
+        ("get_searched_my_chats", {"phrase": "chat"}),
+    ],
+)
+@pytest.mark.django_db
+def test_chat_list_queries(client: Client, users, url_name, kwargs):
+    token = str(RefreshToken.for_user(users[0]).access_token)
+    create_chats("books", users, 3)
+    create_chats("music", users, 30)
+
+    small_queries, small_chats = get_list(client, reverse(url_name, kwargs={"room_name": "books", **kwargs}), token)
+    big_queries, big_chats = get_list(client, reverse(url_name, kwargs={"room_name": "music", **kwargs}), token)
+
+    assert (len(small_chats), len(big_chats)) == (3, 30)
+    assert sorted(chat["likes"] for chat in big_chats) == sorted(idx % 4 for idx in range(30))
+    # the number of queries doesn't depend on the number of chats
+    assert small_queries == big_queries
+
+
+@pytest.mark.django_db
+def test_chat_list_is_paginated(client: Client, users):
+    token = str(RefreshToken.for_user(users[0]).access_token)
+    create_chats("books", users, 12)
+
+    url = reverse("get_chats", kwargs={"room_name": "books", "sorting_name": "popular"}) + "?limit=5&offset=5"
+    _, chats = get_list(client, url, token)
+
+    assert [chat["likes"] for chat in chats] == [2, 1, 1, 1, 0]
@@ -0,0 +1,96 @@
+import pytest
+from chat.models.chat import Chat, SavedChat
+from chat.models.search import SearchToken
+from chat.services.search import CHAT_SEARCH, SearchIndex
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.client import Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+@pytest.fixture(params=["fts", "tokens"])
+def search_backend(request, monkeypatch):
+    if request.param == "tokens":
+        monkeypatch.setattr(SearchIndex, "uses_fts", staticmethod(lambda connection: False))
+    return request.param
+
+
+@pytest.fixture
+def chats(search_backend):
+    return {
+        "books": Chat.objects.create(title="Books club", room="books", description="Reading together"),
+        "fantasy": Chat.objects.create(title="Fantasy", room="books", description="Dragons and books"),
+        "ukrainian": Chat.objects.create(title="Книжковий клуб", room="books", description="Читаємо разом"),
+        "music": Chat.objects.create(title="Books about music", room="music", description="Notes"),
+    }
+
+
+def search(phrase, room="books") -> list[str]:
+    return [chat.title for chat in CHAT_SEARCH.search(Chat.objects.filter(room=room), phrase)]
+
+
+@pytest.mark.django_db
+def test_search_ranks_title_first(chats):
+    # both chats contain the word, the title match is more relevant
+    assert search("book") == ["Books club", "Fantasy"]
+    assert search("dragon") == ["Fantasy"]
+    assert search("books read") == ["Books club"]
+    assert search("книжк") == ["Книжковий клуб"]
+    assert search("Books", room="music") == ["Books about music"]
+    assert search("unknown") == []
+    assert search("  !! ") == []
+
+
+@pytest.mark.django_db
+def test_search_index_is_updated(chats):
+    chats["fantasy"].title = "Dragons"
+    chats["fantasy"].description = "Fairy tales"
+    chats["fantasy"].save()
+    chats["books"].delete()
+
+    assert search("book") == []
+    assert search("fairy") == ["Dragons"]
+
+
+@pytest.mark.django_db
+def test_fts_triggers_are_restored(chats, search_backend):
+    if search_backend != "fts":
+        pytest.skip("FTS5 only")
+
+    # recreating the chat table by a migration drops the triggers
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TRIGGER chat_chat_fts_ai")
+    Chat.objects.create(title="Poetry books", room="books", description="Poems")
+    assert "Poetry books" not in search("poetry")
+
+    CHAT_SEARCH.install(connection)
+    assert search("poetry") == ["Poetry books"]
+
+
+@pytest.mark.django_db
+def test_search_views(client: Client, chats, search_backend):
+    user = get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+    SavedChat.objects.create(user=user, chat=chats["fantasy"])
+    chats["fantasy"].user = get_user_model().objects.create_user(
+        username="u2", password="p", email="e2@4rooms.pro", is_email_confirmed=True
+    )
+    chats["fantasy"].save()
+    chats["books"].user = user
+    chats["books"].save()
+
+    urls = {
+        "get_searched_chats": ["Books club", "Fantasy"],
+        "get_searched_saved_chats": ["Fantasy"],
+        "get_searched_my_chats": ["Books club"],
+    }
+    for url_name, titles in urls.items():
+        response = client.get(reverse(url_name, kwargs={"room_name": "books", "phrase": "book"}), headers=headers)
+        assert response.status_code == 200
+        assert [chat["title"] for chat in response.json()["results"]] == titles
+
+    if search_backend == "tokens":
+        assert SearchToken.objects.filter(index="chat", object_id=chats["books"].id, token="club").exists()
@@ -0,0 +1,128 @@
+import pytest
+from asgiref.sync import async_to_sync
+from chat.consumers import ChatConsumer
+from chat.models.chat import Chat, SavedChat
+from chat.models.message import Message
+from chat.models.reaction import Reaction
+from chat.services.likes import toggle_chat_like
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+
+
+@pytest.fixture
+def get(client: Client, user):
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def _get(url, etag=None, **params):
+        extra = {"If-None-Match": etag} if etag else {}
+        return client.get(url, params, headers={**headers, **extra})
+
+    return _get
+
+
+def assert_not_modified(get, url, etag, **params):
+    with CaptureQueriesContext(connection) as queries:
+        response = get(url, etag, **params)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+    # only the user of the request is loaded
+    assert [query["sql"] for query in queries if "chat_" in query["sql"]] == []
+
+
+@pytest.mark.django_db
+def test_chat_list_etag(chat: Chat, get, user, django_capture_on_commit_callbacks):
+    url = reverse("get_chats", args=["books", "new"])
+    response = get(url)
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert etag.startswith('W/"')
+
+    assert_not_modified(get, url, etag)
+    # another page window has its own ETag
+    assert get(url, etag, limit=1).status_code == 200
+    # a chat of another room
+    with django_capture_on_commit_callbacks(execute=True):
+        Chat.objects.create(title="music", room="music", description="")
+    assert_not_modified(get, url, etag)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        toggle_chat_like(user, chat.id)
+    response = get(url, etag)
+    assert response.status_code == 200
+    assert response.json()["results"][0]["likes"] == 1
+    assert response["ETag"] != etag
+
+    # no ETag for an invalid room
+    response = get(reverse("get_chats", args=["wrong", "new"]))
+    assert response.status_code == 400
+    assert not response.has_header("ETag")
+
+
+@pytest.mark.django_db
+def test_saved_chats_etag(chat: Chat, get, user, django_capture_on_commit_callbacks):
+    chat.user = user
+    chat.save()
+    url = reverse("get_saved_chats", args=["books"])
+    etag = get(url)["ETag"]
+    assert_not_modified(get, url, etag)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        SavedChat.objects.create(user=user, chat=chat)
+    response = get(url, etag)
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 1
+    etag = response["ETag"]
+
+    # the saved chat is changed
+    with django_capture_on_commit_callbacks(execute=True):
+        chat.description = "new description"
+        chat.save()
+    response = get(url, etag)
+    assert response.status_code == 200
+    assert response.json()["results"][0]["description"] == "new description"
+
+
+@pytest.mark.django_db
+def test_messages_etag(chat: Chat, get, user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        message = Message.objects.create(chat=chat, user=user, text="first")
+    url = reverse("get_messages", args=[chat.id])
+    etag = get(url)["ETag"]
+    assert_not_modified(get, url, etag)
+
+    consumer = ChatConsumer()
+    consumer._chat_id = chat.id
+    # every change of the history changes the ETag
+    etags = {etag}
+    changes = [
+        lambda: Message.objects.create(chat=chat, user=user, text="second"),
+        lambda: Reaction.objects.create(message=message, user=user, reaction="👍"),
+        # the reaction is removed by the websocket event
+        lambda: async_to_sync(consumer.message_reaction)(message.id, "👍", user),
+        lambda: message.delete(),
+    ]
+    for change in changes:
+        with django_capture_on_commit_callbacks(execute=True):
+            change()
+        response = get(url, etag)
+        assert response.status_code == 200
+        etag = response["ETag"]
+        etags.add(etag)
+    assert len(etags) == len(changes) + 1
+    assert Reaction.objects.count() == 0
+
+    # a client polling the history of a deleted chat
+    with django_capture_on_commit_callbacks(execute=True):
+        chat.delete()
+    assert get(url, etag).status_code == 404
@@ -0,0 +1,155 @@
+import asyncio
+import json
+
+import pytest
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from channels_redis.core import RedisChannelLayer
+from chat.models.chat import Chat
+from chat.services.event_log import MemoryEventLog, RedisEventLog, get_event_log
+from config.asgi import application
+
+
+async def check_log(log, settings):
+    settings.CHAT_EVENT_LOG_SIZE = 3
+
+    start = await log.current(1)
+    assert await log.since(1, start) == []
+    seq, text = await log.append(1, json.dumps({"event_type": "first", "id": 1}))
+    assert (seq, json.loads(text)) == (start + 1, {"seq": start + 1, "event_type": "first", "id": 1})
+    for idx in range(2, 5):
+        await log.append(1, json.dumps({"event_type": f"event {idx}"}))
+    assert await log.current(1) == start + 4
+
+    # the first event isn't kept
+    assert [json.loads(text)["seq"] for text in await log.since(1, start + 1)] == [start + 2, start + 3, start + 4]
+    assert [json.loads(text)["event_type"] for text in await log.since(1, start + 3)] == ["event 4"]
+    assert await log.since(1, start + 4) == []
+    assert await log.since(1, start) is None
+    # seq of another counter (e.g. lost with a restarted worker)
+    assert await log.since(1, start + 5) is None
+    assert await log.since(2, start) is None
+
+    assert await log.current(2) > start + 4
+
+
+@pytest.mark.asyncio
+async def test_memory_log(settings):
+    await check_log(MemoryEventLog(), settings)
+
+
+@pytest.mark.asyncio
+async def test_memory_log_forgets_idle_chats(settings):
+    settings.CHAT_EVENT_LOG_TTL = 0.2
+    log = MemoryEventLog()
+
+    seq1, _ = await log.append(1, json.dumps({"event_type": "first"}))
+    await asyncio.sleep(0.1)
+    seq2, _ = await log.append(2, json.dumps({"event_type": "first"}))
+    await asyncio.sleep(0.15)
+
+    # no events of the first chat for 0.25 seconds
+    assert await log.since(1, seq1 - 1) is None
+    assert len(await log.since(2, seq2 - 1)) == 1
+    assert list(log._chats) == ["2"]
+
+
+@pytest.mark.asyncio
+async def test_redis_log(redis_url, settings):
+    layer = RedisChannelLayer(hosts=[redis_url])
+    log = RedisEventLog(layer)
+    await check_log(log, settings)
+    await layer.group_add("chat_1", "tab1")
+
+    # only the keys of the log are deleted
+    await log.clear()
+    assert await log.since(1, 0) is None
+    assert await layer.connection(0).zcard(layer._group_key("chat_1")) == 1
+    await layer.flush()
+
+
+async def connect(chat: Chat, token: str, query_string: str = "") -> WebsocketCommunicator:
+    client = WebsocketCommunicator(
+        application,
+        f"/ws/chat/{chat.room}/{chat.id}/?token={token}&{query_string}",
+        headers=[(b"origin", b"http://localhost:8000")],
+    )
+    connected, _ = await client.connect(timeout=20)
+    assert connected
+    return client
+
+
+async def receive_until(client: WebsocketCommunicator, event_type: str = "online_user_list") -> list[dict]:
+    """Receive events up to the event of the type, by default the events sent on connect"""
+
+    msgs = [await client.receive_json_from(timeout=5)]
+    while msgs[-1]["event_type"] != event_type:
+        msgs.append(await client.receive_json_from(timeout=5))
+    return msgs
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_reconnect_with_last_seq(settings, chat: Chat, user_factory):
+    settings.CHAT_EVENT_LOG_SIZE = 4
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    user2, t2 = await user_factory.create(username="u2", password="p", email="e2@4rooms.pro", is_email_confirmed=True)
+    client2 = await connect(chat, t2)
+    await receive_until(client2)
+    client1 = await connect(chat, t1)
+    last_seq = (await receive_until(client1))[-1]["seq"]
+    await receive_until(client2, "connected_user")
+
+    # events of the chat while the first user is offline
+    await client1.disconnect()
+    await client2.send_json_to({"event_type": "chat_message", "message": {"chat": chat.id, "text": "hello"}})
+    message = (await receive_until(client2, "chat_message"))[-1]
+    await client2.send_json_to({"event_type": "message_was_updated", "id": message["message"]["id"], "new_text": "hi"})
+    assert [msg["seq"] for msg in await receive_until(client2, "message_was_updated")] == [message["seq"] + 1]
+
+    client1 = await connect(chat, t1, f"last_seq={last_seq}")
+    msgs = await receive_until(client1)
+    # the missed events as they were broadcast, then the seq of the state after them
+    assert [(msg["event_type"], msg.get("seq")) for msg in msgs] == [
+        ("disconnected_user", last_seq + 1),
+        ("chat_message", last_seq + 2),
+        ("message_was_updated", last_seq + 3),
+        ("connected_user", last_seq + 4),
+        ("online_user_list", last_seq + 4),
+    ]
+    assert msgs[2]["new_text"] == "hi"
+    await client1.disconnect()
+
+    # the log has only the last 4 events
+    client1 = await connect(chat, t1, f"last_seq={last_seq}")
+    msgs = await receive_until(client1)
+    assert [msg["event_type"] for msg in msgs] == ["resync_required", "online_user_list"]
+    assert msgs[1]["seq"] == last_seq + 6
+
+    for c in (client1, client2):
+        await c.disconnect()
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_events_out_of_order(chat: Chat, user_factory):
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    client1 = await connect(chat, t1)
+    seq = (await receive_until(client1))[-1]["seq"]
+
+    # two events of other workers, the group_send of the second one is faster
+    events = [await get_event_log().append(chat.id, json.dumps({"event_type": f"event {idx}"})) for idx in (1, 2)]
+    for event_seq, text in reversed(events):
+        await get_channel_layer().group_send(
+            f"{chat.room}-{chat.id}", {"type": "send_broadcast", "seq": event_seq, "text": text}
+        )
+
+    # the first one is sent from the log, then it isn't sent again
+    await client1.send_json_to({"event_type": "chat_message", "message": {"chat": chat.id, "text": "hello"}})
+    msgs = await receive_until(client1, "chat_message")
+    assert [(msg["event_type"], msg["seq"]) for msg in msgs] == [
+        ("event 1", seq + 1),
+        ("event 2", seq + 2),
+        ("chat_message", seq + 3),
+    ]
+    await client1.disconnect()
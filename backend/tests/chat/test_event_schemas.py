@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from channels.testing import WebsocketCommunicator
+from chat.consumers import (
+    CHAT_MESSAGE_SCHEMA,
+    MESSAGE_REACTION_SCHEMA,
+    MESSAGE_UPDATE_SCHEMA,
+)
+from chat.events import WesocketException
+from chat.models.chat import Chat
+from config.asgi import application
+
+from .conftest import get_msgs, wait_for_message
+
+
+@pytest.mark.parametrize(
+    "schema, content, error",
+    [
+        (CHAT_MESSAGE_SCHEMA, {}, "message: This field is required."),
+        (CHAT_MESSAGE_SCHEMA, {"message": "text"}, "message: Invalid data. Expected a dictionary."),
+        (CHAT_MESSAGE_SCHEMA, {"message": {"text": "t"}}, "message: chat: This field is required."),
+        (CHAT_MESSAGE_SCHEMA, {"message": {"chat": ""}}, "message: chat: This field may not be null."),
+        (CHAT_MESSAGE_SCHEMA, {"message": {"chat": "one"}}, "message: chat: Incorrect type. Expected pk value."),
+        (CHAT_MESSAGE_SCHEMA, {"message": {"chat": True}}, "message: chat: Incorrect type. Expected pk value."),
+        (CHAT_MESSAGE_SCHEMA, {"message": {"chat": 1, "text": 5}}, "message: text: Not a valid string."),
+        (
+            CHAT_MESSAGE_SCHEMA,
+            {"message": {"chat": 1, "text": "t" * 793}},
+            "message: text: Ensure this field has no more than 792 characters.",
+        ),
+        (
+            CHAT_MESSAGE_SCHEMA,
+            {"message": {"chat": 1, "attachments": {}}},
+            "message: attachments: Expected a list of items.",
+        ),
+        (MESSAGE_UPDATE_SCHEMA, {"id": 1}, "new_text: This field is required."),
+        (MESSAGE_UPDATE_SCHEMA, {"id": 1, "new_text": "  "}, "new_text: This field may not be blank."),
+        (MESSAGE_REACTION_SCHEMA, {"reaction": "😀"}, "id: This field is required."),
+    ],
+)
+def test_invalid_events(schema, content, error):
+    with pytest.raises(WesocketException) as e:
+        schema.validate(content)
+
+    assert e.value.error_message == error
+
+
+@pytest.mark.parametrize(
+    "schema, content",
+    [
+        (CHAT_MESSAGE_SCHEMA, {"message": {"chat": 1, "text": "t" * 792}}),
+        (CHAT_MESSAGE_SCHEMA, {"message": {"chat": "1", "text": None, "attachments": [{"upload_id": "1"}]}}),
+        (MESSAGE_UPDATE_SCHEMA, {"id": 1, "new_text": "new text"}),
+        (MESSAGE_REACTION_SCHEMA, {"id": "1", "reaction": "😀"}),
+    ],
+)
+def test_valid_events(schema, content):
+    schema.validate(content)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_unknown_and_invalid_events(settings, chat: Chat, user_factory, client_factory):
+    user, token = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    client: WebsocketCommunicator = await client_factory.create(settings, application, chat, user, token)
+
+    await asyncio.sleep(1)
+    await get_msgs(client)
+
+    events = [
+        ({"event_type": "chat_was_archived"}, "event_type: Unknown event type 'chat_was_archived'"),
+        (
+            {"event_type": "message_was_updated", "id": 1, "new_text": "t" * 800},
+            "new_text: Ensure this field has no more than 792 characters.",
+        ),
+        ({"event_type": "message_was_deleted"}, "id: This field is required."),
+    ]
+    for event, error in events:
+        await client.send_json_to(event)
+        assert await wait_for_message(client)
+        msgs = await get_msgs(client)
+        assert len(msgs) == 1
+        assert msgs[0]["event_type"] == "error"
+        assert msgs[0]["error_message"] == error
+
+    await client.disconnect()
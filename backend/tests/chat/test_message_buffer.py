@@ -0,0 +1,209 @@
+import pytest
+from asgiref.sync import async_to_sync
+from chat.consumers import ChatConsumer
+from chat.models.chat import Chat
+from chat.models.message import Message
+from chat.services.message_buffer import MESSAGE_BUFFER, MessageBuffer
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+
+
+@pytest.fixture
+def get_history(client: Client, user):
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def _get_history(chat: Chat, **params) -> tuple[dict, int]:
+        """Return the page and the number of queries of the message history (not the check of the chat)"""
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("get_messages", args=[chat.id]), params, headers=headers)
+        assert response.status_code == 200
+        return response.json(), len([query for query in queries if "chat_message" in query["sql"]])
+
+    return _get_history
+
+
+@pytest.fixture
+def consumer(chat: Chat, user):
+    consumer = ChatConsumer()
+    consumer._user, consumer._chat_id, consumer._room_name = user, chat.id, chat.room
+    return consumer
+
+
+def call(consumer: ChatConsumer, name: str, *args):
+    """Call an async method of the consumer synchronously"""
+
+    return async_to_sync(getattr(consumer, name))(*args)
+
+
+# the tests are transactional: versions of chats are incremented on commit of every change, as in the consumer
+def create_messages(chat: Chat, user, count: int):
+    for idx in range(count):
+        Message.objects.create(chat=chat, user=user, text=f"message {idx}")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_latest_page_is_buffered(chat: Chat, user, get_history):
+    create_messages(chat, user, 5)
+
+    page, queries = get_history(chat)
+    assert queries > 0
+    assert [message["text"] for message in page["results"]] == [f"message {idx}" for idx in range(5)]
+
+    assert get_history(chat) == (page, 0)
+    # a smaller page of the buffered messages
+    (small_page, queries) = get_history(chat, limit=2)
+    assert queries == 0
+    assert small_page["results"] == page["results"][-2:]
+    # the link to older messages continues the buffered page
+    (older, _) = get_history(chat, limit=2, before=small_page["next"].split("before=")[1].split("&")[0])
+    assert older["results"] == page["results"][1:3]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_consumer_changes_buffer(chat: Chat, user, consumer, get_history):
+    create_messages(chat, user, 3)
+    get_history(chat)
+    first, second = Message.objects.filter(chat=chat).order_by("id")[:2]
+
+    changes = [
+        lambda: call(
+            consumer, "_serialize_message", *call(consumer, "_save_message", {"chat": chat.id, "text": "new"}, [])
+        ),
+        lambda: call(consumer, "update_message", first.id, "updated"),
+        lambda: call(consumer, "delete_message", second.id),
+        lambda: call(consumer, "message_reaction", first.id, "👍", user),
+    ]
+    for change in changes:
+        change()
+
+    page, queries = get_history(chat)
+    assert queries == 0
+    assert [(message["text"], message["is_deleted"]) for message in page["results"]] == [
+        ("updated", False),
+        ("deleted", True),
+        ("message 2", False),
+        ("new", False),
+    ]
+    assert page["results"][0]["reactions"][0]["reaction"] == "👍"
+
+    # the same as loaded from the DB
+    MESSAGE_BUFFER.clear()
+    assert get_history(chat)[0] == page
+
+    # the reaction is removed
+    call(consumer, "message_reaction", first.id, "👍", user)
+    page, queries = get_history(chat)
+    assert queries == 0
+    assert page["results"][0]["reactions"] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_other_changes_reload_buffer(chat: Chat, user, consumer, get_history):
+    create_messages(chat, user, 2)
+    get_history(chat)
+
+    # changed by the REST API or by another process
+    Message.objects.create(chat=chat, user=user, text="elsewhere")
+    page, queries = get_history(chat)
+    assert queries > 0
+    assert page["results"][-1]["text"] == "elsewhere"
+
+    # another process changes the chat, then the consumer changes the buffered version
+    Message.objects.create(chat=chat, user=user, text="another process")
+    call(consumer, "update_message", page["results"][0]["id"], "updated")
+    page, queries = get_history(chat)
+    assert queries > 0
+    assert [message["text"] for message in page["results"]] == ["updated", "message 1", "elsewhere", "another process"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ring_buffer(chat: Chat, user, consumer, get_history, settings):
+    settings.CHAT_MESSAGE_BUFFER_SIZE = 3
+    create_messages(chat, user, 2)
+    page, _ = get_history(chat, limit=3)
+    assert page["next"] is None
+
+    for text in ("third", "fourth"):
+        call(consumer, "_serialize_message", *call(consumer, "_save_message", {"chat": chat.id, "text": text}, []))
+
+    page, queries = get_history(chat, limit=3)
+    assert queries == 0
+    assert [message["text"] for message in page["results"]] == ["message 1", "third", "fourth"]
+    assert page["next"] is not None
+    # more messages than buffered are queried
+    page, queries = get_history(chat, limit=4)
+    assert queries > 0
+    assert len(page["results"]) == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleted_chat(client: Client, chat: Chat, user, get_history):
+    create_messages(chat, user, 2)
+    get_history(chat)
+    assert MESSAGE_BUFFER.contains(chat.id, Message.objects.filter(chat=chat).first().id)
+
+    chat_id = chat.id
+    chat.delete()
+    assert MESSAGE_BUFFER.get_stats()["chats"] == 0
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+    assert client.get(reverse("get_messages", args=[chat_id]), headers=headers).status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changed_author_reloads_buffer(chat: Chat, user, get_history):
+    create_messages(chat, user, 2)
+    get_history(chat)
+
+    user.username = "renamed"
+    user.save()
+    page, queries = get_history(chat)
+    assert queries > 0
+    assert {message["user_name"] for message in page["results"]} == {"renamed"}
+
+    # the last login doesn't change the messages
+    user.save(update_fields=["last_login"])
+    assert get_history(chat) == (page, 0)
+
+    user.profile.avatar = "avatars/user/avatar_image_1.svg"
+    user.profile.save()
+    page, queries = get_history(chat)
+    assert queries > 0
+    assert all(message["user_avatar"].endswith("avatar_image_1.svg") for message in page["results"])
+
+
+def test_lru_eviction(settings):
+    settings.CHAT_MESSAGE_BUFFER_SIZE = 10
+    message = {"id": 1, "text": "x" * 100}
+    settings.CHAT_MESSAGE_BUFFER_MEMORY = MessageBuffer._size(message) * 25
+    buffer = MessageBuffer()
+
+    def load():
+        return [(f"0-{idx}", {**message, "id": idx}) for idx in range(10)], False
+
+    for chat_id in (1, 2):
+        buffer.get_latest(chat_id, load)
+    # chat 1 is used, chat 2 is the least recently used one
+    buffer.get_latest(1, load)
+    buffer.get_latest(3, load)
+
+    assert buffer.get_stats() == {
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+        "chats": 2,
+        "memory": MessageBuffer._size(message) * 20,
+    }
+    assert buffer.contains(1, 5) and buffer.contains(3, 5)
+    assert not buffer.contains(2, 5)
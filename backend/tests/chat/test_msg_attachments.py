@@ -0,0 +1,130 @@
+import asyncio
+from io import BytesIO
+
+import pytest
+from channels.testing import WebsocketCommunicator
+from chat.models.chat import Chat
+from config.asgi import application
+from django.test.client import Client
+from PIL import Image
+
+from .conftest import get_msgs, wait_for_message
+
+
+def png_bytes(size=(300, 200)) -> bytes:
+    output = BytesIO()
+    Image.new("RGB", size, color=(200, 10, 10)).save(output, format="PNG")
+    return output.getvalue()
+
+
+async def begin_upload(client: WebsocketCommunicator, size: int, name="photo.png") -> str:
+    await client.send_json_to({"event_type": "attachment_upload_begin", "name": name, "size": size})
+    response = await client.receive_json_from()
+    assert response["event_type"] == "attachment_upload_started"
+    assert response["chunk_size"] > 0
+    return response["upload_id"]
+
+
+async def send_chunks(client: WebsocketCommunicator, upload_id: str, data: bytes, chunk_size: int):
+    for idx in range(0, len(data), chunk_size):
+        await client.send_to(bytes_data=upload_id.encode("ascii") + data[idx : idx + chunk_size])
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_binary_attachment_upload(client: Client, settings, tmp_path, chat: Chat, user_factory, client_factory):
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    client1: WebsocketCommunicator = await client_factory.create(settings, application, chat, user1, t1)
+    user2, t2 = await user_factory.create(username="u2", password="p", email="e2@4rooms.pro", is_email_confirmed=True)
+    client2: WebsocketCommunicator = await client_factory.create(settings, application, chat, user2, t2)
+    await asyncio.sleep(1)
+    await get_msgs(client1)
+    await get_msgs(client2)
+    # uploaded files are saved to a temporary directory
+    settings.MEDIA_ROOT = tmp_path
+
+    image = png_bytes()
+    upload_id = await begin_upload(client1, len(image))
+    await send_chunks(client1, upload_id, image, 1000)
+
+    await client1.send_json_to({"event_type": "attachment_upload_commit", "upload_id": upload_id})
+    response = await client1.receive_json_from()
+    assert response == {"event_type": "attachment_upload_committed", "upload_id": upload_id}
+
+    await client1.send_json_to(
+        {
+            "event_type": "chat_message",
+            "message": {"chat": chat.id, "text": "", "attachments": [{"upload_id": upload_id}]},
+        }
+    )
+
+    for c in [client1, client2]:
+        assert await wait_for_message(c)
+        msgs = await get_msgs(c)
+        assert len(msgs) == 1
+        assert msgs[0]["event_type"] == "chat_message"
+        assert len(msgs[0]["message"]["attachments"]) == 1
+        assert msgs[0]["message"]["attachments"][0].endswith(".PNG")
+
+    uploaded = list((tmp_path / "uploads").iterdir())
+    assert len(uploaded) == 1
+    assert uploaded[0].read_bytes() == image
+
+    # the upload is consumed by the message
+    await client1.send_json_to(
+        {
+            "event_type": "chat_message",
+            "message": {"chat": chat.id, "text": "again", "attachments": [{"upload_id": upload_id}]},
+        }
+    )
+    response = await client1.receive_json_from()
+    assert response["event_type"] == "error"
+    assert "not found or not committed" in response["error_message"]
+
+    await client1.disconnect()
+    await client2.disconnect()
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_invalid_binary_attachment_upload(client: Client, settings, chat: Chat, user_factory, client_factory):
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    client1: WebsocketCommunicator = await client_factory.create(settings, application, chat, user1, t1)
+    await asyncio.sleep(0.5)
+    await get_msgs(client1)
+
+    # bigger than MAX_FILE_SIZE
+    await client1.send_json_to({"event_type": "attachment_upload_begin", "name": "a.png", "size": 10 * 1024 * 1024})
+    response = await client1.receive_json_from()
+    assert response["event_type"] == "error"
+    assert response["error_message"] == "File is too big: 10 MB. Must be less than 1 MB"
+
+    # more data than declared - the upload is dropped at the first chunk over the limit
+    upload_id = await begin_upload(client1, 100)
+    await send_chunks(client1, upload_id, b"a" * 150, 150)
+    response = await client1.receive_json_from()
+    assert response["error_message"] == "Attachment is bigger than the declared size"
+    await client1.send_json_to({"event_type": "attachment_upload_commit", "upload_id": upload_id})
+    response = await client1.receive_json_from()
+    assert response["error_message"] == "Attachment upload with the specified ID was not found"
+
+    # incomplete
+    upload_id = await begin_upload(client1, 100)
+    await send_chunks(client1, upload_id, b"a" * 50, 50)
+    await client1.send_json_to({"event_type": "attachment_upload_commit", "upload_id": upload_id})
+    response = await client1.receive_json_from()
+    assert response["error_message"] == "Attachment is incomplete: 50 of 100 bytes"
+
+    # not an image
+    upload_id = await begin_upload(client1, 100)
+    await send_chunks(client1, upload_id, b"a" * 100, 40)
+    await client1.send_json_to({"event_type": "attachment_upload_commit", "upload_id": upload_id})
+    response = await client1.receive_json_from()
+    assert response["error_message"] == "File is not an image or image format is not supported."
+
+    # unknown upload
+    await send_chunks(client1, "0" * 32, b"a" * 10, 10)
+    response = await client1.receive_json_from()
+    assert response["error_message"] == "Attachment upload with the specified ID was not found"
+
+    await client1.disconnect()
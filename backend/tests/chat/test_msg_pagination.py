@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+import pytest
+from chat.models.chat import Chat
+from chat.models.message import Message
+from django.contrib.auth import get_user_model
+from django.test.client import Client
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+
+
+@pytest.fixture
+def auth_header(user):
+    return {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+
+@pytest.fixture
+def messages(user):
+    chat = Chat.objects.create(title="test chat", room="books", description="test description")
+    other_chat = Chat.objects.create(title="other chat", room="books", description="test description")
+
+    now = timezone.now()
+    messages = []
+    for idx in range(25):
+        messages.append(Message.objects.create(chat=chat, user=user, text=f"message {idx}"))
+        Message.objects.create(chat=other_chat, user=user, text=f"other message {idx}")
+        # groups of 3 messages with the same timestamp
+        Message.objects.filter(pk=messages[-1].pk).update(timestamp=now + timedelta(seconds=idx // 3))
+
+    return chat, [msg.id for msg in messages]
+
+
+def get_page(client: Client, url: str, auth_header: dict) -> dict:
+    response = client.get(url, headers=auth_header)
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.django_db
+def test_load_older_messages(client: Client, auth_header, messages):
+    chat, ids = messages
+    url = reverse("get_messages", kwargs={"chat_id": chat.id}) + "?limit=10"
+
+    pages = []
+    while url:
+        page = get_page(client, url, auth_header)
+        pages.append([msg["id"] for msg in page["results"]])
+        url = page["next"]
+
+    # the latest messages first, each page in chronological order
+    assert pages == [ids[15:], ids[5:15], ids[:5]]
+
+
+@pytest.mark.django_db
+def test_load_newer_messages(client: Client, auth_header, messages):
+    chat, ids = messages
+    url = reverse("get_messages", kwargs={"chat_id": chat.id}) + "?limit=10"
+
+    first_page = get_page(client, url, auth_header)
+    assert first_page["previous"] is None
+
+    oldest_page = get_page(client, get_page(client, first_page["next"], auth_header)["next"], auth_header)
+    assert [msg["id"] for msg in oldest_page["results"]] == ids[:5]
+    assert oldest_page["next"] is None
+
+    pages = []
+    url = oldest_page["previous"]
+    while url:
+        page = get_page(client, url, auth_header)
+        pages.append([msg["id"] for msg in page["results"]])
+        url = page["previous"]
+
+    assert pages == [ids[5:15], ids[15:]]
+
+
+@pytest.mark.django_db
+def test_invalid_cursor(client: Client, auth_header, messages):
+    chat, _ = messages
+    url = reverse("get_messages", kwargs={"chat_id": chat.id}) + "?before=abc"
+
+    response = client.get(url, headers=auth_header)
+    assert response.status_code == 404
@@ -0,0 +1,82 @@
+import pytest
+from chat.models.chat import Chat
+from chat.models.message import Message
+from chat.models.reaction import Reaction
+from chat.serializers.message import MessageSerializer
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from files.models import File
+from login.auth_cache import AUTH_CACHE
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def create_messages(chat: Chat, users: list, count: int):
+    for idx in range(count):
+        user = users[idx % len(users)]
+        message = Message.objects.create(chat=chat, user=user, text=f"message {idx}")
+        attachment = File.objects.create(
+            file=f"uploads/{chat.id}-{idx}.png", file_name=f"{chat.id}-{idx}.png", file_type="png", uploader=user
+        )
+        message.attachments.add(attachment)
+        for reaction_user in users:
+            Reaction.objects.create(message=message, user=reaction_user, reaction="😀")
+
+
+def count_queries(client: Client, chat: Chat, token: str) -> tuple[int, int]:
+    url = reverse("get_messages", kwargs={"chat_id": chat.id})
+    # the same queries for every page: the user of the token is queried
+    AUTH_CACHE.clear()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert all(len(msg["reactions"]) == 3 and len(msg["attachments"]) == 1 for msg in results)
+    return len(queries), len(results)
+
+
+@pytest.mark.django_db
+def test_messages_page_queries(client: Client):
+    users = [
+        get_user_model().objects.create_user(
+            username=f"u{idx}", password="p", email=f"e{idx}@4rooms.pro", is_email_confirmed=True
+        )
+        for idx in range(3)
+    ]
+    token = str(RefreshToken.for_user(users[0]).access_token)
+
+    small_chat = Chat.objects.create(title="small chat", room="books", description="test description")
+    big_chat = Chat.objects.create(title="big chat", room="books", description="test description")
+    create_messages(small_chat, users, 2)
+    create_messages(big_chat, users, 40)
+
+    small_queries, small_count = count_queries(client, small_chat, token)
+    big_queries, big_count = count_queries(client, big_chat, token)
+
+    assert (small_count, big_count) == (2, 40)
+    # the number of queries doesn't depend on the number of messages on the page
+    assert small_queries == big_queries
+
+
+@pytest.mark.django_db
+def test_prefetch_instance_queries(django_assert_num_queries):
+    user = get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+    chat = Chat.objects.create(title="chat", room="books", description="test description")
+    create_messages(chat, [user], 1)
+
+    message = Message.objects.get(chat=chat)
+    # user, profile, reactions with users, attachments
+    with django_assert_num_queries(4):
+        MessageSerializer.prefetch_instance(message)
+
+    with django_assert_num_queries(0):
+        data = MessageSerializer(message).data
+
+    assert data["user_name"] == "u1"
+    assert data["reactions"][0]["user_name"] == "u1"
+    assert len(data["attachments"]) == 1
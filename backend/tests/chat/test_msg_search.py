@@ -0,0 +1,120 @@
+import pytest
+from chat.models.chat import Chat
+from chat.models.message import Message
+from chat.models.search import SearchToken
+from chat.services.search import MESSAGE_SEARCH, SearchIndex, snippet
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.client import Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+@pytest.fixture(params=["fts", "tokens"])
+def search_backend(request, monkeypatch):
+    if request.param == "tokens":
+        monkeypatch.setattr(SearchIndex, "uses_fts", staticmethod(lambda connection: False))
+    return request.param
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+
+
+@pytest.fixture
+def messages(search_backend, chat: Chat, user):
+    other_chat = Chat.objects.create(title="other chat", room="books", description="other")
+    return {
+        "dragon": Message.objects.create(chat=chat, user=user, text="Have you read the book about dragons?"),
+        "wizard": Message.objects.create(chat=chat, user=user, text="I prefer wizards"),
+        "books": Message.objects.create(chat=chat, user=user, text="Dragon books are the best books"),
+        "other": Message.objects.create(chat=other_chat, user=user, text="Dragons everywhere"),
+    }
+
+
+def search(chat: Chat, phrase: str) -> list[str]:
+    messages = MESSAGE_SEARCH.search(chat.message_set.filter(is_deleted=False), phrase, ranked=False)
+    return [message.text for message in messages.order_by("id")]
+
+
+@pytest.mark.django_db
+def test_search_messages(chat: Chat, messages):
+    assert search(chat, "dragon") == ["Have you read the book about dragons?", "Dragon books are the best books"]
+    assert search(chat, "dragon book") == ["Have you read the book about dragons?", "Dragon books are the best books"]
+    assert search(chat, "wiz") == ["I prefer wizards"]
+    assert search(chat, "unknown") == []
+
+
+@pytest.mark.django_db
+def test_search_index_is_updated(chat: Chat, messages):
+    # the same as update_message and delete_message of ChatConsumer
+    messages["wizard"].text = "I prefer dragons"
+    messages["wizard"].save()
+    messages["books"].delete()
+    assert messages["books"].is_deleted
+
+    assert search(chat, "dragon") == ["Have you read the book about dragons?", "I prefer dragons"]
+    assert search(chat, "wizard") == []
+    # the text of deleted messages is not indexed
+    assert search(chat, "deleted") == []
+
+    Message.objects.filter(pk=messages["dragon"].pk)._raw_delete(Message.objects.db)
+    assert search(chat, "dragon") == ["I prefer dragons"]
+
+
+@pytest.mark.django_db
+def test_messages_are_deleted_with_chat(chat: Chat, messages, search_backend):
+    chat.delete()
+
+    if search_backend == "fts":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT rowid FROM chat_message_fts WHERE chat_message_fts MATCH 'dragon*'")
+            assert [rowid for rowid, in cursor.fetchall()] == [messages["other"].id]
+    else:
+        assert list(SearchToken.objects.filter(index="message").values_list("object_id", flat=True).distinct()) == [
+            messages["other"].id
+        ]
+
+
+@pytest.mark.django_db
+def test_rebuild_skips_deleted_messages(chat: Chat, messages):
+    messages["books"].delete()
+    MESSAGE_SEARCH.rebuild()
+
+    assert search(chat, "dragon") == ["Have you read the book about dragons?"]
+    assert search(chat, "deleted") == []
+
+
+def test_snippet():
+    assert snippet("Dragon books are the best books", "book") == (
+        "Dragon <mark>books</mark> are the best <mark>books</mark>"
+    )
+    text = " ".join(f"word{idx}" for idx in range(40))
+    assert snippet(text, "word20", size=8) == "…word18 word19 <mark>word20</mark> word21 word22 word23 word24 word25…"
+    assert snippet(text, "word0", size=3) == "<mark>word0</mark> word1 word2…"
+    assert snippet(text, "word39", size=3) == "…word37 word38 <mark>word39</mark>"
+    assert snippet(None, "word") == ""
+
+
+@pytest.mark.django_db
+def test_search_messages_view(client: Client, chat: Chat, messages, user):
+    headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+    url = reverse("get_searched_messages", kwargs={"chat_id": chat.id, "phrase": "dragon"})
+
+    response = client.get(url, {"limit": 1}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [message["highlight"] for message in data["results"]] == ["<mark>Dragon</mark> books are the best books"]
+    assert data["previous"] is None
+
+    data = client.get(data["next"], headers=headers).json()
+    assert [message["id"] for message in data["results"]] == [messages["dragon"].id]
+    assert data["results"][0]["highlight"] == "Have you read the book about <mark>dragons</mark>?"
+    assert data["next"] is None
+
+    messages["dragon"].delete()
+    data = client.get(url, headers=headers).json()
+    assert [message["id"] for message in data["results"]] == [messages["books"].id]
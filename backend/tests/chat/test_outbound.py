@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from channels.testing import WebsocketCommunicator
+from chat.models.chat import Chat
+from chat.services.outbound import OutboundQueue
+
+from backend.chat.consumers import ChatConsumer
+
+from .test_event_log import connect, receive_until
+
+
+class StuckClient:
+    """The link of a client which doesn't receive anything after the first frame"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = None
+        self.stuck = asyncio.Event()
+
+    async def send(self, text: str):
+        self.sent.append(text)
+        self.stuck.set()
+        await asyncio.Event().wait()
+
+    async def close(self, code: int):
+        self.closed = code
+
+
+async def stuck_queue(settings, policy: str) -> tuple[OutboundQueue, StuckClient]:
+    settings.CHAT_OUTBOUND_QUEUE_SIZE = 3
+    settings.CHAT_OUTBOUND_POLICY = policy
+    OutboundQueue.stats.clear()
+    client = StuckClient()
+    queue = OutboundQueue(client.send, client.close)
+    queue.start()
+    await queue.put("first")
+    await client.stuck.wait()
+    return queue, client
+
+
+@pytest.mark.asyncio
+async def test_coalesce(settings):
+    queue, client = await stuck_queue(settings, "coalesce")
+
+    for text, key in [
+        ("message", None),
+        ("u1 connected", "user:1"),
+        ("like", "like:u2"),
+        ("u1 disconnected", "user:1"),
+    ]:
+        await queue.put(text, key)
+    assert [text for _, text in queue._frames] == ["message", "like", "u1 disconnected"]
+    # no queued event with the key: the oldest event with a key is dropped
+    await queue.put("u3 connected", "user:3")
+    assert [text for _, text in queue._frames] == ["message", "u1 disconnected", "u3 connected"]
+    assert client.closed is None
+    assert OutboundQueue.stats["coalesced"] == 1
+    assert OutboundQueue.stats["dropped"] == 1
+    assert OutboundQueue.stats["depth"] == 3
+    await queue.stop()
+    assert OutboundQueue.stats["depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest(settings):
+    queue, client = await stuck_queue(settings, "drop_oldest")
+
+    for text, key in [("u1 connected", "user:1"), ("message", None), ("u1 disconnected", "user:1")]:
+        await queue.put(text, key)
+    await queue.put("like", "like:u2")
+    assert [text for _, text in queue._frames] == ["message", "u1 disconnected", "like"]
+
+    # only events with a key are dropped, then the connection is closed
+    for idx in range(3):
+        await queue.put(f"message {idx}")
+    assert [text for _, text in queue._frames] == []
+    assert client.closed == settings.CHAT_OUTBOUND_CLOSE_CODE
+    assert (OutboundQueue.stats["dropped"], OutboundQueue.stats["disconnected"]) == (3, 1)
+    await queue.put("after close")
+    assert client.sent == ["first"]
+
+
+@pytest.mark.asyncio
+async def test_disconnect(settings):
+    queue, client = await stuck_queue(settings, "disconnect")
+
+    for idx in range(3):
+        await queue.put(f"u{idx} connected", f"user:{idx}")
+    assert client.closed is None
+    await queue.put("u3 connected", "user:3")
+    assert client.closed == settings.CHAT_OUTBOUND_CLOSE_CODE
+    assert OutboundQueue.stats["disconnected"] == 1
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_slow_client_is_disconnected(settings, monkeypatch, chat: Chat, user_factory):
+    settings.CHAT_OUTBOUND_QUEUE_SIZE = 3
+    settings.CHAT_OUTBOUND_POLICY = "disconnect"
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    user2, t2 = await user_factory.create(username="u2", password="p", email="e2@4rooms.pro", is_email_confirmed=True)
+
+    # the consumer of the websocket routes: config.asgi imports backend.chat.routing
+    send_frame = ChatConsumer.send_frame
+
+    async def slow_send_frame(self, text):
+        if self._user.username == "u2":
+            # a stuck link of the second user
+            await asyncio.Event().wait()
+        await send_frame(self, text)
+
+    monkeypatch.setattr(ChatConsumer, "send_frame", slow_send_frame)
+    client1: WebsocketCommunicator = await connect(chat, t1)
+    await receive_until(client1)
+    client2: WebsocketCommunicator = await connect(chat, t2)
+    await receive_until(client1, "connected_user")
+
+    # the messages of the first user aren't held up by the second one
+    for idx in range(5):
+        await client1.send_json_to({"event_type": "chat_message", "message": {"chat": chat.id, "text": f"m {idx}"}})
+        assert (await receive_until(client1, "chat_message"))[-1]["message"]["text"] == f"m {idx}"
+
+    assert await client2.receive_output(timeout=5) == {"type": "websocket.close", "code": 4008}
+    await client2.disconnect()
+    assert (await receive_until(client1, "disconnected_user"))[-1]["user"]["username"] == "u2"
+    await client1.disconnect()
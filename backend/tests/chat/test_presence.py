@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from channels.testing import WebsocketCommunicator
+from channels_redis.core import RedisChannelLayer
+from chat.models.chat import Chat
+from chat.services.presence import (
+    MemoryPresenceBackend,
+    RedisPresenceBackend,
+    get_presence_backend,
+)
+from config.asgi import application
+from django.test.client import Client
+
+from .conftest import get_msgs, wait_for_message
+
+
+def card(user_id):
+    return {"id": user_id, "username": f"u{user_id}", "avatar": f"http://localhost/a{user_id}.svg"}
+
+
+async def check_backend(backend):
+    assert await backend.connect(1, "tab1", card(1)) is True
+    assert await backend.connect(1, "tab2", card(1)) is False
+    assert await backend.connect(1, "tab3", card(2)) is True
+    assert await backend.connect(2, "tab4", card(3)) is True
+
+    assert sorted(u["id"] for u in await backend.online_users(1)) == [1, 2]
+    assert await backend.online_users(1, exclude_user_id=1) == [card(2)]
+
+    # the first tab closed - the user is still online
+    assert await backend.disconnect(1, "tab1", 1) is False
+    assert sorted(u["id"] for u in await backend.online_users(1)) == [1, 2]
+
+    assert await backend.disconnect(1, "tab2", 1) is True
+    assert await backend.online_users(1) == [card(2)]
+    assert await backend.online_users(2) == [card(3)]
+    assert await backend.disconnect(1, "unknown", 5) is False
+
+
+@pytest.mark.asyncio
+async def test_memory_presence():
+    await check_backend(MemoryPresenceBackend())
+
+
+@pytest.mark.asyncio
+async def test_redis_presence(redis_url):
+    layer = RedisChannelLayer(hosts=[redis_url])
+    backend = RedisPresenceBackend(layer)
+    await check_backend(backend)
+    await layer.group_add("chat_1", "tab1")
+
+    # only the presence keys are deleted
+    await backend.clear()
+    assert await backend.online_users(2) == []
+    assert await layer.connection(0).zcard(layer._group_key("chat_1")) == 1
+    await layer.flush()
+
+
+@pytest.mark.asyncio
+async def test_redis_presence_shared_between_workers(redis_url):
+    worker1 = RedisPresenceBackend(RedisChannelLayer(hosts=[redis_url]), ttl=1)
+    worker2 = RedisPresenceBackend(RedisChannelLayer(hosts=[redis_url]), ttl=1)
+
+    assert await worker1.connect(1, "w1.tab1", card(1)) is True
+    assert await worker2.connect(1, "w2.tab1", card(1)) is False
+    assert await worker2.connect(1, "w2.tab2", card(2)) is True
+    assert sorted(u["id"] for u in await worker1.online_users(1)) == [1, 2]
+
+    # worker1 stopped without disconnecting its websockets, worker2 keeps refreshing its connections
+    worker1._local.clear()
+    await asyncio.sleep(1.5)
+    assert sorted(u["id"] for u in await worker2.online_users(1)) == [1, 2]
+
+    # the connection of worker1 expired, so the user leaves with the last tab of worker2
+    assert await worker2.disconnect(1, "w2.tab1", 1) is True
+    assert await worker1.online_users(1) == [card(2)]
+    await worker1.clear()
+    await worker2.clear()
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_user_with_several_tabs(client: Client, settings, chat: Chat, user_factory, client_factory):
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    user2, t2 = await user_factory.create(username="u2", password="p", email="e2@4rooms.pro", is_email_confirmed=True)
+
+    tab1: WebsocketCommunicator = await client_factory.create(settings, application, chat, user1, t1)
+    client2: WebsocketCommunicator = await client_factory.create(settings, application, chat, user2, t2)
+    await wait_for_message(client2, timeout=1)
+    msgs = await get_msgs(client2)
+    assert msgs[0]["event_type"] == "online_user_list"
+    assert [u["username"] for u in msgs[0]["user_list"]] == ["u1"]
+    await get_msgs(tab1)
+
+    # the second tab of user1 is not announced
+    tab2: WebsocketCommunicator = await client_factory.create(settings, application, chat, user1, t1)
+    await wait_for_message(tab2, timeout=1)
+    msgs = await get_msgs(tab2)
+    assert [m["event_type"] for m in msgs] == ["online_user_list"]
+    assert [u["username"] for u in msgs[0]["user_list"]] == ["u2"]
+    assert not await wait_for_message(client2, timeout=0.5)
+
+    # user1 is online while one of the tabs is open
+    await tab1.disconnect()
+    assert not await wait_for_message(client2, timeout=0.5)
+    online = await get_presence_backend().online_users(chat.id)
+    assert sorted(u["username"] for u in online) == ["u1", "u2"]
+
+    await tab2.disconnect()
+    assert await wait_for_message(client2)
+    msgs = await get_msgs(client2)
+    assert msgs[0]["event_type"] == "disconnected_user"
+    assert msgs[0]["user"]["username"] == "u1"
+
+    await client2.disconnect()
+    assert await get_presence_backend().online_users(chat.id) == []
@@ -0,0 +1,78 @@
+import re
+
+import pytest
+from chat.models.chat import Chat, SavedChat
+from chat.models.chatLike import ChatLike
+from chat.models.message import Message
+from chat.models.reaction import Reaction
+from chat.serializers.chat import ChatSerializer, SavedChatSerializer
+from chat.serializers.message import MessageSerializer
+from django.db import connection
+
+pytestmark = pytest.mark.skipif(connection.vendor != "sqlite", reason="EXPLAIN QUERY PLAN of SQLite")
+
+# the same filters as in chat.views.chat, chat.views.message, chat.consumers and chat.services.likes
+# pages of lists, read in the index order
+PAGES = {
+    "new chats of a room": lambda: ChatSerializer.prefetch(Chat.objects.filter(room="books")).order_by("-timestamp"),
+    "old chats of a room": lambda: ChatSerializer.prefetch(Chat.objects.filter(room="books")).order_by("timestamp"),
+    "message history": lambda: MessageSerializer.prefetch(Message.objects.filter(chat=1)).order_by("-timestamp", "-id"),
+    "popular chats of a room": lambda: ChatSerializer.prefetch(Chat.objects.filter(room="books")).order_by(
+        "-likes_count", "-id"
+    ),
+    "my chats": lambda: ChatSerializer.prefetch(Chat.objects.filter(user=1, room="books")).order_by("-timestamp"),
+    "saved chats": lambda: SavedChatSerializer.prefetch(
+        SavedChat.objects.filter(user=1, chat__room="books").order_by("-id")
+    ),
+}
+# lookups of single rows and prefetches with the search of the index which has to be used
+LOOKUPS = {
+    "saved chat of a user": (
+        lambda: SavedChat.objects.filter(user=1, chat=1),
+        "chat_savedchat USING COVERING INDEX sqlite_autoindex_chat_savedchat_1 (user_id=? AND chat_id=?)",
+    ),
+    "chat like of a user": (
+        lambda: ChatLike.objects.filter(user=1, chat_id=1),
+        "chat_chatlike USING COVERING INDEX sqlite_autoindex_chat_chatlike_1 (user_id=? AND chat_id=?)",
+    ),
+    "reaction of a user": (
+        lambda: Reaction.objects.filter(user=1, message_id=1).select_related("message"),
+        "chat_reaction USING INDEX reaction_message_user_idx (message_id=? AND user_id=?)",
+    ),
+    "reactions of messages": (
+        lambda: Reaction.objects.filter(message__in=[1, 2, 3]).order_by("id"),
+        "chat_reaction USING INDEX reaction_message_user_idx (message_id=?)",
+    ),
+}
+
+
+def query_plan(queryset) -> list[str]:
+    """Return the lines of EXPLAIN QUERY PLAN of the first page of the queryset"""
+
+    return [line.split(maxsplit=3)[-1] for line in queryset[:100].explain().splitlines()]
+
+
+def assert_no_full_scan(plan: list[str]):
+    # "SCAN chat_chat" reads the whole table, "SCAN chat_chat USING INDEX ..." reads it in the index order
+    full_scans = [line for line in plan if re.fullmatch(r"SCAN \S+", line)]
+    assert full_scans == [], plan
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", PAGES)
+def test_page_uses_index(name):
+    plan = query_plan(PAGES[name]())
+
+    assert_no_full_scan(plan)
+    # a page is read from the index without sorting all rows of the list
+    assert not any("TEMP B-TREE" in line for line in plan), plan
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", LOOKUPS)
+def test_lookup_uses_index(name):
+    (queryset, search) = LOOKUPS[name]
+    plan = query_plan(queryset())
+
+    assert_no_full_scan(plan)
+    assert f"SEARCH {search}" in plan
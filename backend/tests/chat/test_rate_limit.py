@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from channels_redis.core import RedisChannelLayer
+from chat.models.chat import Chat
+from chat.services.rate_limit import (
+    MemoryRateLimiter,
+    RedisRateLimiter,
+    get_rate_limiter,
+)
+
+from .test_event_log import connect, receive_until
+
+
+async def check_limiter(limiter, settings):
+    settings.CHAT_RATE_LIMITS = {"chat_message": {"user": (2, 10), "chat": (3, 10)}}
+
+    assert [await limiter.acquire("chat_message", 1, "1") for _ in range(2)] == [0, 0]
+    # no token of the user
+    wait = await limiter.acquire("chat_message", 1, "1")
+    assert 0 < wait <= 0.1
+    # another user of the chat, then no token of the chat
+    assert await limiter.acquire("chat_message", 2, "1") == 0
+    assert await limiter.acquire("chat_message", 2, "1") > 0
+    # another chat
+    assert await limiter.acquire("chat_message", 2, "2") == 0
+    # not limited
+    assert await limiter.acquire("message_was_updated", 1, "1") == 0
+
+    # the buckets get 10 tokens per second
+    await asyncio.sleep(wait + 0.01)
+    assert await limiter.acquire("chat_message", 1, "1") == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_limiter(settings):
+    await check_limiter(MemoryRateLimiter(), settings)
+
+
+@pytest.mark.asyncio
+async def test_memory_limiter_removes_full_buckets(settings):
+    settings.CHAT_RATE_LIMITS = {"chat_message": {"user": (1, 1000), "chat": (1, 1000)}}
+    settings.CHAT_RATE_LIMIT_KEYS = 4
+    limiter = MemoryRateLimiter()
+
+    for user_id in range(3):
+        assert await limiter.acquire("chat_message", user_id, "1") == 0
+        await asyncio.sleep(0.002)
+    # the fifth bucket: the full ones are removed
+    assert await limiter.acquire("chat_message", 3, "1") == 0
+    assert limiter._count == 2
+    assert set(limiter._buckets["chat_message"][0]) == {3}
+
+
+@pytest.mark.asyncio
+async def test_redis_limiter(redis_url, settings):
+    layer = RedisChannelLayer(hosts=[redis_url])
+    limiter = RedisRateLimiter(layer)
+    await check_limiter(limiter, settings)
+    await layer.group_add("chat_1", "tab1")
+
+    # only the buckets are deleted
+    await limiter.clear()
+    assert [await limiter.acquire("chat_message", 2, "1") for _ in range(2)] == [0, 0]
+    assert await layer.connection(0).zcard(layer._group_key("chat_1")) == 1
+    await layer.flush()
+
+
+def test_limiter_is_chosen_by_the_layer(redis_url, settings):
+    settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    assert isinstance(get_rate_limiter(), MemoryRateLimiter)
+    assert get_rate_limiter() is get_rate_limiter()
+
+    settings.CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels_redis.core.RedisChannelLayer", "CONFIG": {"hosts": [redis_url]}}
+    }
+    assert isinstance(get_rate_limiter(), RedisRateLimiter)
+    settings.CHAT_RATE_LIMIT_BACKEND = "chat.services.rate_limit.MemoryRateLimiter"
+    assert isinstance(get_rate_limiter(), MemoryRateLimiter)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_events_over_limit(settings, chat: Chat, user_factory):
+    settings.CHAT_RATE_LIMITS = {"chat_message": {"user": (2, 0.1), "chat": (10, 10)}}
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    client1 = await connect(chat, t1)
+    await receive_until(client1)
+
+    for idx in range(2):
+        await client1.send_json_to({"event_type": "chat_message", "message": {"chat": chat.id, "text": f"m {idx}"}})
+        await receive_until(client1, "chat_message")
+    await client1.send_json_to({"event_type": "chat_message", "message": {"chat": chat.id, "text": "m 2"}})
+    error = await client1.receive_json_from(timeout=5)
+    assert error["event_type"] == "error"
+    assert error["details"]["event_type"] == "chat_message"
+    assert 9 < error["details"]["retry_after"] <= 10
+
+    # other events aren't limited
+    await client1.send_json_to({"event_type": "message_was_updated", "id": 1, "new_text": "hi"})
+    assert (await client1.receive_json_from(timeout=5))["event_type"] == "message_was_updated"
+    await client1.disconnect()
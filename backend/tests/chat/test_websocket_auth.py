@@ -0,0 +1,35 @@
+import pytest
+from channels.testing import WebsocketCommunicator
+from chat.models.chat import Chat
+from config.asgi import application
+from login.auth_cache import AUTH_CACHE
+from login.authenticate import CustomJWTAuthentication
+
+
+async def connect(chat: Chat, token: str):
+    client = WebsocketCommunicator(
+        application,
+        f"/ws/chat/{chat.room}/{chat.id}/",
+        headers=[(b"origin", b"http://localhost:8000"), (b"Authorization", f"Bearer {token}".encode("utf-8"))],
+    )
+    connected, _ = await client.connect(timeout=20)
+    assert connected
+    assert (await client.receive_json_from(timeout=5))["event_type"] == "online_user_list"
+    await client.disconnect()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_cached_authentication(monkeypatch, chat: Chat, user_factory):
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    AUTH_CACHE.stats.clear()
+    await connect(chat, t1)
+
+    # the token and the user of the second connect are taken from the cache
+    def authenticate(self, request):
+        raise AssertionError("authenticated without the cache")
+
+    monkeypatch.setattr(CustomJWTAuthentication, "authenticate", authenticate)
+    await connect(chat, t1)
+    stats = AUTH_CACHE.get_stats()
+    assert (stats["token_hits"], stats["token_misses"], stats["user_hits"], stats["user_misses"]) == (1, 1, 1, 1)
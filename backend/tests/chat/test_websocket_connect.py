@@ -0,0 +1,46 @@
+import pytest
+from channels.testing import WebsocketCommunicator
+from chat.models.chat import Chat
+from chat.services.user_card import load_user_card
+from config.asgi import application
+from django.contrib.auth import get_user_model
+from files.utils import get_full_file_url
+
+
+async def connect(path: str, token: str) -> tuple[WebsocketCommunicator, bool]:
+    client = WebsocketCommunicator(
+        application,
+        path,
+        headers=[(b"origin", b"http://localhost:8000"), (b"Authorization", f"Bearer {token}".encode("utf-8"))],
+    )
+    connected, _ = await client.connect(timeout=20)
+    return client, connected
+
+
+@pytest.mark.django_db
+def test_user_card(django_assert_num_queries, chat: Chat):
+    user = get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+
+    with django_assert_num_queries(1):
+        card = load_user_card(user.id, str(chat.id), chat.room)
+    assert card["id"] == user.id
+    assert card["username"] == "u1"
+    assert card["avatar"] == get_full_file_url(user.profile.avatar.url)
+
+    assert load_user_card(user.id, str(chat.id), "another_room") is None
+    assert load_user_card(user.id, str(chat.id + 1), chat.room) is None
+    assert load_user_card(user.id, "abc", chat.room) is None
+    assert load_user_card(user.id + 1, str(chat.id), chat.room) is None
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_unknown_chat_is_rejected(chat: Chat, user_factory):
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+
+    for path in (f"/ws/chat/{chat.room}/{chat.id + 1}/", f"/ws/chat/another_room/{chat.id}/"):
+        client, connected = await connect(path, t1)
+        assert not connected
+        await client.wait()
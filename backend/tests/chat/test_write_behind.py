@@ -0,0 +1,149 @@
+import asyncio
+import queue
+import threading
+
+import pytest
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from chat.models.chat import Chat
+from chat.models.message import Message
+from chat.services.versions import CHAT_VERSIONS
+from chat.services.write_behind import MESSAGE_WRITER, MessageWriter, reserve_ids
+from config.asgi import application
+from django.contrib.auth import get_user_model
+
+
+@pytest.fixture
+def write_behind(settings):
+    settings.CHAT_WRITE_BEHIND = True
+    settings.CHAT_WRITE_BEHIND_INTERVAL = 0.2
+    settings.CHAT_WRITE_BEHIND_ID_BLOCK = 10
+    yield
+    MESSAGE_WRITER.close()
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_messages_are_written_in_batch(write_behind, chat: Chat, user):
+    writer = MessageWriter()
+    version = CHAT_VERSIONS.get(chat.id)
+
+    messages = [writer.save(Message(chat=chat, user=user, text=f"message {idx}")) for idx in range(3)]
+    assert writer.is_pending(messages[0].id)
+    assert [message.id for message in messages] == list(range(messages[0].id, messages[0].id + 3))
+    # the message history of the buffer is changed
+    assert CHAT_VERSIONS.get(chat.id) == version + 3
+    # other inserts get ids after the reserved ones
+    other = Message.objects.create(chat=chat, user=user, text="other")
+    assert other.id > messages[0].id + 9
+
+    assert writer.wait(messages[-1].id, timeout=5)
+    assert not writer.is_pending(messages[0].id)
+    saved = Message.objects.filter(id__in=[message.id for message in messages]).order_by("id")
+    assert [(message.text, message.timestamp) for message in saved] == [
+        (message.text, message.timestamp) for message in messages
+    ]
+    assert writer.stats == {"written": 3, "batches": 1}
+    # post_save changed the version again
+    assert CHAT_VERSIONS.get(chat.id) > version + 4
+    writer.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ids_are_reserved_without_the_lock(write_behind, monkeypatch, chat: Chat, user):
+    writer = MessageWriter()
+    reserving, release = threading.Event(), threading.Event()
+
+    def slow_reserve_ids(model, count, using=None):
+        # e.g. waiting for the write lock of SQLite
+        reserving.set()
+        release.wait(5)
+        return reserve_ids(model, count, using)
+
+    monkeypatch.setattr("chat.services.write_behind.reserve_ids", slow_reserve_ids)
+    thread = threading.Thread(target=writer.save, args=(Message(chat=chat, user=user, text="message"),))
+    thread.start()
+    assert reserving.wait(5)
+
+    # the checks of the event loop don't wait for the transaction
+    assert not writer.is_pending(1)
+    assert writer._lock.acquire(timeout=0.5)
+    writer._lock.release()
+
+    release.set()
+    thread.join()
+    writer.close()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_await_written(write_behind, chat: Chat, user):
+    writer = MessageWriter()
+    messages = [
+        await database_sync_to_async(writer.save)(Message(chat=chat, user=user, text=f"message {idx}"))
+        for idx in range(2)
+    ]
+    # a cancelled waiter, e.g. of a closed connection
+    cancelled = asyncio.ensure_future(writer.await_written(messages[0].id))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    await asyncio.wait_for(writer.await_written(messages[1].id), timeout=5)
+    assert not writer.is_pending(messages[0].id) and not writer.is_pending(messages[1].id)
+    assert writer._waiters == {}
+    # a written message isn't waited for
+    await writer.await_written(messages[0].id)
+    await database_sync_to_async(writer.close)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_message_is_dropped(write_behind, chat_factory, user):
+    writer = MessageWriter()
+    chats = [chat_factory(title=f"chat {idx}", room="books", description="test description") for idx in range(2)]
+
+    messages = [writer.save(Message(chat=chat, user=user, text="hello")) for chat in chats]
+    chats[1].delete()
+    writer.close()
+
+    assert list(Message.objects.values_list("id", flat=True)) == [messages[0].id]
+    assert writer.stats == {"written": 1, "batches": 1, "dropped": 1}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_full_queue(write_behind, monkeypatch, chat: Chat, user):
+    writer = MessageWriter()
+    # the thread doesn't write the queue
+    writer._queue = queue.Queue(maxsize=1)
+    monkeypatch.setattr(writer, "_start", lambda: None)
+
+    writer.save(Message(chat=chat, user=user, text="queued"))
+    with pytest.raises(queue.Full):
+        writer.save(Message(chat=chat, user=user, text="rejected"))
+    assert len(writer._pending) == 1
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.asyncio
+async def test_consumer_write_behind(write_behind, settings, chat: Chat, user_factory, client_factory):
+    user1, t1 = await user_factory.create(username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True)
+    client1: WebsocketCommunicator = await client_factory.create(settings, application, chat, user1, t1)
+    await client1.receive_json_from(timeout=5)
+
+    await client1.send_json_to({"event_type": "chat_message", "message": {"chat": chat.id, "text": "hello"}})
+    message = (await client1.receive_json_from(timeout=5))["message"]
+    assert message["text"] == "hello"
+
+    # the message is changed after it is written
+    await client1.send_json_to({"event_type": "message_was_updated", "id": message["id"], "new_text": "hi"})
+    assert (await client1.receive_json_from(timeout=5))["event_type"] == "message_was_updated"
+    assert await database_sync_to_async(lambda: list(Message.objects.values_list("id", "text")))() == [
+        (message["id"], "hi")
+    ]
+
+    await client1.disconnect()
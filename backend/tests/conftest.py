@@ -2,9 +2,21 @@ from urllib.parse import urlencode
 
 import pytest
 from accounts.models import EmailConfirmationToken, User
+from chat.services.message_buffer import MESSAGE_BUFFER
 from django.core import mail
+from django.core.cache import caches
 from django.test.client import Client
 from django.urls import reverse
+from login.auth_cache import AUTH_CACHE
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # the local memory cache, the message buffer and the cache of authenticated users outlive the test database
+    for cache in caches.all():
+        cache.clear()
+    MESSAGE_BUFFER.clear()
+    AUTH_CACHE.clear()
 
 
 class UserForTests:
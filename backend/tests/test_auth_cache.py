@@ -0,0 +1,109 @@
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from login.auth_cache import AUTH_CACHE, TTLCache
+from login.authenticate import CustomJWTAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(
+        username="u1", password="p", email="e1@4rooms.pro", is_email_confirmed=True
+    )
+
+
+def authenticate(token):
+    request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+    with CaptureQueriesContext(connection) as queries:
+        user, _ = CustomJWTAuthentication().authenticate(Request(request))
+    return user, len([query for query in queries if "accounts_user" in query["sql"]])
+
+
+@pytest.mark.django_db
+def test_repeated_authentication(user):
+    token = AccessToken.for_user(user)
+    AUTH_CACHE.stats.clear()
+
+    first, queries = authenticate(token)
+    assert (first, queries) == (user, 1)
+    second, queries = authenticate(token)
+    assert (second, queries) == (user, 0)
+    # a new instance for every request
+    assert second is not first
+    assert second.username == "u1" and second.is_email_confirmed and not second._state.adding
+
+    # another token of the same user is verified, the user is cached
+    assert authenticate(AccessToken.for_user(user)) == (user, 0)
+    assert AUTH_CACHE.get_stats() == {
+        "tokens": 2,
+        "users": 1,
+        "token_hits": 1,
+        "token_misses": 2,
+        "token_hit_rate": 0.333,
+        "user_hits": 2,
+        "user_misses": 1,
+        "user_hit_rate": 0.667,
+    }
+
+
+@pytest.mark.django_db
+def test_changed_user_is_queried(user):
+    token = AccessToken.for_user(user)
+    authenticate(token)
+
+    user.username = "u2"
+    user.save()
+    changed, queries = authenticate(token)
+    assert (changed.username, queries) == ("u2", 1)
+
+    user.delete()
+    with pytest.raises(Exception, match="User not found"):
+        authenticate(token)
+
+
+@pytest.mark.django_db
+def test_inactive_user_is_rejected(user):
+    token = AccessToken.for_user(user)
+    authenticate(token)
+
+    # deactivated, the cache has the inactive user
+    get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+    AUTH_CACHE.set_user(get_user_model().objects.get(pk=user.pk))
+    assert CustomJWTAuthentication().authenticate_cached({"headers": [(b"Authorization", f"Bearer {token}")]}) is None
+    with pytest.raises(Exception, match="User is inactive"):
+        authenticate(token)
+
+
+@pytest.mark.django_db
+def test_requests_use_cache(client: Client, user):
+    headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+    client.get(reverse("get_chats", args=["books", "new"]), headers=headers)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse("get_chats", args=["books", "new"]), headers=headers)
+    assert response.status_code == 200
+    assert not any("accounts_user" in query["sql"] for query in queries)
+
+
+def test_ttl_cache(settings, monkeypatch):
+    settings.AUTH_CACHE_SIZE = 2
+    cache = TTLCache()
+    now = time.time()
+    for key in ("a", "b"):
+        cache.set(key, key.upper(), now + 10)
+    # "a" is used, "b" is the least recently used one
+    assert cache.get("a") == "A"
+    cache.set("c", "C", now + 20)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+
+    monkeypatch.setattr(time, "time", lambda: now + 15)
+    assert (cache.get("a"), cache.get("c")) == (None, "C")
+    assert len(cache) == 1
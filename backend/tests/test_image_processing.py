@@ -0,0 +1,69 @@
+import time
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from files.services.images import ImageProcessingUnavailable, ImageProcessor
+from PIL import Image
+
+
+def image_file(size=(640, 480), img_format="JPEG") -> SimpleUploadedFile:
+    output = BytesIO()
+    Image.new("RGB", size, color=(10, 120, 10)).save(output, format=img_format)
+    return SimpleUploadedFile("photo.jpg", output.getvalue(), content_type="image/jpeg")
+
+
+@pytest.fixture
+def processor():
+    processor = ImageProcessor(workers=2, queue_size=4, timeout=5)
+    yield processor
+    processor.shutdown()
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_resize(workers):
+    processor = ImageProcessor(workers=workers, queue_size=4, timeout=5)
+
+    resized = processor.resize(image_file(), 200)
+    img = Image.open(resized)
+    assert img.size == (200, 200)
+    assert img.format == "JPEG"
+    assert resized.name == "photo.jpeg"
+    resized.seek(0)
+    assert resized.size == len(resized.read())
+
+    # already has the required size
+    square = image_file(size=(200, 200))
+    assert processor.resize(square, 200) is square
+    processor.shutdown()
+
+
+def test_get_format(processor):
+    # the pool is created with the first task
+    assert processor._pool is None
+    assert processor.get_format(image_file(img_format="PNG")) == "PNG"
+    # workers aren't forked from the server process
+    assert processor._pool._mp_context.get_start_method() == "forkserver"
+
+    with pytest.raises(Exception):
+        processor.get_format(SimpleUploadedFile("a.png", b"not an image"))
+
+
+@pytest.mark.asyncio
+async def test_aget_format(processor):
+    assert await processor.aget_format(image_file(img_format="GIF")) == "GIF"
+
+
+def test_queue_limit_and_timeout():
+    processor = ImageProcessor(workers=1, queue_size=1, timeout=0.5)
+
+    with pytest.raises(ImageProcessingUnavailable, match="timed out"):
+        processor._run(time.sleep, 2)
+
+    # the sleeping task still occupies the only place in the queue
+    with pytest.raises(ImageProcessingUnavailable, match="busy"):
+        processor.get_format(image_file())
+
+    time.sleep(2)
+    assert processor.get_format(image_file()) == "JPEG"
+    processor.shutdown()
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+from config.settings import get_databases
+from config.sqlite3.base import get_writer_lock
+from django.db.utils import ConnectionHandler
+
+
+@pytest.fixture
+def databases(tmp_path, django_db_blocker):
+    """Connections to a database file with the production profile, not to the test database"""
+
+    handler = ConnectionHandler(get_databases(tmp_path / "db.sqlite3", production=True))
+    with django_db_blocker.unblock():
+        with handler["default"].cursor() as cursor:
+            cursor.execute("CREATE TABLE events (name TEXT)")
+        yield handler
+        handler.close_all()
+
+
+def test_get_databases():
+    assert get_databases("db.sqlite3") == {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": "db.sqlite3"}}
+
+    database = get_databases("db.sqlite3", production=True)["default"]
+    assert database["ENGINE"] == "config.sqlite3"
+    assert database["OPTIONS"]["transaction_mode"] == "IMMEDIATE"
+    assert database["CONN_MAX_AGE"] > 0
+
+
+def test_pragmas(databases):
+    with databases["default"].cursor() as cursor:
+        pragmas = {
+            pragma: cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "temp_store")
+        }
+    assert pragmas == {
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "busy_timeout": 20000,
+        "cache_size": -65536,
+        "temp_store": 2,
+    }
+
+
+def test_single_writer(databases):
+    events = []
+
+    def write(name, delay, rollback=False):
+        connection = databases["default"]
+        # as transaction.atomic() starts a transaction
+        connection.ensure_connection()
+        connection._start_transaction_under_autocommit()
+        events.append(f"{name} started")
+        # the other threads wait for the lock of the process, not for the lock of the database file
+        assert get_writer_lock(connection.settings_dict["NAME"]).locked()
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO events VALUES (%s)", [name])
+        time.sleep(delay)
+        events.append(f"{name} ended")
+        if rollback:
+            connection.rollback()
+        else:
+            connection.commit()
+        connection.close()
+
+    threads = [threading.Thread(target=write, args=("first", 0.2, True))]
+    threads[0].start()
+    time.sleep(0.05)
+    threads += [threading.Thread(target=write, args=(name, 0)) for name in ("second", "third")]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not get_writer_lock(databases["default"].settings_dict["NAME"]).locked()
+
+    # the transactions didn't overlap and the lock is released after the rollback
+    assert events[:2] == ["first started", "first ended"]
+    assert sorted(events[2:]) == ["second ended", "second started", "third ended", "third started"]
+    assert events[2].split()[0] == events[3].split()[0]
+    with databases["default"].cursor() as cursor:
+        assert sorted(cursor.execute("SELECT name FROM events").fetchall()) == [("second",), ("third",)]